@@ -0,0 +1,127 @@
+"""
+Correct-response computation: the per-trial loop (get_correct_responses_loop)
+vs the batched integer-coded version, checked to agree on random trial sets
+for many seeds, plus the cost of scoring many schedules in one call.
+
+Run from the repository root:
+    python -m benchmarks.bench_correct_responses
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.get_correct_responses import get_correct_responses, get_correct_responses_loop
+from src.get_correct_responses_training import (get_correct_responses_training,
+                                                get_correct_responses_training_loop)
+from src.response_coding import correct_responses_batch, encode_trials, feature_matrix
+from src.stim_manifest import load_manifest
+from src.trial_table import StringTable, new_trial_table
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+CATEGORY_NAMES = ['Animals', 'Cars', 'Faces', 'Fruits']
+AXIS_NAMES = [['Colorful', 'Count'], ['New', 'Colorful'], ['New', 'Geometry'], ['Count', 'Geometry']]
+
+STIM_SETS = {
+    # stim set: (batched, loop, images sampled per (category, pair) folder)
+    'Task_Stim_New_v1': (get_correct_responses, get_correct_responses_loop, (1, 2, 3)),
+    'Training': (get_correct_responses_training, get_correct_responses_training_loop, (None,)),
+}
+
+
+def random_task_struct(stim_set, n_trials, rng, p_unknown=0.02):
+    """Random trial conditions over the manifest's stimuli (a few unknown images -> NaN)."""
+    manifest = load_manifest(stim_set, required=True)
+    stim_folder = Path('..') / 'stimuli' / stim_set
+    pairs = STIM_SETS[stim_set][2]
+
+    trials = new_trial_table(n_trials)
+    trials['category'] = rng.integers(0, len(CATEGORY_NAMES), n_trials)
+    trials['prompt_type'] = rng.integers(1, 3, n_trials)
+    stim_strings = StringTable()
+    for t_i in range(n_trials):
+        images = manifest.folder_images(stim_folder, CATEGORY_NAMES[trials['category'][t_i]],
+                                        pairs[rng.integers(len(pairs))])
+        stims = [str(images[i]) for i in rng.permutation(len(images))[:2]]
+        if rng.random() < p_unknown:
+            stims[rng.integers(2)] = str(stim_folder / 'unknown.jpg')
+        trials['stim1'][t_i] = stim_strings.add(stims[0])
+        trials['stim2'][t_i] = stim_strings.add(stims[1])
+    trials['axis'] = rng.integers(0, 2, n_trials)
+    trials['prompt_variant'] = rng.integers(0, 2, n_trials)
+
+    return {
+        'n_trials': n_trials,
+        'category_and_axis': [CATEGORY_NAMES, AXIS_NAMES],
+        'trials': trials,
+        'trial_strings': {'stims': stim_strings.strings},
+    }
+
+
+def check_agreement(n_seeds, n_trials):
+    """Seeds on which the batched and loop versions disagree, per stimulus set."""
+    mismatches = {}
+    for stim_set, (batched, loop, _) in STIM_SETS.items():
+        mismatches[stim_set] = []
+        for seed in range(n_seeds):
+            task_struct = random_task_struct(stim_set, n_trials, np.random.default_rng(seed))
+            if not np.array_equal(batched(task_struct), loop(task_struct), equal_nan=True):
+                mismatches[stim_set].append(seed)
+    return mismatches
+
+
+def time_call(f, *args, repeats=20):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        f(*args)
+    return (time.perf_counter() - t0) / repeats
+
+
+def run(n_seeds=200, n_trials=192, n_schedules=10000):
+    cwd = os.getcwd()
+    os.chdir(SRC_DIR)  # manifest path is relative to src/, like main.py
+    try:
+        mismatches = check_agreement(n_seeds, n_trials)
+
+        task_struct = random_task_struct('Task_Stim_New_v1', n_trials, np.random.default_rng(0))
+        loop_s = time_call(get_correct_responses_loop, task_struct)
+        batched_s = time_call(get_correct_responses, task_struct)
+
+        # Many schedules in one call, on already-coded trials
+        stim_index, features = feature_matrix(load_manifest('Task_Stim_New_v1', required=True))
+        codes = encode_trials(task_struct, stim_index)
+        rng = np.random.default_rng(1)
+        order = np.argsort(rng.random((n_schedules, n_trials)), axis=1)
+        schedules = {key: value[order] for key, value in codes.items()}
+        t0 = time.perf_counter()
+        correct_responses_batch(features, **schedules)
+        many_s = time.perf_counter() - t0
+    finally:
+        os.chdir(cwd)
+
+    return {
+        'n_seeds': n_seeds,
+        'n_trials': n_trials,
+        'mismatched_seeds': mismatches,
+        'agree': not any(mismatches.values()),
+        'loop_s': loop_s,
+        'batched_s': batched_s,
+        'speedup': loop_s / batched_s,
+        'n_schedules': n_schedules,
+        'schedules_batch_s': many_s,
+        'schedules_per_s': n_schedules / many_s,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=200)
+    parser.add_argument('--trials', type=int, default=192)
+    parser.add_argument('--schedules', type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.seeds, args.trials, args.schedules), indent=2))
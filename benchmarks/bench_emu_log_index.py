@@ -0,0 +1,78 @@
+"""
+Per-comment cost of resolving the EMU file string: pandas CSV read per
+comment (cbmex_utils) vs the cached EmuLogIndex.
+
+Run from the repository root:
+    python -m benchmarks.bench_emu_log_index
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.cbmex_utils import get_current_log_entry, get_next_log_entry, gensave_filename
+from src.emu_log_index import EmuLogIndex
+
+
+def make_log(log_path, n_rows):
+    """Write a log CSV with n_rows previous EMU entries."""
+    df = pd.DataFrame({
+        'emu_id': range(1, n_rows + 1),
+        'file_string': [f'EMU-{i:04}_subj-{log_path.stem.split("_")[0]}_DCWM' for i in range(1, n_rows + 1)],
+    })
+    df.to_csv(log_path, index=False)
+
+
+def time_per_call(fn, n_calls):
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return (time.perf_counter() - t0) / n_calls
+
+
+def run(n_rows=500, n_comments=200, task='DCWM'):
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / 'bench_log.csv'
+
+        # Task start: read + rewrite whole CSV vs single appended row
+        make_log(log_path, n_rows)
+        t0 = time.perf_counter()
+        emu_num, subj_id, log_table = get_next_log_entry(log_path)
+        gensave_filename(log_path, log_table, emu_num, subj_id, task)
+        start_before = time.perf_counter() - t0
+
+        make_log(log_path, n_rows)
+        log_index = EmuLogIndex(log_path, task)
+        t0 = time.perf_counter()
+        log_index.start()
+        start_after = time.perf_counter() - t0
+
+        # Every other comment: per-comment CSV read vs cached string
+        def before():
+            emu_num, subj_id, log_table = get_current_log_entry(log_path)
+            gensave_filename(log_path, log_table, emu_num, subj_id, task, save_entry=False)
+
+        comment_before = time_per_call(before, n_comments)
+        comment_after = time_per_call(log_index.current, n_comments)
+
+    return {
+        'n_rows': n_rows,
+        'n_comments': n_comments,
+        'start_before_s': start_before,
+        'start_after_s': start_after,
+        'per_comment_before_s': comment_before,
+        'per_comment_after_s': comment_after,
+        'per_comment_speedup': comment_before / comment_after if comment_after > 0 else float('inf'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.comments), indent=2))
@@ -0,0 +1,105 @@
+"""
+Per-marker cost of send_blackrock_comment against a fake cbpy: the direct
+call (what the comment worker thread pays) and CommentDispatcher.submit
+(what the display thread pays).
+
+Runs without Blackrock hardware. Run from the repository root:
+    python -m benchmarks.bench_markers
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class FakeCbpy:
+    """Stands in for cerebus.cbpy; set_comment optionally sleeps to mimic the NSP link."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.n_comments = 0
+
+    def open(self, instance=0, parameter=None):
+        return 0, {}
+
+    def set_comment(self, comment, rgba_tuple=None, instance=0):
+        if self.latency:
+            time.sleep(self.latency)
+        self.n_comments += 1
+
+    def close(self, instance=0):
+        return 0
+
+
+def percentiles(values):
+    values = np.asarray(values)
+    return {
+        'median_s': float(np.median(values)),
+        'p99_s': float(np.percentile(values, 99)),
+        'max_s': float(values.max()),
+    }
+
+
+def run(n_markers=1000, latency=0.0):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # send_blackrock_comment creates ../patientData/neuralLogs on import,
+        # so import it from a scratch src/ folder like main.py's chdir
+        work_dir = Path(tmp) / 'src'
+        work_dir.mkdir()
+        os.chdir(work_dir)
+        try:
+            from src import send_blackrock_comment as sbc
+            from src.comment_dispatcher import CommentDispatcher
+
+            log_path = Path(tmp) / 'bench_log.csv'
+            fake = FakeCbpy(latency)
+            sbc.close_blackrock_session()
+            sbc.LOG_INDEXES.clear()
+            sbc.open_blackrock_session(cbpy=fake, ips=['127.0.0.1', '127.0.0.2'])
+            sbc.send_blackrock_comment(event='start', task='DCWM', log_path=log_path)
+
+            direct = []
+            for i in range(n_markers):
+                t0 = time.perf_counter()
+                sbc.send_blackrock_comment(event='annotate', task='DCWM', log_path=log_path,
+                                           additional_text=f'trial={i}; phase=stim1_on')
+                direct.append(time.perf_counter() - t0)
+
+            dispatcher = CommentDispatcher(
+                lambda **kwargs: sbc.send_blackrock_comment(log_path=log_path, **kwargs)
+            ).start()
+            submit = []
+            for i in range(n_markers):
+                t0 = time.perf_counter()
+                dispatcher.submit(event='annotate', task='DCWM', additional_text=f'trial={i}; phase=stim1_on')
+                submit.append(time.perf_counter() - t0)
+            stats = dispatcher.stop()
+
+            sbc.send_blackrock_comment(event='stop', task='DCWM', log_path=log_path)
+            sbc.close_blackrock_session()
+        finally:
+            os.chdir(cwd)
+
+    return {
+        'n_markers': n_markers,
+        'fake_nsp_latency_s': latency,
+        'send_direct': percentiles(direct),
+        'dispatcher_submit': percentiles(submit),
+        'dispatcher_send_latency': percentiles(stats['send_latency']),
+        'dispatcher_backpressure_count': stats['backpressure_count'],
+        'comments_sent': fake.n_comments,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--markers', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated NSP latency per set_comment, in s')
+    args = parser.parse_args()
+    print(json.dumps(run(args.markers, args.latency), indent=2))
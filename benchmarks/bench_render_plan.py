@@ -0,0 +1,132 @@
+"""
+Time-to-first-flip per trial phase: building stimuli inside the trial
+(the old run_session) vs drawing pre-built render-plan stimuli.
+
+Needs PsychoPy and an OpenGL context (use xvfb-run on a machine without a
+display). Run from the repository root:
+    python -m benchmarks.bench_render_plan
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from psychopy import visual
+
+from src.get_instruction_text import get_instruction_text
+from src.get_motor_instruction_text import get_motor_instruction_text
+from src.render_plan import build_render_plan, reset_trial_text
+from src.trial_table import (StringTable, instruction_text, new_trial_table, prompt_text,
+                             response_instruction_text)
+
+CATEGORY_AXES = [['Colorful', 'Count'], ['New', 'Colorful'], ['New', 'Geometry'], ['Count', 'Geometry']]
+
+
+def make_task_struct(n_trials, rng):
+    """Minimal task_struct with the fields build_render_plan reads."""
+    trials = new_trial_table(n_trials)
+    instructions, response_instructions = StringTable(), StringTable()
+    for t_i in range(n_trials):
+        trial = trials[t_i]
+        category = int(rng.integers(4))
+        axis_name = CATEGORY_AXES[category][int(rng.integers(2))]
+        trial['instruction'] = instructions.add(get_instruction_text(category, axis_name, int(rng.integers(2))))
+        trial['response_instruction'] = response_instructions.add(get_motor_instruction_text(int(rng.integers(2))))
+        trial['prompt_type'] = rng.integers(1, 3)
+    return {
+        'n_trials': n_trials,
+        'trials': trials,
+        'trial_strings': {
+            'instructions': instructions.strings,
+            'response_instructions': response_instructions.strings,
+        },
+    }
+
+
+def make_disp_struct(win):
+    width, height = win.size
+    dy = height / 5
+    pw = ph = 250
+    return {
+        'win': win,
+        'width': width,
+        'height': height,
+        'vertical_rects': [
+            [-pw/2, dy - ph/2, pw/2, dy + ph/2],
+            [-pw/2, -dy - ph/2, pw/2, -dy + ph/2],
+        ],
+    }
+
+
+def legacy_phase_stims(win, disp_struct, task_struct, t_i, phase):
+    """Stimuli exactly as the old trial loop created them for each phase."""
+    if phase == 'fixation':
+        return [visual.Line(win, start=[0, -20], end=[0, 20], lineColor='black', lineWidth=5),
+                visual.Line(win, start=[-20, 0], end=[20, 0], lineColor='black', lineWidth=5)]
+    if phase in ('task_instruction', 'response_instruction'):
+        text_of = instruction_text if phase == 'task_instruction' else response_instruction_text
+        return [visual.TextStim(win, text=text_of(task_struct, t_i), color='white', height=48,
+                                wrapWidth=win.size[0] * 0.8)]
+    stims = []
+    for rect, text in zip(disp_struct['vertical_rects'], prompt_text(task_struct, t_i)):
+        frame_rect = [x + offset for x, offset in zip(rect, [-10, -10, 10, 10])]
+        stims.append(visual.Rect(win, width=frame_rect[2] - frame_rect[0], height=frame_rect[3] - frame_rect[1],
+                                 pos=((frame_rect[0] + frame_rect[2])/2, (frame_rect[1] + frame_rect[3])/2),
+                                 lineColor='black', fillColor=None, lineWidth=5))
+        stims.append(visual.TextStim(win, text=text, color='white', height=48,
+                                     pos=((rect[0] + rect[2])/2, (rect[1] + rect[3])/2)))
+    return stims
+
+
+def plan_phase_stims(render_plan, t_i, phase):
+    trial_plan = render_plan['trials'][t_i]
+    if phase == 'fixation':
+        return render_plan['fixation']
+    if phase in ('task_instruction', 'response_instruction'):
+        return [trial_plan[phase]]
+    reset_trial_text(trial_plan)
+    return render_plan['button_frames'] + [trial_plan['top_text'], trial_plan['bottom_text']]
+
+
+PHASES = ['fixation', 'task_instruction', 'response_instruction', 'button']
+
+
+def run(n_trials=48, seed=0):
+    rng = np.random.default_rng(seed)
+    win = visual.Window(size=[800, 600], units='pix', fullscr=False, allowGUI=False,
+                        waitBlanking=False, checkTiming=False)
+    task_struct = make_task_struct(n_trials, rng)
+    disp_struct = make_disp_struct(win)
+
+    t0 = time.perf_counter()
+    render_plan = build_render_plan(task_struct, disp_struct)
+    build_time = time.perf_counter() - t0
+
+    results = {'n_trials': n_trials, 'render_plan_build_s': build_time, 'phases': {}}
+    for phase in PHASES:
+        timings = {'before': [], 'after': []}
+        for t_i in range(n_trials):
+            for label, get_stims in [
+                ('before', lambda: legacy_phase_stims(win, disp_struct, task_struct, t_i, phase)),
+                ('after', lambda: plan_phase_stims(render_plan, t_i, phase)),
+            ]:
+                t_start = time.perf_counter()
+                for stim in get_stims():
+                    stim.draw()
+                win.flip()
+                timings[label].append(time.perf_counter() - t_start)
+        results['phases'][phase] = {
+            label: {'median_s': float(np.median(v)), 'max_s': float(np.max(v))}
+            for label, v in timings.items()
+        }
+    win.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trials', type=int, default=48)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.trials, args.seed), indent=2))
@@ -0,0 +1,82 @@
+"""
+Trial-schedule generation: how often schedule_engine.generate_schedule meets
+every constraint of the task design over many seeds, and how long it takes
+for the task design and for a 10x larger one (more categories, pairs and
+blocks), plus the batch quality check (schedule_quality) of many schedules.
+
+Run from the repository root:
+    python -m benchmarks.bench_schedule
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.schedule_engine import TASK_DESIGN, generate_schedule
+from src.schedule_library import session_schedule
+from src.schedule_quality import check_library
+
+
+def scaled_design(scale):
+    """TASK_DESIGN with scale x the categories and blocks, and 2x the pairs."""
+    factors = dict(TASK_DESIGN['factors'])
+    factors['category'] = list(range(len(factors['category']) * scale))
+    factors['pair'] = list(range(len(factors['pair']) * 2))
+    return dict(TASK_DESIGN, factors=factors,
+                n_blocks=TASK_DESIGN['n_blocks'] * scale,
+                n_trials_per_block=TASK_DESIGN['n_trials_per_block'] * scale)
+
+
+def run_design(design, n_seeds):
+    times = []
+    attempts = []
+    invalid_seeds = []
+    for seed in range(n_seeds):
+        t0 = time.perf_counter()
+        _, report = generate_schedule(design, rng=seed)
+        times.append(time.perf_counter() - t0)
+        attempts.append(report['attempts'])
+        if not report['valid']:
+            invalid_seeds.append(seed)
+    return {
+        'n_trials': design['n_blocks'] * design['n_trials_per_block'],
+        'n_seeds': n_seeds,
+        'invalid_seeds': invalid_seeds,
+        'mean_attempts': float(np.mean(attempts)),
+        'median_s': float(np.median(times)),
+        'max_s': float(np.max(times)),
+    }
+
+
+def run_quality(n_schedules, n_distinct=100):
+    """Time check_library on n_schedules library rows (n_distinct seeds, tiled)."""
+    rows = np.stack([session_schedule(seed)[0] for seed in range(n_distinct)])
+    library = rows[np.arange(n_schedules) % n_distinct]
+    t0 = time.perf_counter()
+    quality = check_library(library)
+    elapsed = time.perf_counter() - t0
+    return {
+        'n_schedules': n_schedules,
+        'n_valid': int(quality['valid'].sum()),
+        'elapsed_s': elapsed,
+        'schedules_per_s': n_schedules / elapsed,
+    }
+
+
+def run(n_seeds=200, scale=10, n_quality=10000):
+    return {
+        'task': run_design(TASK_DESIGN, n_seeds),
+        f'scaled_x{scale}': run_design(scaled_design(scale), max(1, n_seeds // 10)),
+        'quality_check': run_quality(n_quality),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=200)
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--quality-schedules', type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.seeds, args.scale, args.quality_schedules), indent=2))
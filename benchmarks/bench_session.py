@@ -0,0 +1,157 @@
+"""
+init_task build time and per-trial run_session overhead, measured with the
+headless simulated participant (hidden window, virtual clock).
+
+Reports, per trial, the wall-clock overhead: trial wall time minus the time
+spent inside the real flips, i.e. the CPU / IO work run_session does between
+frames. Also reported is the frame-count overhead: virtual trial time beyond
+the intended phase durations (fixation, instruction, stimuli, ISI, response
+instruction, response, feedback hold, ITI). The virtual clock only moves one
+refresh per flip and by the exact core.wait amount, so that number counts
+extra flips only and can't show per-trial CPU / IO cost.
+
+Needs PsychoPy and an OpenGL context (use xvfb-run on a machine without a
+display). Run from the repository root:
+    python -m benchmarks.bench_session
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.init_task import init_task
+from src.run_session import run_session
+from src.get_correct_responses import get_correct_responses
+from src.render_plan import build_render_plan
+from src.stim_preprocess import stim_display_sizes
+from src.texture_cache import TextureCache
+from src.headless import HeadlessSession, SimulatedResponder
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+
+def intended_trial_time(task_struct, t_i):
+    """Sum of the scheduled phase durations of one trial, plus the response."""
+    frame_period = task_struct['frame_period']
+    responded = np.isfinite(task_struct['response_time'][t_i])
+    trial = task_struct['trials'][t_i]
+    return (trial['fixation_time']
+            + task_struct['phase_frames']['instruction'] * frame_period
+            + task_struct['phase_frames']['stim1'] * frame_period
+            + frame_period  # stim1 off
+            + trial['isi']
+            + task_struct['phase_frames']['stim2'] * frame_period
+            + task_struct['phase_frames']['response_instruction'] * frame_period
+            + (task_struct['response_time'][t_i] + task_struct['text_holdout_time']
+               if responded else task_struct['response_time_max'])
+            + task_struct['ITI'])
+
+
+def wall_overhead(session, task_struct, n_trials, wall_end):
+    """
+    Per-trial wall time, time inside real flips, and the difference.
+    Trial t starts at its first flip: the blank flip one refresh before its
+    fixation_flip (virtual time).
+    """
+    flip_virtual = np.array(session.flip_virtual)
+    flip_start = np.array(session.flip_wall_start)
+    flip_cost = np.array(session.flip_wall_end) - flip_start
+    frame_period = task_struct['frame_period']
+    fixation = np.array([task_struct['trial_struct_cell'][t_i]['fixation_flip'] for t_i in range(n_trials)])
+    first = np.searchsorted(flip_virtual, fixation - 1.5 * frame_period, side='right')
+    bounds = np.append(first, len(flip_start))
+    wall_bounds = np.append(flip_start[first], wall_end)
+    trial_wall = np.diff(wall_bounds)
+    trial_flip = np.add.reduceat(np.append(flip_cost, 0.0), bounds[:-1])
+    return trial_wall, trial_flip, trial_wall - trial_flip, np.diff(bounds)
+
+
+def time_init_task():
+    """init_task as a whole, and the parts of it that can be re-run alone."""
+    t0 = time.perf_counter()
+    task_struct, disp_struct = init_task(sub_id='bench', blackrock_enabled=0, debug=1, headless=True)
+    total = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    get_correct_responses(task_struct)
+    correct_responses = time.perf_counter() - t0
+
+    # Loading every stimulus once (init_task itself only loads the first trials')
+    stim_sizes = stim_display_sizes(task_struct, disp_struct['horizontal_rects'])
+    t0 = time.perf_counter()
+    texture_cache = TextureCache(disp_struct['win'], stim_sizes, capacity=len(stim_sizes))
+    texture_cache.prefetch(stim_sizes)
+    texture_cache.load_pending(max_loads=len(stim_sizes))
+    image_cache = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    build_render_plan(task_struct, disp_struct)
+    render_plan = time.perf_counter() - t0
+
+    timings = {
+        'total_s': total,
+        'correct_responses_s': correct_responses,
+        'image_cache_s': image_cache,
+        'render_plan_s': render_plan,
+        'schedule_and_window_s': total - correct_responses - image_cache - render_plan,
+        'n_unique_stims': len(stim_sizes),
+    }
+    return task_struct, disp_struct, timings
+
+
+def run(n_trials=48, seed=0):
+    cwd = os.getcwd()
+    os.chdir(SRC_DIR)  # init_task paths are relative to src/, like main.py
+    try:
+        task_struct, disp_struct, init_timings = time_init_task()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            task_struct['output_folder'] = Path(tmp)
+            task_struct['n_trials'] = n_trials = min(n_trials, task_struct['n_trials'])
+            task_struct['frame_period'] = disp_struct['frame_period']
+
+            responder = SimulatedResponder(task_struct, seed=seed)
+            with HeadlessSession(disp_struct['win'], responder, disp_struct['frame_period']) as session:
+                t0 = time.perf_counter()
+                task_struct, disp_struct = run_session(task_struct, disp_struct)
+                wall_end = time.perf_counter()
+                wall = wall_end - t0
+
+        trial_wall, trial_flip, overhead, trial_frames = wall_overhead(session, task_struct, n_trials, wall_end)
+        frame_overhead = np.array([task_struct['trial_time'][t_i] - intended_trial_time(task_struct, t_i)
+                                   for t_i in range(n_trials)])
+        disp_struct['win'].close()
+    finally:
+        os.chdir(cwd)
+
+    return {
+        'init_task': init_timings,
+        'run_session': {
+            'n_trials': n_trials,
+            'frame_period_s': disp_struct['frame_period'],
+            'wall_overhead_per_trial_median_s': float(np.median(overhead)),
+            'wall_overhead_per_trial_max_s': float(overhead.max()),
+            'flip_time_per_trial_median_s': float(np.median(trial_flip)),
+            'frames_per_trial_median': float(np.median(trial_frames)),
+            'frame_overhead_per_trial_median_frames': float(np.median(frame_overhead) / disp_struct['frame_period']),
+            'frame_overhead_per_trial_max_frames': float(frame_overhead.max() / disp_struct['frame_period']),
+            'wall_per_trial_s': wall / n_trials,
+            'wall_per_flip_s': wall / max(session.n_flips, 1),
+            'n_flips': session.n_flips,
+        },
+        'texture_cache': {key: value for key, value in task_struct['texture_cache_stats'].items()
+                          if key != 'load_time'},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trials', type=int, default=48)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.trials, args.seed), indent=2))
@@ -0,0 +1,107 @@
+"""
+Slider trajectory features: a per-trace Python loop over the
+slider_positions dicts vs the packed, vectorized extractor, checked to
+agree on simulated sessions (key-press steps of 0.1, one sample per frame).
+
+Run from the repository root:
+    python -m benchmarks.bench_slider_features
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.slider_features import FEATURE_FIELDS, SLIDER_MAX, session_features
+
+
+def simulated_sessions(n_sessions, n_trials=192, seed=0):
+    """task_structs holding only what the slider features need; half the trials are slider trials."""
+    rng = np.random.default_rng(seed)
+    sessions = []
+    for s in range(n_sessions):
+        slider_positions = [None] * n_trials
+        for t_i in np.flatnonzero(rng.random(n_trials) < 0.5):
+            n = int(rng.integers(30, 300))
+            steps = rng.choice([-0.1, 0, 0, 0, 0, 0.1], n)
+            pos = np.round(np.clip(np.cumsum(steps), -SLIDER_MAX, SLIDER_MAX), 1)
+            slider_positions[t_i] = {'pos': pos, 'time': np.arange(n) / 60}
+        sessions.append({'sub_id': f'sub{s % 10}', 'file_name': f'session{s}',
+                         'slider_positions': slider_positions})
+    return sessions
+
+
+def trace_features_loop(pos, time):
+    """Features of one trace, sample by sample."""
+    n = len(pos)
+    first_move_latency = np.nan
+    for i in range(n):
+        if pos[i] != 0:
+            first_move_latency = time[i]
+            break
+    n_direction_changes, last_step, path_length = 0, 0, 0.0
+    for i in range(1, n):
+        step = np.sign(pos[i] - pos[i - 1])
+        path_length += abs(pos[i] - pos[i - 1])
+        if step != 0:
+            n_direction_changes += step == -last_step
+            last_step = step
+    final_side = np.sign(pos[-1])
+    time_at_final_side, settle = 0.0, 0
+    for i in range(n):
+        if np.sign(pos[i]) == final_side:
+            time_at_final_side += time[i + 1] - time[i] if i + 1 < n else 0
+        else:
+            settle = i + 1
+    return {
+        'n_samples': n,
+        'duration': time[-1],
+        'first_move_latency': first_move_latency,
+        'n_direction_changes': n_direction_changes,
+        'final_pos': pos[-1],
+        'final_side': final_side,
+        'time_at_final_side': time_at_final_side,
+        'settle_time': time[settle],
+        'path_length': path_length,
+        'max_extent': max(abs(p) for p in pos),
+        'confidence': abs(pos[-1]) / SLIDER_MAX,
+        'path_efficiency': abs(pos[-1]) / path_length if path_length > 0 else np.nan,
+    }
+
+
+def features_loop(task_structs):
+    rows = [trace_features_loop(trace['pos'], trace['time'])
+            for task_struct in task_structs for trace in task_struct['slider_positions'] if trace]
+    return {field: np.array([row[field] for row in rows]) for field in FEATURE_FIELDS}
+
+
+def run(n_sessions=100):
+    sessions = simulated_sessions(n_sessions)
+
+    t0 = time.perf_counter()
+    loop = features_loop(sessions)
+    loop_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    vectorized = session_features(sessions)
+    vectorized_s = time.perf_counter() - t0
+
+    mismatched = [field for field in FEATURE_FIELDS
+                  if not np.allclose(loop[field], vectorized[field], equal_nan=True)]
+    return {
+        'n_sessions': n_sessions,
+        'n_traces': len(vectorized['trial']),
+        'n_samples': int(vectorized['n_samples'].sum()),
+        'mismatched_features': mismatched,
+        'agree': not mismatched,
+        'loop_s': loop_s,
+        'vectorized_s': vectorized_s,
+        'speedup': loop_s / vectorized_s,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sessions), indent=2))
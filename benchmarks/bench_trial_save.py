@@ -0,0 +1,141 @@
+"""
+Per-trial save cost over a whole session: appending the full task_struct
+to the .pkl after every trial (the original run_session), the trial
+journal written inline, and the journal's background writer (display
+thread enqueue cost).
+
+Run from the repository root:
+    python -m benchmarks.bench_trial_save
+"""
+
+import argparse
+import json
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.filter_picklable import filter_picklable
+from src.trial_journal import TrialJournal, BackgroundTrialWriter
+from src.trial_table import new_trial_table
+
+
+def make_task_struct(n_trials=192, n_trials_per_block=48, seed=0):
+    """task_struct with the sizes and types of a real session."""
+    rng = np.random.default_rng(seed)
+    trials = new_trial_table(n_trials)
+    trials['category'] = rng.integers(4, size=n_trials)
+    trials['axis'] = rng.integers(2, size=n_trials)
+    trials['pair'] = rng.integers(3, size=n_trials)
+    trials['prompt_variant'] = rng.integers(2, size=n_trials)
+    trials['response_variant'] = rng.integers(2, size=n_trials)
+    trials['cue'] = rng.integers(1, 3, size=n_trials)
+    trials['prompt_type'] = 1
+    trials['stim1'] = 2 * np.arange(n_trials)
+    trials['stim2'] = 2 * np.arange(n_trials) + 1
+    trials['stim1_position'] = trials['stim2_position'] = 3
+    trials['fixation_time'] = rng.uniform(0.9, 1.2, n_trials)
+    trials['isi'] = rng.uniform(2, 2.4, n_trials)
+    trials['break_trial'][n_trials_per_block - 1:n_trials - 1:n_trials_per_block] = True
+    return {
+        'sub_id': 'bench',
+        'n_trials': n_trials,
+        'n_trials_per_block': n_trials_per_block,
+        'trials': trials,
+        'trial_strings': {
+            'stims': [f'../stimuli/Task_Stim_New_v1/Animals/Pair1/img_{i}_{j}.jpg'
+                      for i in range(n_trials) for j in range(2)],
+            'instructions': ['Which image was more colorful?'],
+            'response_instructions': ['Use the slider'],
+        },
+        'correct_responses': rng.integers(1, 3, size=n_trials).astype(float),
+        'response_time': np.full(n_trials, np.nan),
+        'slider_positions': [None] * n_trials,
+        'trial_time': np.full(n_trials, np.nan),
+        'resp_key': np.full(n_trials, np.nan),
+        'complete_flag': 1,
+    }
+
+
+def fill_trial(task_struct, t_i, rng):
+    """Responses and flip times of one simulated trial."""
+    t = 100.0 + 10 * t_i
+    trial_struct = {name: t + offset for offset, name in enumerate(
+        ['fixation_flip', 'instruction1_flip', 'stim1_flip', 'stim1_off_flip', 'delay_flip',
+         'stim2_flip', 'responseinstruction_flip', 'response_on_flip', 'response_submit_flip',
+         'response_end_flip'])}
+    task_struct['resp_key'][t_i] = rng.integers(1, 3)
+    task_struct['response_time'][t_i] = rng.uniform(0.4, 2.0)
+    task_struct['trial_time'][t_i] = rng.uniform(8, 10)
+    if task_struct['trials']['response_variant'][t_i] == 1:
+        n = int(rng.integers(30, 180))
+        task_struct['slider_positions'][t_i] = {'pos': rng.uniform(-0.4, 0.4, n), 'time': np.arange(n) / 60}
+    return trial_struct
+
+
+def run_session(task_struct, save_trial, seed=0):
+    """Simulate the per-trial save of a session; returns per-trial save times."""
+    rng = np.random.default_rng(seed)
+    trial_struct_cell = [None] * task_struct['n_trials']
+    times = []
+    for t_i in range(task_struct['n_trials']):
+        trial_struct = fill_trial(task_struct, t_i, rng)
+        trial_struct_cell[t_i] = trial_struct
+        task_struct['trial_struct_cell'] = trial_struct_cell
+        t0 = time.perf_counter()
+        save_trial(t_i, trial_struct)
+        times.append(time.perf_counter() - t0)
+    return np.array(times)
+
+
+def summarize(times, path):
+    return {
+        'first_trial_s': float(times[0]),
+        'last_trial_s': float(times[-1]),
+        'median_s': float(np.median(times)),
+        'max_s': float(times.max()),
+        'total_s': float(times.sum()),
+        'file_bytes': Path(path).stat().st_size,
+    }
+
+
+def run(n_trials=192, seed=0):
+    results = {'n_trials': n_trials}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Original: re-pickle the whole task_struct every trial
+        task_struct = make_task_struct(n_trials, seed=seed)
+        pkl_path = Path(tmp) / 'legacy.pkl'
+
+        def save_legacy(t_i, trial_struct):
+            with open(pkl_path, 'ab') as f:
+                pickle.dump({'task_struct': task_struct}, f)
+
+        results['legacy_pickle'] = summarize(run_session(task_struct, save_legacy, seed), pkl_path)
+
+        # Journal, written on the calling thread
+        task_struct = make_task_struct(n_trials, seed=seed)
+        journal = TrialJournal(Path(tmp) / 'inline.journal').open(task_struct)
+        times = run_session(task_struct, lambda t_i, trial_struct: journal.append_trial(t_i, trial_struct, task_struct), seed)
+        journal.close()
+        results['journal_inline'] = summarize(times, journal.path)
+
+        # Journal, written by the background writer (default fsync policy)
+        task_struct = make_task_struct(n_trials, seed=seed)
+        journal = TrialJournal(Path(tmp) / 'background.journal').open(filter_picklable(task_struct))
+        writer = BackgroundTrialWriter(journal).start()
+        times = run_session(task_struct, lambda t_i, trial_struct: writer.append_trial(t_i, trial_struct, task_struct), seed)
+        stats = writer.close()
+        results['journal_background_enqueue'] = summarize(times, journal.path)
+        results['journal_background_write_median_s'] = float(np.median(stats['write_latency']))
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trials', type=int, default=192)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.trials, args.seed), indent=2))
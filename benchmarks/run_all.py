@@ -0,0 +1,82 @@
+"""
+Run every benchmark and print one JSON document (tagged with the git
+commit), so results can be compared across commits. Benchmarks whose
+dependencies are missing (e.g. PsychoPy / an OpenGL context) are reported
+as skipped instead of failing the run.
+
+Run from the repository root:
+    python -m benchmarks.run_all [--output results.json]
+    xvfb-run -a python -m benchmarks.run_all   # include the PsychoPy benchmarks on a headless machine
+"""
+
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+
+BENCHMARKS = [
+    'bench_markers',
+    'bench_trial_save',
+    'bench_emu_log_index',
+    'bench_stim_cache',
+    'bench_correct_responses',
+    'bench_schedule',
+    'bench_slider_features',
+    'bench_session',
+    'bench_render_plan',
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(name):
+    try:
+        module = importlib.import_module(f'benchmarks.{name}')
+    except ImportError as e:
+        return {'skipped': f'missing dependency: {e.name or e}'}
+
+    t0 = time.perf_counter()
+    try:
+        result = module.run()
+    except Exception as e:
+        # e.g. no display for a PsychoPy window; keep the other results
+        return {'error': f'{type(e).__name__}: {e}', 'traceback': traceback.format_exc()}
+    return {'elapsed_s': time.perf_counter() - t0, 'result': result}
+
+
+def run_all(names=None):
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': {},
+    }
+    for name in names or BENCHMARKS:
+        print(f'Running {name}...', file=sys.stderr, flush=True)
+        results['benchmarks'][name] = run_benchmark(name)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='run only these benchmarks')
+    parser.add_argument('--output', help='also write the JSON to this file')
+    args = parser.parse_args()
+    results = run_all(args.only)
+    text = json.dumps(results, indent=2, default=float)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
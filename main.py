@@ -4,13 +4,14 @@ Run this script to start the task.
 """
 
 from math import log
+import argparse
+import contextlib
 import os
 import pdb
 import sys
 from datetime import datetime
 from pathlib import Path
 import pickle
-import pandas as pd
 
 from psychopy import core, visual, event
 # Optional hardware imports - only needed if TTL/EyeLink are used
@@ -27,6 +28,8 @@ from src.open_logfile import open_logfile
 from src.eye_link_setup import eye_link_setup
 from src.terminate_experiment import terminate_experiment
 from src.filter_picklable import filter_picklable
+from src.headless import HeadlessSession, SimulatedResponder
+from src.session_export import export_session
 
 # Set up base folder
 basefolder = Path(__file__).parent.parent#.parent
@@ -36,11 +39,16 @@ os.chdir(task_code_folder)
 # log_dir = Path("..") / "patientData" / "neuralLogs"
 LOG_PATH = None ###
 
-def main():
+def main(headless=False, sub_id=None, seed=None, accuracy=0.85, schedule_seed=None):
     """Main function to run the verbal instruction task, WM version."""
     
     # Initialize task parameters
-    task_struct, disp_struct = init_task()
+    if headless:
+        # Simulated participant: no prompts, no Blackrock, hidden window
+        task_struct, disp_struct = init_task(sub_id=sub_id or 'sim', blackrock_enabled=0,
+                                                debug=1, headless=True, schedule_seed=schedule_seed)
+    else:
+        task_struct, disp_struct = init_task(schedule_seed=schedule_seed)
     
     # Save initial task structure
     output_file = task_struct['output_folder'] / task_struct['file_name']
@@ -52,20 +60,21 @@ def main():
     # Set up blackrock comments if not in debug mode and enabled
     if not task_struct['debug'] and task_struct['blackrock_enabled']:
         
-        from src.send_blackrock_comment import send_blackrock_comment
+        from src.send_blackrock_comment import send_blackrock_comment, open_blackrock_session
         
-        if LOG_PATH is None:
+        log_path = LOG_PATH
+        if log_path is None:
             # Ensure log directory exists
             log_dir = Path("..") / "patientData" / "neuralLogs"
             log_dir.mkdir(parents=True, exist_ok=True)
 
-            LOG_PATH = log_dir / f"{task_struct['sub_id']}_log.csv"
+            # The CSV (and its header) is written by the EMU log index on 'start'
+            log_path = log_dir / f"{task_struct['sub_id']}_log.csv"
 
-            if not LOG_PATH.exists():
-                df = pd.DataFrame(columns=["emu_id", "file_string"])
-                df.to_csv(LOG_PATH, index=False)
+        task_struct['log_path'] = log_path
 
-        task_struct['log_path'] = LOG_PATH
+        # Open the NSP links once for the whole session
+        open_blackrock_session()
     
     # Setting up EyeLink if required
     if task_struct['eye_link_mode']:
@@ -121,19 +130,47 @@ def main():
                                log_path=task_struct['log_path'])
     
     # Run the task
-    task_struct, disp_struct = run_session(task_struct, disp_struct)
-    # Save data to file
-    with open(output_file.with_suffix('.pkl'), 'wb') as f:
-        pickle.dump({'task_struct': filter_picklable(task_struct, "task_struct"), 
-                     'disp_struct': filter_picklable(disp_struct, "disp_struct")}, f)
-    
-    # Finishing up
-    finish_experiment(task_struct, disp_struct)
+    if headless:
+        responder = SimulatedResponder(task_struct, accuracy=accuracy, seed=seed)
+        session = HeadlessSession(disp_struct['win'], responder, disp_struct['frame_period'])
+    else:
+        session = contextlib.nullcontext()
+
+    with session:
+        task_struct, disp_struct = run_session(task_struct, disp_struct)
+
+        # Save data to file
+        with open(output_file.with_suffix('.pkl'), 'wb') as f:
+            pickle.dump({'task_struct': filter_picklable(task_struct, "task_struct"), 
+                         'disp_struct': filter_picklable(disp_struct, "disp_struct")}, f)
+
+        # Per-trial / slider tables for cohort analysis
+        if task_struct.get('columnar_export'):
+            try:
+                export_session(task_struct)
+            except Exception as e:
+                print(f"Warning: columnar export failed ({e}); the .pkl is complete")
+
+        # Finishing up
+        finish_experiment(task_struct, disp_struct)
+
+    if headless:
+        print(f"Simulated session: {session.summary(task_struct)}")
     
     # Close the window
     disp_struct['win'].close()
     core.quit()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true',
+                        help='run the whole session with a simulated participant and a virtual clock')
+    parser.add_argument('--sub-id', default=None, help='participant id for --headless (default: sim)')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the simulated participant')
+    parser.add_argument('--accuracy', type=float, default=0.85, help='simulated participant accuracy')
+    parser.add_argument('--schedule-seed', type=int, default=None,
+                        help='seed of the trial schedule (reproduces a session; default: random)')
+    args = parser.parse_args()
+    main(headless=args.headless, sub_id=args.sub_id, seed=args.seed, accuracy=args.accuracy,
+         schedule_seed=args.schedule_seed)
 
@@ -0,0 +1,97 @@
+"""
+Long-lived connection to the Blackrock NSPs, opened once per experiment
+instead of once per comment.
+"""
+
+from os import getenv
+
+from src.cbmex_utils import format_cbmex_event
+
+
+class BlackrockSession:
+    def __init__(self, cbpy=None, ips=None, max_retries=1):
+        """
+        cbpy: cbpy-like module (defaults to cerebus.cbpy); a local fake
+              module with open/set_comment/close can be passed for tests
+        ips: list of NSP addresses (defaults to NSP1_IP / NSP2_IP env vars)
+        max_retries: reconnect attempts per comment when a link fails
+        """
+        if cbpy is None:
+            from src.cbmex_utils import cbpy
+            if cbpy is None:
+                raise ImportError("cerebus.cbpy is not installed")
+        self.cbpy = cbpy
+        self.ips = ips
+        self.max_retries = max_retries
+        self.is_open = False
+        self.n_reconnects = 0
+
+    def open(self):
+        """Open a link to every NSP. Call once before the task starts."""
+        if self.ips is None:
+            self.ips = [getenv("NSP1_IP"), getenv("NSP2_IP")]
+        if not all(self.ips):
+            raise RuntimeError("Missing NSP1_IP / NSP2_IP environment variables.")
+
+        for inst in range(len(self.ips)):
+            self._open_instance(inst)
+        self.is_open = True
+        return self
+
+    def _open_instance(self, inst):
+        try:
+            self.cbpy.open(instance=inst, parameter={'inst-addr': self.ips[inst]})
+        except Exception:
+            print(f"Issue opening NSP{inst+1}")
+            raise ConnectionError("Error connecting to one or more NSPs")
+
+    def _close_instance(self, inst):
+        try:
+            self.cbpy.close(inst)
+        except Exception:
+            pass
+
+    def reconnect(self, inst):
+        """Drop and re-open the link to a single NSP."""
+        self._close_instance(inst)
+        self._open_instance(inst)
+        self.n_reconnects += 1
+
+    def send_comment(self, event, file_string, additional_text=''):
+        """
+        Send a comment to every NSP, reconnecting a link that fails.
+        Closes the session after stop / kill / error events.
+        """
+        if not self.is_open:
+            self.open()
+
+        eventCode, eventColor, closeAfter = format_cbmex_event(event, file_string, additional_text)
+
+        for idx in range(len(self.ips)):
+            comment = f'{eventCode}_NSP-{idx+1}'
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.cbpy.set_comment(comment, rgba_tuple=eventColor, instance=idx)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise ConnectionError(f"Could not send comment to NSP{idx+1}: {e}")
+                    print(f"Lost link to NSP{idx+1}, reconnecting")
+                    self.reconnect(idx)
+
+        if closeAfter:
+            self.close()
+
+    def close(self):
+        """Close every NSP link. Safe to call more than once."""
+        if not self.is_open:
+            return
+        for inst in range(len(self.ips)):
+            self._close_instance(inst)
+        self.is_open = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,7 +1,11 @@
 from os import path, listdir, getenv
 from pandas import read_csv
 from subprocess import run
-from cerebus import cbpy
+# Optional hardware import - only needed if Blackrock comments are used
+try:
+    from cerebus import cbpy
+except ImportError:
+    cbpy = None
 
 PORT_NAMES = ['NSP1', 'NSP2']
 
@@ -52,7 +56,7 @@ def gensave_filename(log_path, log_table, emu_num, subj_id, task, save_entry=Tru
     # return file string for comments sake
     return file_string
 
-def send_cbmex_comment(event, file_string, additional_text='', **kwargs):
+def format_cbmex_event(event, file_string, additional_text=''):
     # Instantiate the event message and color
     eventCode = ''
     eventColor = (0,255,255,255)#16777215
@@ -82,6 +86,11 @@ def send_cbmex_comment(event, file_string, additional_text='', **kwargs):
         case _:          # In any other case, send a white message with the event name as the message
             eventCode = f'{event}-{file_string}'
 
+    return eventCode, eventColor, closeAfter
+
+def send_cbmex_comment(event, file_string, additional_text='', **kwargs):
+    eventCode, eventColor, closeAfter = format_cbmex_event(event, file_string, additional_text)
+
     for idx, _ in enumerate(PORT_NAMES):
         # combine event code with nsp suffix to sen d as comment
         comment = f'{eventCode}_NSP-{idx+1}'
@@ -95,5 +104,3 @@ def send_cbmex_comment(event, file_string, additional_text='', **kwargs):
         cbpy.close(0) # NSP-1
         cbpy.close(1) # NSP-2
        
-
-
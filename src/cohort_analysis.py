@@ -0,0 +1,302 @@
+"""
+Cohort analysis: finds every session under patientData/<sub>/taskLogs and
+trainingLogs, reduces each one (on a process pool) to per-condition counts
+and RT sums over the category x axis x cue x response variant grid, and
+combines them across sessions and subjects with array operations. Task
+and training sessions are analyzed separately (task only by default); they
+are pooled into one grid only when asked to.
+
+Per-session results are cached in patientData/.analysis_cache, keyed by the
+session file's content hash, so a re-run over hundreds of sessions only
+loads the new or changed files.
+
+Run from the repository root:
+    python -m src.cohort_analysis [patientData] [--kind task training] [--pool] [--workers N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.schedule_engine import TASK_DESIGN
+from src.session_export import load_session_file, trial_columns
+
+LOG_KINDS = {'taskLogs': 'task', 'trainingLogs': 'training'}
+
+CACHE_FOLDER = '.analysis_cache'
+CACHE_VERSION = 1  # bump when the per-session summary changes
+
+# Condition grid: (factor, trial column, levels)
+CONDITION_FACTORS = [
+    ('category', 'category', TASK_DESIGN['factors']['category']),
+    ('axis', 'axis', TASK_DESIGN['factors']['axis']),
+    ('cue', 'cue', sorted(TASK_DESIGN['factors']['cue'])),  # 1: cue, 2: retrocue
+    ('response_variant', 'response_variant', TASK_DESIGN['factors']['response']),
+]
+CONDITION_SHAPE = tuple(len(levels) for _, _, levels in CONDITION_FACTORS)
+N_CONDITIONS = int(np.prod(CONDITION_SHAPE))
+
+# Per-condition sums kept for every session
+SUMMARY_FIELDS = ['n_trials', 'n_responded', 'n_correct', 'rt_sum', 'rt_sumsq']
+
+
+def discover_sessions(root):
+    """
+    Every session file under root/<sub>/taskLogs and trainingLogs (and
+    root/taskLogs, trainingLogs, where init_task writes): the .pkl, or the
+    .journal of a session whose .pkl is missing.
+
+    Returns:
+    --------
+    sessions : list of dict
+        'path', 'subject' (<sub> folder name, None at the top level) and
+        'kind' ('task' / 'training')
+    """
+    root = Path(root)
+    sessions = []
+    for log_folder, kind in LOG_KINDS.items():
+        for folder in [root / log_folder] + sorted(root.glob(f'*/{log_folder}')):
+            pickles = sorted(folder.glob('*.pkl'))
+            stems = {p.stem for p in pickles}
+            journals = [p for p in sorted(folder.glob('*.journal')) if p.stem not in stems]
+            subject = folder.parent.name if folder.parent != root else None
+            for path in pickles + journals:
+                sessions.append({'path': path, 'subject': subject, 'kind': kind})
+    return sessions
+
+
+def file_hash(path):
+    """SHA-1 of a session file, so an appended or rewritten file is analyzed again."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def condition_codes(columns):
+    """Flat condition index of every trial (-1 outside the grid)."""
+    codes = np.zeros(len(columns['trial']), dtype=np.int64)
+    inside = np.ones(len(codes), dtype=bool)
+    for _, column, levels in CONDITION_FACTORS:
+        levels = np.asarray(levels)
+        values = np.asarray(columns[column])
+        level_index = np.searchsorted(levels, values)
+        found = (level_index < len(levels)) & (levels[np.minimum(level_index, len(levels) - 1)] == values)
+        inside &= found
+        codes = codes * len(levels) + np.where(found, level_index, 0)
+    return np.where(inside, codes, -1)
+
+
+def summarize_session(path):
+    """
+    Per-condition counts and RT sums of one session file.
+
+    Returns:
+    --------
+    summary : dict
+        SUMMARY_FIELDS arrays of shape (N_CONDITIONS,), plus 'sub_id',
+        'n_trials_total' and 'complete_flag'
+    """
+    task_struct = load_session_file(path)
+    columns = trial_columns(task_struct)
+    codes = condition_codes(columns)
+    keep = codes >= 0
+    codes = codes[keep]
+    responded = columns['responded'][keep]
+    rt = np.where(responded & np.isfinite(columns['response_time'][keep]),
+                  columns['response_time'][keep], 0.0)
+
+    def per_condition(weights=None):
+        return np.bincount(codes, weights=weights, minlength=N_CONDITIONS)[:N_CONDITIONS]
+
+    return {
+        'sub_id': str(task_struct.get('sub_id')),
+        'n_trials_total': int(task_struct['n_trials']),
+        'complete_flag': int(task_struct.get('complete_flag') or 0),
+        'n_trials': per_condition().astype(np.int64),
+        'n_responded': per_condition(responded.astype(float)).astype(np.int64),
+        'n_correct': per_condition(columns['correct'][keep].astype(float)).astype(np.int64),
+        'rt_sum': per_condition(rt),
+        'rt_sumsq': per_condition(rt ** 2),
+    }
+
+
+def _cache_path(cache_dir, file_hash):
+    return Path(cache_dir) / f'{file_hash}_v{CACHE_VERSION}.npz'
+
+
+def load_cached_summary(cache_dir, file_hash):
+    path = _cache_path(cache_dir, file_hash)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            summary = {field: data[field] for field in SUMMARY_FIELDS}
+            summary.update(json.loads(str(data['meta'])))
+        return summary
+    except (OSError, ValueError, KeyError):
+        return None  # unreadable entry, recomputed
+
+
+def save_cached_summary(cache_dir, file_hash, summary):
+    path = _cache_path(cache_dir, file_hash)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {key: summary[key] for key in ('sub_id', 'n_trials_total', 'complete_flag')}
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp.npz')
+    np.savez(tmp_path, meta=np.array(json.dumps(meta)),
+             **{field: summary[field] for field in SUMMARY_FIELDS})
+    os.replace(tmp_path, path)
+
+
+def _summarize_uncached(args):
+    """Pool worker: summarize one file and store it in the cache."""
+    path, file_hash, cache_dir = args
+    try:
+        summary = summarize_session(path)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    save_cached_summary(cache_dir, file_hash, summary)
+    return summary
+
+
+def analyze_cohort(root, kinds=('task',), workers=None, cache_dir=None, pool=False):
+    """
+    Per-condition accuracy and RT across every session under root.
+
+    Parameters:
+    -----------
+    root : str or Path
+        patientData folder
+    kinds : tuple of str
+        'task' and / or 'training' sessions
+    workers : int, optional
+        Processes loading new sessions (default: CPU count)
+    cache_dir : str or Path, optional
+        Default: root/.analysis_cache
+    pool : bool
+        Must be True to combine more than one kind in one grid; training
+        sessions have a different trial mix, so they aren't pooled with
+        task sessions by accident
+
+    Returns:
+    --------
+    cohort : dict
+        'sessions': per-session info (path, subject, kind, sub_id, error);
+        'subjects': subject names (sub_id for top-level logs); SUMMARY_FIELDS stacked per session
+        (n_sessions, *CONDITION_SHAPE) and summed per subject
+        (n_subjects, *CONDITION_SHAPE); 'accuracy', 'rt_mean', 'rt_std'
+        pooled over all sessions (CONDITION_SHAPE) and per subject;
+        'n_loaded' / 'n_cached' counts; 'kinds'
+    """
+    kinds = tuple(kinds)
+    if len(set(kinds)) > 1 and not pool:
+        raise ValueError(f"analyze_cohort: pass pool=True to combine {kinds} sessions, "
+                         "or analyze each kind separately")
+    cache_dir = Path(cache_dir) if cache_dir is not None else Path(root) / CACHE_FOLDER
+    sessions = [s for s in discover_sessions(root) if s['kind'] in kinds]
+
+    summaries = [None] * len(sessions)
+    to_load = []
+    for i, session in enumerate(sessions):
+        session['hash'] = file_hash(session['path'])
+        summaries[i] = load_cached_summary(cache_dir, session['hash'])
+        if summaries[i] is None:
+            to_load.append(i)
+    if to_load:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [(sessions[i]['path'], sessions[i]['hash'], cache_dir) for i in to_load]
+            for i, summary in zip(to_load, executor.map(_summarize_uncached, jobs)):
+                summaries[i] = summary
+
+    ok = []
+    for session, summary in zip(sessions, summaries):
+        session['path'] = str(session['path'])
+        if 'error' in summary:
+            session['error'] = summary['error']
+            print(f"Warning: could not analyze {session['path']}: {summary['error']}")
+        else:
+            session['sub_id'] = summary['sub_id']
+            if session['subject'] is None:
+                session['subject'] = summary['sub_id']
+            session['complete_flag'] = summary['complete_flag']
+            ok.append(summary)
+
+    n_ok = len(ok)
+    stacked = {field: (np.stack([s[field] for s in ok]) if ok else np.zeros((0, N_CONDITIONS)))
+               .reshape((n_ok,) + CONDITION_SHAPE) for field in SUMMARY_FIELDS}
+
+    ok_sessions = [s for s in sessions if 'error' not in s]
+    subjects = sorted({s['subject'] for s in ok_sessions})
+    subject_index = np.array([subjects.index(s['subject']) for s in ok_sessions], dtype=int)
+    per_subject = {}
+    for field, values in stacked.items():
+        summed = np.zeros((len(subjects),) + CONDITION_SHAPE)
+        np.add.at(summed, subject_index, values)
+        per_subject[field] = summed
+
+    cohort = {
+        'kinds': kinds,
+        'sessions': sessions,
+        'subjects': subjects,
+        'condition_factors': [(name, list(levels)) for name, _, levels in CONDITION_FACTORS],
+        'per_session': stacked,
+        'per_subject': per_subject,
+        'n_loaded': len(to_load),
+        'n_cached': len(sessions) - len(to_load),
+    }
+    cohort.update(condition_stats({field: values.sum(axis=0) for field, values in stacked.items()}))
+    cohort['per_subject_stats'] = condition_stats(per_subject)
+    return cohort
+
+
+def condition_stats(sums):
+    """Accuracy (over responded trials), RT mean and SD from summed SUMMARY_FIELDS arrays."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = sums['n_responded']
+        rt_mean = sums['rt_sum'] / n
+        rt_var = np.maximum(sums['rt_sumsq'] / n - rt_mean ** 2, 0) * n / (n - 1)
+        return {
+            'n_trials': sums['n_trials'],
+            'accuracy': sums['n_correct'] / n,
+            'response_rate': n / sums['n_trials'],
+            'rt_mean': rt_mean,
+            'rt_std': np.sqrt(rt_var),
+        }
+
+
+def format_table(cohort):
+    """One line per condition: pooled trials, accuracy and RT."""
+    names = [name for name, _ in cohort['condition_factors']]
+    lines = ['\t'.join(names + ['n_trials', 'accuracy', 'rt_mean', 'rt_std'])]
+    for index in np.ndindex(*CONDITION_SHAPE):
+        levels = [str(levels[i]) for (_, levels), i in zip(cohort['condition_factors'], index)]
+        lines.append('\t'.join(levels + [
+            str(int(cohort['n_trials'][index])),
+            f"{cohort['accuracy'][index]:.3f}",
+            f"{cohort['rt_mean'][index]:.3f}",
+            f"{cohort['rt_std'][index]:.3f}",
+        ]))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Per-condition accuracy and RT over every session.')
+    parser.add_argument('root', nargs='?', default=repo_root / 'patientData')
+    parser.add_argument('--kind', choices=['task', 'training'], nargs='+', default=['task'])
+    parser.add_argument('--pool', action='store_true', help='combine the --kind sessions in one table')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    kinds = list(dict.fromkeys(args.kind))
+    for kind_group in ([tuple(kinds)] if args.pool else [(kind,) for kind in kinds]):
+        cohort = analyze_cohort(args.root, kind_group, args.workers, pool=args.pool)
+        print(f"{' + '.join(kind_group)}: {len(cohort['sessions'])} sessions from {len(cohort['subjects'])} "
+              f"subjects ({cohort['n_loaded']} loaded, {cohort['n_cached']} cached)")
+        print(format_table(cohort))
@@ -0,0 +1,171 @@
+"""
+Background dispatcher that sends Blackrock comments off the render thread,
+so NSP latency never delays a win.flip().
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class CommentDispatcher:
+    def __init__(self, send_fn, maxsize=64, clock=time.perf_counter, submit_timeout=0.5):
+        """
+        send_fn: called as send_fn(event=..., task=..., additional_text=...)
+                 on the worker thread (e.g. send_blackrock_comment with
+                 log_path bound)
+        maxsize: bound on queued, not yet sent comments
+        clock: high-resolution clock used for enqueue / send timestamps
+               (pass core.getTime to line them up with flip times)
+        submit_timeout: longest submit() waits on a full queue before the
+                        marker is dropped (counted in stats()['n_dropped'])
+        """
+        self.send_fn = send_fn
+        self.clock = clock
+        self.submit_timeout = submit_timeout
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = None
+        self.n_unsent = 0
+
+        # Per-marker records, appended by the worker thread only (under lock,
+        # so stats() always sees equal-length lists)
+        self.lock = threading.Lock()
+        self.events = []
+        self.texts = []
+        self.enqueue_times = []
+        self.send_start_times = []
+        self.send_end_times = []
+        self.queue_depths = []
+        self.errors = []
+
+        # Backpressure counters, updated by the render thread only
+        self.max_queue_depth = 0
+        self.backpressure_count = 0
+        self.backpressure_time = 0.0
+        self.dropped = []      # (event, additional_text, enqueue time) of markers never queued
+        self.stalled = False   # last wait on a full queue timed out
+
+    def start(self):
+        """Start the worker thread."""
+        self.thread = threading.Thread(target=self._run, name='CommentDispatcher', daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, event, task, additional_text=''):
+        """
+        Queue a comment and return immediately. The enqueue timestamp is
+        taken here, before any waiting, so it marks when the event happened.
+
+        On a full queue this waits up to submit_timeout for the worker, then
+        drops the marker with a warning. While the worker stays stuck (the
+        queue is still full after a timed-out wait), further markers are
+        dropped without waiting, so a dead NSP link can't stall the flips.
+        """
+        t_enqueue = self.clock()
+        depth = self.queue.qsize()
+        item = (event, task, additional_text, t_enqueue, depth)
+        try:
+            self.queue.put_nowait(item)
+            self.stalled = False
+        except queue.Full:
+            self.backpressure_count += 1
+            try:
+                if self.stalled:
+                    raise queue.Full
+                self.queue.put(item, timeout=self.submit_timeout)
+            except queue.Full:
+                if not self.stalled:
+                    print(f"Warning: comment queue still full after {self.submit_timeout} s; "
+                          f"dropping markers until the worker catches up")
+                self.stalled = True
+                self.dropped.append((event, additional_text, t_enqueue))
+            self.backpressure_time += self.clock() - t_enqueue
+        self.max_queue_depth = max(self.max_queue_depth, min(depth + 1, self.queue.maxsize))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            event, task, additional_text, t_enqueue, depth = item
+            t_start = self.clock()
+            try:
+                self.send_fn(event=event, task=task, additional_text=additional_text)
+            except Exception as e:
+                print(f"Warning: Blackrock comment '{event}' failed: {e}")
+                with self.lock:
+                    self.errors.append((len(self.events), str(e)))
+            t_end = self.clock()
+
+            with self.lock:
+                self.events.append(event)
+                self.texts.append(additional_text)
+                self.enqueue_times.append(t_enqueue)
+                self.send_start_times.append(t_start)
+                self.send_end_times.append(t_end)
+                self.queue_depths.append(depth)
+            self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued comment has been sent."""
+        self.queue.join()
+
+    def is_alive(self):
+        """True while the worker thread may still be calling send_fn."""
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self, timeout=5.0):
+        """
+        Send the remaining comments, stop the worker and return stats. If
+        the worker is still busy after timeout (e.g. a hung NSP link), the
+        comments left in the queue are counted as unsent and the worker is
+        abandoned; stats()['worker_alive'] is then True. Returns within
+        about timeout even when the queue is full.
+        """
+        if self.is_alive():
+            deadline = time.monotonic() + timeout
+            try:
+                self.queue.put(None, timeout=timeout)
+                sentinel_queued = True
+            except queue.Full:
+                sentinel_queued = False  # worker stuck with a full queue
+            self.thread.join(max(deadline - time.monotonic(), 0.0))
+            if self.thread.is_alive():
+                self.n_unsent = max(self.queue.qsize() - sentinel_queued, 0)
+                print(f"Warning: comment worker still busy after {timeout} s; "
+                      f"{self.n_unsent} queued comments were not sent")
+        return self.stats()
+
+    def stats(self):
+        """Per-marker latencies plus queue depth / backpressure counters."""
+        with self.lock:
+            events = list(self.events)
+            texts = list(self.texts)
+            enqueue_times = np.array(self.enqueue_times)
+            send_start_times = np.array(self.send_start_times)
+            send_end_times = np.array(self.send_end_times)
+            queue_depths = np.array(self.queue_depths, dtype=int)
+            errors = list(self.errors)
+        return {
+            'events': events,
+            'additional_text': texts,
+            'enqueue_time': enqueue_times,
+            'send_start_time': send_start_times,
+            'send_end_time': send_end_times,
+            'queue_wait': send_start_times - enqueue_times,
+            'send_latency': send_end_times - enqueue_times,
+            'queue_depth': queue_depths,
+            'max_queue_depth': self.max_queue_depth,
+            'queue_maxsize': self.queue.maxsize,
+            'backpressure_count': self.backpressure_count,
+            'backpressure_time': self.backpressure_time,
+            'n_sent': len(events) - len(errors),
+            'n_unsent': self.n_unsent + len(self.dropped),
+            'n_dropped': len(self.dropped),
+            'dropped_events': [event for event, _, _ in self.dropped],
+            'errors': errors,
+            'worker_alive': self.is_alive(),
+        }
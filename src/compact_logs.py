@@ -0,0 +1,121 @@
+"""
+Compaction of session pickles written by the older run_session, which
+appended a full task_struct snapshot to the .pkl after every trial. A
+crashed or interrupted session's file can hold up to n_trials + 1
+concatenated snapshots (the first also holds disp_struct). Compaction
+keeps the last complete snapshot (with the first snapshot's disp_struct;
+records are streamed one at a time, see session_reader) and rewrites the
+file as that single pickle, which is what main.py writes for a finished
+session.
+
+Compact every taskLogs / trainingLogs pickle from the repository root with
+    python -m src.compact_logs patientData [--dry-run] [--workers N]
+"""
+
+import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.session_reader import read_last_snapshot
+
+LOG_FOLDERS = ('taskLogs', 'trainingLogs')
+
+def compact_file(path, dry_run=False, keep_original=False):
+    """
+    Rewrite a multi-snapshot session pickle as its last complete snapshot.
+
+    The compact file is written under a temporary name, read back, and only
+    then renamed over the original (kept as <name>.pkl.orig with
+    keep_original). Files holding a single complete record and no
+    truncated tail are left alone.
+
+    Returns:
+    --------
+    result : dict
+        'path', 'n_records', 'size_before', 'size_after', 'compacted', and
+        'error' if the file could not be read
+    """
+    path = Path(path)
+    result = {'path': str(path), 'size_before': path.stat().st_size, 'compacted': False}
+    try:
+        snapshot, info = read_last_snapshot(path)
+    except Exception as e:
+        result.update(n_records=0, size_after=result['size_before'], error=f'{type(e).__name__}: {e}')
+        return result
+    result['n_records'] = info['n_records']
+    result['size_after'] = result['size_before']
+    if info['n_records'] <= 1 and not info['truncated']:
+        return result
+
+    data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+    result['size_after'] = len(data)
+    if dry_run:
+        return result
+
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(tmp_path, 'rb') as f:
+        pickle.load(f)  # raises (and keeps the original) if the rewrite is unreadable
+    if keep_original:
+        os.replace(path, path.with_suffix(path.suffix + '.orig'))
+    os.replace(tmp_path, path)
+    result['compacted'] = True
+    return result
+
+
+def find_session_pickles(root):
+    """Every .pkl below a taskLogs / trainingLogs folder under root."""
+    return sorted(p for p in Path(root).rglob('*.pkl') if any(part in LOG_FOLDERS for part in p.parts))
+
+
+def compact_tree(root, workers=None, dry_run=False, keep_original=False):
+    """
+    compact_file on every session pickle under root, on a process pool
+    (unpickling is CPU-bound).
+
+    Returns:
+    --------
+    results : list of dict
+        compact_file result per file
+    summary : dict
+        File counts and bytes reclaimed
+    """
+    paths = find_session_pickles(root)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(compact_file, paths, [dry_run] * len(paths), [keep_original] * len(paths)))
+    compactable = [r for r in results if 'error' not in r and r['size_after'] != r['size_before']]
+    summary = {
+        'n_files': len(results),
+        'n_compactable': len(compactable),
+        'n_compacted': sum(r['compacted'] for r in results),
+        'n_errors': sum('error' in r for r in results),
+        'bytes_before': sum(r['size_before'] for r in results),
+        'bytes_after': sum(r['size_after'] for r in results),
+    }
+    summary['bytes_reclaimed'] = summary['bytes_before'] - summary['bytes_after']
+    return results, summary
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Compact multi-snapshot session pickles to their last snapshot.')
+    parser.add_argument('root', nargs='?', default=repo_root / 'patientData')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true', help='report sizes without rewriting')
+    parser.add_argument('--keep-original', action='store_true', help='keep the original as <name>.pkl.orig')
+    args = parser.parse_args()
+
+    results, summary = compact_tree(args.root, args.workers, args.dry_run, args.keep_original)
+    for r in results:
+        if 'error' in r:
+            print(f"{r['path']}: could not read ({r['error']})")
+        elif r['size_after'] != r['size_before']:
+            print(f"{r['path']}: {r['n_records']} snapshots, {r['size_before']} -> {r['size_after']} bytes")
+    verb = 'would reclaim' if args.dry_run else 'reclaimed'
+    print(f"{summary['n_compactable']} of {summary['n_files']} files had several snapshots or a truncated tail; "
+          f"{verb} {summary['bytes_reclaimed'] / 1e6:.1f} MB")
@@ -0,0 +1,73 @@
+"""
+In-memory index of the neuralLogs EMU CSV. The EMU id and file string are
+resolved once per task, so sending a comment never touches the CSV.
+"""
+
+import csv
+import os
+from pathlib import Path
+
+LOG_COLUMNS = ["emu_id", "file_string"]
+
+
+class EmuLogIndex:
+    def __init__(self, log_path, task):
+        """
+        log_path: path to the <sub_id>_log.csv file
+        task: short task name used in the file string (e.g. 'DCWM')
+        """
+        self.log_path = Path(log_path)
+        self.task = task
+        self.subj_id = self.log_path.name.split('_')[0].split('.')[0]
+        self.emu_num = None
+        self.file_string = None
+
+    def _last_emu_id(self):
+        """Read the CSV once and return the last emu_id (None if empty)."""
+        if not self.log_path.exists():
+            return None
+        last = None
+        with open(self.log_path, newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('emu_id'):
+                    last = row['emu_id']
+        return int(float(last)) if last is not None else None
+
+    def _make_file_string(self, emu_num):
+        return f'EMU-{emu_num:04}_subj-{self.subj_id}_{self.task}'
+
+    def _append_entry(self, emu_num, file_string):
+        """
+        Append one row with a single O_APPEND write, so a crash can never
+        leave a half-rewritten log (the old path rewrote the whole CSV).
+        """
+        needs_header = not self.log_path.exists() or self.log_path.stat().st_size == 0
+        lines = ''
+        if needs_header:
+            lines += ','.join(LOG_COLUMNS) + '\n'
+        lines += f'{emu_num},{file_string}\n'
+
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, lines.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def start(self):
+        """Allocate the next EMU id, log it, and cache the file string."""
+        last = self._last_emu_id()
+        self.emu_num = 1 if last is None else last + 1
+        self.file_string = self._make_file_string(self.emu_num)
+        self._append_entry(self.emu_num, self.file_string)
+        return self.file_string
+
+    def current(self):
+        """File string of the running task (read from the CSV only once)."""
+        if self.file_string is None:
+            last = self._last_emu_id()
+            if last is None:
+                raise KeyError("Log table is empty!")
+            self.emu_num = last
+            self.file_string = self._make_file_string(self.emu_num)
+        return self.file_string
@@ -19,9 +19,15 @@ def finish_experiment(task_struct, disp_struct):
     
     # Send final Blackrock comment if enabled
     if task_struct['blackrock_enabled']:
-        from src.send_blackrock_comment import send_blackrock_comment
-        send_blackrock_comment(event="stop", task="DCWM", 
-                               log_path=task_struct['log_path'])
+        from src.send_blackrock_comment import send_blackrock_comment, close_blackrock_session
+        if task_struct.get('comment_dispatch', {}).get('worker_alive'):
+            # The comment worker is still inside a cbpy call on the same NSP
+            # session; sending / closing from here would race with it
+            print("Warning: comment worker still running; not sending the stop comment")
+        else:
+            send_blackrock_comment(event="stop", task="DCWM", 
+                                   log_path=task_struct['log_path'])
+            close_blackrock_session()
     
     # Wrapping up EyeLink file
     if task_struct['eye_link_mode']:
@@ -0,0 +1,164 @@
+"""
+Opt-in per-phase frame recorder: keeps every flip timestamp of the session
+in NumPy arrays and reports intended vs achieved phase durations and
+dropped frames.
+"""
+
+import numpy as np
+
+
+class FrameRecorder:
+    def __init__(self, frame_period, capacity=65536):
+        """
+        frame_period: measured refresh period of the window, in seconds
+        capacity: initial number of flips to allocate for (grows if needed)
+        """
+        self.frame_period = frame_period
+
+        # One entry per flip
+        self.flip_times = np.empty(capacity, dtype=np.float64)
+        self.flip_phase = np.empty(capacity, dtype=np.int32)
+        self.flip_wait = np.empty(capacity, dtype=np.float64)  # intended wait before this flip (NaN: open-ended)
+        self.n_flips = 0
+        self.pending_wait = 0.0
+
+        # One entry per phase instance (e.g. trial 12 / stim1)
+        self.phase_names = []           # interned phase names
+        self.phase_name_ids = {}
+        self.phase_name = []            # index into phase_names
+        self.phase_trial = []
+        self.phase_intended = []
+        self.phase_first_flip = []      # index into flip_times
+
+    def start_phase(self, name, trial, intended=np.nan):
+        """Mark the start of a phase; following flips are counted towards it."""
+        if name not in self.phase_name_ids:
+            self.phase_name_ids[name] = len(self.phase_names)
+            self.phase_names.append(name)
+        self.phase_name.append(self.phase_name_ids[name])
+        self.phase_trial.append(trial)
+        self.phase_intended.append(intended)
+        self.phase_first_flip.append(self.n_flips)
+
+    def pause(self, duration=None):
+        """
+        Mark an intentional wait before the next flip (core.wait, a screen
+        flipped outside the recorder, polling without flips). duration is
+        the intended length in seconds and is not counted as dropped frames;
+        None (open-ended, e.g. a break screen) skips that interval entirely.
+        """
+        self.pending_wait += np.nan if duration is None else duration
+
+    def record(self, flip_time):
+        """Store one flip timestamp (the value returned by win.flip())."""
+        if flip_time is None:
+            return
+        if self.n_flips == len(self.flip_times):
+            self.flip_times = np.resize(self.flip_times, 2 * len(self.flip_times))
+            self.flip_phase = np.resize(self.flip_phase, 2 * len(self.flip_phase))
+            self.flip_wait = np.resize(self.flip_wait, 2 * len(self.flip_wait))
+        self.flip_times[self.n_flips] = flip_time
+        self.flip_phase[self.n_flips] = len(self.phase_name) - 1
+        self.flip_wait[self.n_flips] = self.pending_wait
+        self.pending_wait = 0.0
+        self.n_flips += 1
+
+    def phase_table(self):
+        """
+        Per phase instance: number of flips, achieved duration (first flip of
+        this phase to first flip of the next), intended duration and dropped
+        frames (flip intervals longer than one refresh period, less any
+        intended wait marked with pause(); open-ended waits are skipped).
+        """
+        n_phases = len(self.phase_name)
+        flip_times = self.flip_times[:self.n_flips]
+        flip_phase = self.flip_phase[:self.n_flips]
+        first = np.array(self.phase_first_flip, dtype=np.int64)
+
+        n_frames = np.bincount(flip_phase[flip_phase >= 0], minlength=n_phases)[:n_phases]
+
+        # Onset of each phase, and of the phase after it
+        has_flip = n_frames > 0
+        onset = np.full(n_phases, np.nan)
+        onset[has_flip] = flip_times[first[has_flip]]
+        next_onset = np.full(n_phases, np.nan)
+        next_onset[:-1] = onset[1:]
+        achieved = next_onset - onset
+
+        # Dropped frames: each interval should be one frame period plus the
+        # intended wait before it
+        wait = self.flip_wait[1:self.n_flips]
+        intervals = np.diff(flip_times) - np.nan_to_num(wait)
+        n_missed = np.clip(np.round(intervals / self.frame_period) - 1, 0, None)
+        in_phase = (flip_phase[1:] >= 0) & np.isfinite(wait)
+        dropped = np.bincount(flip_phase[1:][in_phase], weights=n_missed[in_phase], minlength=n_phases)[:n_phases]
+
+        intended = np.array(self.phase_intended, dtype=np.float64)
+        return {
+            'phase': np.array(self.phase_name, dtype=np.int32),
+            'trial': np.array(self.phase_trial, dtype=np.int32),
+            'n_frames': n_frames,
+            'onset': onset,
+            'intended': intended,
+            'achieved': achieved,
+            'error': achieved - intended,
+            'dropped_frames': dropped.astype(np.int32),
+        }
+
+    def summary(self, trials=None):
+        """
+        Aggregate phase_table by phase name, optionally over a subset of trials.
+
+        Returns:
+        --------
+        summary : dict
+            phase name -> n, mean intended / achieved duration, mean and max
+            absolute error, and total dropped frames
+        """
+        table = self.phase_table()
+        keep = np.ones(len(table['phase']), dtype=bool)
+        if trials is not None:
+            keep = np.isin(table['trial'], trials)
+
+        summary = {}
+        for name_id, name in enumerate(self.phase_names):
+            mask = keep & (table['phase'] == name_id)
+            if not mask.any():
+                continue
+            abs_error = np.abs(table['error'][mask])
+            summary[name] = {
+                'n': int(mask.sum()),
+                'intended_mean': _nan_stat(np.nanmean, table['intended'][mask]),
+                'achieved_mean': _nan_stat(np.nanmean, table['achieved'][mask]),
+                'abs_error_mean': _nan_stat(np.nanmean, abs_error),
+                'abs_error_max': _nan_stat(np.nanmax, abs_error),
+                'dropped_frames': int(table['dropped_frames'][mask].sum()),
+            }
+        return summary
+
+    def format_summary(self, trials=None):
+        """Text table of summary() for the console."""
+        lines = [f"{'phase':<24}{'n':>5}{'intended':>10}{'achieved':>10}{'|err| max':>11}{'dropped':>9}"]
+        for name, row in self.summary(trials).items():
+            lines.append(f"{name:<24}{row['n']:>5}{row['intended_mean']:>10.3f}{row['achieved_mean']:>10.3f}"
+                         f"{row['abs_error_max']:>11.4f}{row['dropped_frames']:>9}")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        """Compact arrays plus summary, for saving with the session data."""
+        return {
+            'frame_period': self.frame_period,
+            'phase_names': list(self.phase_names),
+            'flip_times': self.flip_times[:self.n_flips].copy(),
+            'flip_phase': self.flip_phase[:self.n_flips].copy(),
+            'flip_wait': self.flip_wait[:self.n_flips].copy(),
+            'phases': self.phase_table(),
+            'summary': self.summary(),
+        }
+
+
+def _nan_stat(fn, values):
+    """fn over the finite values, NaN (without a warning) if there are none."""
+    if not np.isfinite(values).any():
+        return np.nan
+    return float(fn(values))
@@ -4,11 +4,16 @@ for each trial in advance (to compare with actual button presses later).
 """
 
 import numpy as np
-from pathlib import Path
+
+from src.stim_manifest import load_manifest
+from src.response_coding import get_correct_responses_coded
+from src.trial_table import prompt_text, trial_stims
+
 
 def get_correct_responses_training(task_struct):
     """
-    Calculate correct responses for all training trials.
+    Calculate correct responses for all training trials, in one batched pass over
+    integer-coded trials (see response_coding).
     
     Parameters:
     -----------
@@ -20,30 +25,37 @@ def get_correct_responses_training(task_struct):
     correct_responses : numpy array
         Array of correct response keys (1 or 2) for each trial
     """
-    # Getting unique characteristics of each stimulus
-    # Note: Paths need to be adjusted based on actual stimulus folder structure
+    return get_correct_responses_coded(task_struct, load_manifest('Training', required=True))
 
-    stim_folder = 'stimuli/Training/'
 
-    stims = [
-        [stim_folder + 'Animals/giraffe_19s.jpg', ['Colorful', 'Multiple']],
-        [stim_folder + 'Animals/polar_bear_22s.jpg', ['notColorful', 'Single']],
-        [stim_folder + 'Cars/taxi_02s.jpg', ['notColorful', 'Old']],
-        [stim_folder + 'Cars/bus_10n.jpg', ['Colorful', 'New']],
-        [stim_folder + 'Faces/boy_05s.jpg', ['New', 'Round']],
-        [stim_folder + 'Faces/man_02s.jpg', ['Old', 'Elongated']],
-        [stim_folder + 'Fruits/mango_13s.jpg', ['Single', 'Elongated']],
-        [stim_folder + 'Fruits/cranberry_07n.jpg', ['Multiple', 'Round']],
-    ]
+def get_correct_responses_training_loop(task_struct):
+    """
+    Calculate correct responses for all training trials, one trial at a time.
+    Reference implementation that get_correct_responses_training is checked against
+    (benchmarks/bench_correct_responses.py).
+    
+    Parameters:
+    -----------
+    task_struct : dict
+        Task structure containing trial information
+    
+    Returns:
+    --------
+    correct_responses : numpy array
+        Array of correct response keys (1 or 2) for each trial
+    """
+    # Features of each stimulus, indexed by filename
+    manifest = load_manifest('Training', required=True)
     
     n_trials = task_struct['n_trials']
     correct_responses = np.full(n_trials, np.nan)
     # trial_variant = np.array(task_struct['anti_task']) + np.array(task_struct['prompt_variant'])
-    trial_variant = np.array(task_struct['prompt_variants'])
+    trials = task_struct['trials']
+    trial_variant = trials['prompt_variant']
     
     for t_i in range(n_trials):
-        axis = task_struct['trial_axis'][t_i]
-        category = task_struct['trial_categories'][t_i]
+        axis = trials['axis'][t_i]
+        category = trials['category'][t_i]
         trial_axis_name = task_struct['category_and_axis'][1][category][axis]
         
         # Determine target feature based on trial axis and variant
@@ -66,25 +78,17 @@ def get_correct_responses_training(task_struct):
         else:
             target_feature = ''
         
-        trial_text = [task_struct['left_text'][t_i], task_struct['right_text'][t_i]]
+        trial_text = list(prompt_text(task_struct, t_i))
         
         # Other conditions than identical
-        stim1_path = task_struct['trial_stims'][t_i][0]
-        stim2_path = task_struct['trial_stims'][t_i][1]
-        
-        # Find stimulus indices
-        stim1_idx = None
-        stim2_idx = None
-        for i, (stim_path, _) in enumerate(stims):
-            if stim_path in stim1_path or Path(stim1_path).name in stim_path:
-                stim1_idx = i
-            if stim_path in stim2_path or Path(stim2_path).name in stim_path:
-                stim2_idx = i
+        stim1_path, stim2_path = trial_stims(task_struct, t_i)
         
-        if stim1_idx is None or stim2_idx is None:
+        stim1_features = manifest.features(stim1_path)
+        stim2_features = manifest.features(stim2_path)
+        if stim1_features is None or stim2_features is None:
             continue
         
-        stim_features = [stims[stim1_idx][1], stims[stim2_idx][1]]
+        stim_features = [list(stim1_features.values()), list(stim2_features.values())]
         # Check which stimulus has the target feature (1 = first, 2 = second)
         stim_with_target_feature = 2 if target_feature in stim_features[1] else 1
         
@@ -0,0 +1,249 @@
+"""
+Headless simulated-participant mode: runs a full session as fast as the
+machine can draw, for regression testing. Time comes from a virtual clock
+that jumps forward one refresh period per flip (and by the requested
+amount on core.wait), and key presses come from a simulated responder
+instead of the keyboard. run_session / run_session_training are not
+changed; the PsychoPy clock, event and keyboard functions they call are
+swapped out while the session runs.
+"""
+
+import time
+
+import numpy as np
+from psychopy import core, event
+from psychopy.hardware import keyboard
+
+
+class VirtualClock:
+    def __init__(self, start=0.0):
+        """Session time in seconds; only moves when advance() is called."""
+        self.now = start
+
+    def advance(self, dt):
+        if dt is not None and dt > 0:
+            self.now += dt
+        return self.now
+
+
+class SimulatedClock:
+    """Stand-in for core.Clock that reads the virtual clock."""
+
+    virtual_clock = None
+
+    def __init__(self):
+        self._start = self.virtual_clock.now
+
+    def getTime(self):
+        return self.virtual_clock.now - self._start
+
+    def reset(self, newT=0.0):
+        self._start = self.virtual_clock.now + newT
+
+    def addTime(self, t):
+        self._start -= t
+
+
+class SimulatedKeyPress:
+    def __init__(self, name, t_down, rt=None):
+        self.name = name
+        self.tDown = t_down
+        self.rt = rt
+
+
+class SimulatedKeyboard:
+    """Stand-in for psychopy.hardware.keyboard.Keyboard (slider responses)."""
+
+    responder = None
+
+    def __init__(self, *args, **kwargs):
+        self.clock = SimulatedClock()
+
+    def clearEvents(self, *args, **kwargs):
+        self.responder.clear_events()
+
+    def getKeys(self, keyList=None, waitRelease=False, clear=True):
+        return [SimulatedKeyPress(key, t, t - self.clock._start)
+                for key, t in self.responder.get_keys(keyList)]
+
+
+class SimulatedResponder:
+    def __init__(self, task_struct, responses=None, accuracy=0.85, rt_median=0.9,
+                 rt_sigma=0.3, miss_rate=0.0, slider_presses=(1, 4), seed=None):
+        """
+        task_struct: task being run (correct_responses, key names, response_time_max)
+        responses: optional script, one (resp_key, rt) per trial; resp_key 1 = up /
+            left, 2 = down / right, NaN = no response. Without a script responses
+            are drawn at random from accuracy / rt_median / rt_sigma / miss_rate.
+        slider_presses: (min, max) number of arrow presses before confirming a
+            slider response
+        seed: seed for the stochastic responder
+        """
+        self.task_struct = task_struct
+        self.responses = responses
+        self.accuracy = accuracy
+        self.rt_median = rt_median
+        self.rt_sigma = rt_sigma
+        self.miss_rate = miss_rate
+        self.slider_presses = slider_presses
+        self.rng = np.random.default_rng(seed)
+        self.clock = None
+
+        self.button_keys = {task_struct['up_key'], task_struct['down_key']}
+        self.slider_keys = {'left', 'right', 'space'}
+        self.continue_key = task_struct['continue_key']
+
+        self.trial = -1
+        self.window_pending = False
+        self.planned = []      # [(time, key)] still to be pressed in this window
+        self.log = []          # [(trial, resp_key, rt)] of every planned response
+
+    def clear_events(self):
+        """Called on event.clearEvents(); the next response poll starts a new trial."""
+        self.window_pending = True
+
+    def choose_response(self, trial):
+        """(resp_key, rt) for one trial, scripted or sampled."""
+        if self.responses is not None:
+            resp_key, rt = self.responses[trial]
+            return resp_key, rt
+
+        if self.rng.random() < self.miss_rate:
+            return np.nan, np.nan
+
+        correct = self.task_struct['correct_responses'][trial]
+        if np.isnan(correct):
+            correct = self.rng.integers(1, 3)
+        resp_key = int(correct) if self.rng.random() < self.accuracy else 3 - int(correct)
+
+        rt = self.rt_median * np.exp(self.rt_sigma * self.rng.standard_normal())
+        rt = min(rt, 0.9 * self.task_struct['response_time_max'])
+        return resp_key, rt
+
+    def plan_window(self, slider):
+        """Schedule the key presses of the response window that starts now."""
+        self.trial += 1
+        self.window_pending = False
+        resp_key, rt = self.choose_response(self.trial)
+        self.log.append((self.trial, resp_key, rt))
+        self.planned = []
+        if np.isnan(resp_key):
+            return
+
+        onset = self.clock.now
+        if not slider:
+            key = self.task_struct['up_key'] if resp_key == 1 else self.task_struct['down_key']
+            self.planned = [(onset + rt, key)]
+            return
+
+        # Slider: a few arrow presses (one per poll) in the chosen direction, then confirm
+        key = 'left' if resp_key == 1 else 'right'
+        n_presses = int(self.rng.integers(self.slider_presses[0], self.slider_presses[1] + 1))
+        press_times = onset + rt * np.linspace(0.3, 0.8, n_presses)
+        self.planned = [(t, key) for t in press_times] + [(onset + rt, 'space')]
+
+    def get_keys(self, keyList=None):
+        """[(key, time)] pressed by now, filtered by keyList."""
+        key_list = set(keyList) if keyList is not None else None
+
+        # Intermission / end-of-session screens: continue straight away
+        if key_list is not None and self.continue_key in key_list and len(key_list) == 1:
+            return [(self.continue_key, self.clock.now)]
+
+        is_button = key_list is not None and key_list <= self.button_keys
+        is_slider = key_list is not None and key_list <= self.slider_keys
+        if not (is_button or is_slider):
+            return []  # never presses quit / pause
+        if self.window_pending:
+            self.plan_window(slider=is_slider)
+
+        # One key per poll, like a participant pressing once per frame
+        if self.planned and self.planned[0][0] <= self.clock.now:
+            _, key = self.planned.pop(0)
+            return [(key, self.clock.now)]
+        return []
+
+
+class HeadlessSession:
+    def __init__(self, win, responder, frame_period=1 / 60):
+        """
+        win: hidden PsychoPy window (init_task(..., headless=True))
+        responder: SimulatedResponder
+        frame_period: virtual time that passes on every flip
+        """
+        self.win = win
+        self.responder = responder
+        self.frame_period = frame_period
+        self.clock = VirtualClock()
+        responder.clock = self.clock
+        self.n_flips = 0
+        self._saved = None
+
+        # Per flip: wall-clock start / end of the real flip and the virtual
+        # time it returned, so benchmarks can split wall time into drawing
+        # and everything between flips
+        self.flip_wall_start = []
+        self.flip_wall_end = []
+        self.flip_virtual = []
+
+    def flip(self, clearBuffer=True):
+        """Draw the frame without waiting for vsync, then advance one refresh."""
+        t0 = time.perf_counter()
+        self._real_flip(clearBuffer=clearBuffer)
+        self.flip_wall_start.append(t0)
+        self.flip_wall_end.append(time.perf_counter())
+        self.n_flips += 1
+        now = self.clock.advance(self.frame_period)
+        self.flip_virtual.append(now)
+        return now
+
+    def get_keys(self, keyList=None, modifiers=False, timeStamped=False):
+        keys = self.responder.get_keys(keyList)
+        if timeStamped:
+            return [[key, t] for key, t in keys]
+        return [key for key, t in keys]
+
+    def wait_keys(self, maxWait=float('inf'), keyList=None, modifiers=False, timeStamped=False, clearEvents=True):
+        keys = self.get_keys(keyList, timeStamped=timeStamped)
+        return keys if keys else [self.responder.continue_key]
+
+    def __enter__(self):
+        SimulatedClock.virtual_clock = self.clock
+        SimulatedKeyboard.responder = self.responder
+        self._saved = {
+            (core, 'getTime'): core.getTime,
+            (core, 'wait'): core.wait,
+            (core, 'Clock'): core.Clock,
+            (event, 'getKeys'): event.getKeys,
+            (event, 'clearEvents'): event.clearEvents,
+            (event, 'waitKeys'): event.waitKeys,
+            (keyboard, 'Keyboard'): keyboard.Keyboard,
+        }
+        core.getTime = lambda *args, **kwargs: self.clock.now
+        core.wait = lambda secs, hogCPUperiod=0.2: self.clock.advance(secs)
+        core.Clock = SimulatedClock
+        event.getKeys = self.get_keys
+        event.clearEvents = lambda eventType=None: self.responder.clear_events()
+        event.waitKeys = self.wait_keys
+        keyboard.Keyboard = SimulatedKeyboard
+
+        self._real_flip = self.win.flip
+        self.win.flip = self.flip
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for (module, name), value in self._saved.items():
+            setattr(module, name, value)
+        self.win.flip = self._real_flip
+        return False
+
+    def summary(self, task_struct):
+        """Virtual session length, flips and accuracy of the simulated run."""
+        correct = np.array(task_struct['correct_responses'], dtype=float)
+        resp = np.array(task_struct['resp_key'], dtype=float)
+        return {
+            'virtual_duration': self.clock.now,
+            'n_flips': self.n_flips,
+            'n_responses': int(np.isfinite(resp).sum()),
+            'accuracy': float(np.nansum(correct == resp) / task_struct['n_trials']),
+        }
@@ -12,15 +12,36 @@ from psychopy.hardware import keyboard
 
 from src.get_instruction_text import get_instruction_text
 from src.get_motor_instruction_text import get_motor_instruction_text
+from src.render_plan import build_render_plan
+from src.stim_manifest import load_manifest
+from src.stim_scan_cache import FolderScanCache, SCAN_CACHE_PATH
+from src.schedule_engine import check_schedule, TASK_DESIGN
+from src.schedule_library import ScheduleLibrary, schedule_columns, SCHEDULE_LIBRARY_PATH
+from src.phase_scheduler import duration_to_frames, quantize_durations
+from src.stim_preprocess import stim_display_sizes, preprocess_images, cached_texture_loader, DEFAULT_WORKERS
+from src.texture_cache import TextureCache, LOOKAHEAD_TRIALS
+from src.trial_table import new_trial_table, StringTable, trial_stims
 from src.get_correct_responses import get_correct_responses
 from src.init_cedrus import init_cedrus # commented out - CEDRUS not used in training
 
 import pdb
 
-def init_task():
+def init_task(sub_id=None, blackrock_enabled=None, debug=None, headless=False, schedule_seed=None):
     """
     Initialize task and display structures.
     
+    Parameters:
+    -----------
+    sub_id, blackrock_enabled, debug : optional
+        Session settings; prompted for on the console when not given
+    headless : bool
+        Open a small hidden window that doesn't wait for vsync, for
+        simulated-participant runs (see headless.py)
+    schedule_seed : int, optional
+        Seed of the trial schedule, prompt types, jitters and stimulus
+        sampling (see schedule_library.py); a random one when not given.
+        Saved as task_struct['schedule_seed'] to reproduce the session.
+
     Returns:
     --------
     task_struct : dict
@@ -28,17 +49,17 @@ def init_task():
     disp_struct : dict
         Dictionary containing display parameters and window handles
     """
-    # Some initial global setup
-    np.random.seed()  # Use system time as seed
-    
     # Get user input
-    sub_id = input('Participant number (XXX):\n')
-    blackrock_enabled = int(input('Blackrock comments enabled? 0=no, 1=yes:\n'))
+    if sub_id is None:
+        sub_id = input('Participant number (XXX):\n')
+    if blackrock_enabled is None:
+        blackrock_enabled = int(input('Blackrock comments enabled? 0=no, 1=yes:\n'))
     # eye_link_mode = int(input('Use Eyelink? 0=no, 1=yes:\n'))
     eye_link_mode = 0  # Eyelink not used in this version
     # use_cedrus = int(input('Use CEDRUS? 0=no, 1=yes:\n'))
     use_cedrus = 0  # CEDRUS not used in training version
-    debug = int(input('Debug mode? 0=no, 1=yes:\n'))
+    if debug is None:
+        debug = int(input('Debug mode? 0=no, 1=yes:\n'))
     
     # Output folder
     output_folder = Path('..') / 'patientData' / 'taskLogs'
@@ -46,9 +67,10 @@ def init_task():
     
     file_name = f"{sub_id}_{datetime.now().strftime('%m-%d-%Y_%H-%M-%S')}"
     
-    # Setting up task variables
-    n_blocks = 4
-    n_trials_per_block = 48
+    # Setting up task variables (factor levels and constraints of the
+    # schedule are in schedule_engine.TASK_DESIGN)
+    n_blocks = TASK_DESIGN['n_blocks']
+    n_trials_per_block = TASK_DESIGN['n_trials_per_block']
     n_trials = n_trials_per_block * n_blocks
     
     # Relevant axis of each trial
@@ -61,127 +83,82 @@ def init_task():
     ]
     category_and_axis = [category_names, axis_names]
     
-    # Which of the two axes belonging to each category will be used in each trial
-    trial_categories = [0, 1, 2, 3] # 4 categories
-    trial_axis = [0, 1] # 2 axes
-    stim_pairs = [0, 1, 2] # 3 pairs of stimuli per category/axis
-    prompt_variants = [0, 1] # which prompt version to use (aspect of the axis)
-    response_variants = [0, 1] # button choice vs slider
-    cue_variants = [2, 1] # retrocue vs cue
-
-    n_categories = len(trial_categories)
-    n_response_variants = len(response_variants)
-    
-    # Guaranteeing a balanced distribution of each category x axis combination
-    x1, x2, x3, x4, x5, x6 = np.meshgrid(trial_categories, trial_axis, stim_pairs, prompt_variants, response_variants, cue_variants, indexing='ij')
-    result = np.column_stack([x1.ravel(), x2.ravel(), x3.ravel(), x4.ravel(), x5.ravel(), x6.ravel()])
-    n = result.shape[0]
-    factor = n_trials // n
-    # result = result * factor
-    result = np.repeat(result, factor, axis=0)
-    if len(result) < n_trials:
-        result = np.concatenate([result, result[:n_trials - len(result)]])
-    
-    # Randomize trial order
-    result = np.random.permutation(result) 
-
-    retro_block1, retro_block2 = make_blocks_for_cue(result, cue_value=2, 
-                                                            n_categories=n_categories, n_response_variants=n_response_variants, 
-                                                            rng=None)
-    cue_block1, cue_block2 = make_blocks_for_cue(result, cue_value=1, 
-                                                                n_categories=n_categories, n_response_variants=n_response_variants, 
-                                                                rng=None)
-    
-    # randomize which block to start with
-    if random.random() < 0.5:
-        sorted_idxs = np.concatenate([
-            retro_block1,  # Block 1: retrocue
-            cue_block1,    # Block 2: cue
-            retro_block2,  # Block 3: retrocue
-            cue_block2     # Block 4: cue
-        ])
-    else:
-        sorted_idxs = np.concatenate([
-            cue_block1,    # Block 1: cue
-            retro_block1,  # Block 2: retrocue
-            cue_block2,    # Block 3: cue
-            retro_block2   # Block 4: retrocue
-        ])
-    
-    result = result[sorted_idxs]
-
-    # ensure no back-to-back same (category, stim_pair) within each block
-    blocks = np.split(result, 4)
-    fixed_blocks = [avoid_back_to_back_same_stim(b) for b in blocks]
-    result = np.vstack(fixed_blocks)
+    # Balanced schedule: blocks alternate cue / retrocue (random first), each
+    # block balanced in (category, response variant), and no back-to-back
+    # trials with the same (category, stim_pair). Looked up by seed in the
+    # precomputed library (generated on the fly for seeds outside it).
+    schedule_library = ScheduleLibrary(SCHEDULE_LIBRARY_PATH)
+    if schedule_seed is None:
+        schedule_seed = schedule_library.random_seed()
+    schedule_trials, schedule_source = schedule_library.schedule(schedule_seed)
+    result = schedule_columns(schedule_trials)
+    schedule_report = check_schedule(result, TASK_DESIGN)
+    schedule_report['source'] = schedule_source
+    if not schedule_report['valid']:
+        print(f"Warning: schedule constraints not all met: {schedule_report}")
     
-    trial_categories = result[:, 0]
-    trial_axis_list = result[:, 1]
-    stim_pairs = result[:, 2]
-    prompt_variants = result[:, 3]
-    response_variants = result[:, 4]
-    cue_variants = result[:, 5]
+    # One record per trial; strings are interned in trial_strings
+    trials = new_trial_table(n_trials)
+    trials['category'] = result[:, 0]
+    trials['axis'] = result[:, 1]
+    trials['pair'] = result[:, 2]
+    trials['prompt_variant'] = result[:, 3]
+    trials['response_variant'] = result[:, 4]
+    trials['cue'] = result[:, 5]
+    trials['prompt_type'] = schedule_trials['prompt_type']
+    stims = StringTable()
+    instructions = StringTable()
+    response_instructions = StringTable()
     
     # Getting stimuli to use in each trial
     stim_folder = Path('..') / 'stimuli' / 'Task_Stim_New_v1'
-    trial_stims = [[None, None] for _ in range(n_trials)]
-    stim1_position = np.full(n_trials, np.nan)
-    stim2_position = np.full(n_trials, np.nan)
-    break_trial = np.zeros(n_trials, dtype=int)
-    
-    # Response prompts
-    prompt_types = [random.randint(1, 2) for _ in range(n_trials)]
-    left_text = [None] * n_trials
-    right_text = [None] * n_trials
-    trial_instructions = [None] * n_trials
-    response_instructions = [None] * n_trials
+    manifest = load_manifest('Task_Stim_New_v1')  # folder listings
+    scan_cache = FolderScanCache(SCAN_CACHE_PATH)  # folders the manifest doesn't list, scanned once
     
+    # Stimulus sampling follows the schedule seed too
+    stim_rng = random.Random(schedule_seed)
+
     # Trial loop to set up stimuli and instructions
     for t_i in range(n_trials):
-        axis = trial_axis_list[t_i]
-        category = trial_categories[t_i]
-        stim_pair = stim_pairs[t_i]
+        trial = trials[t_i]  # record view: field assignments write to the table
+        axis = int(trial['axis'])
+        category = int(trial['category'])
+        stim_pair = int(trial['pair'])
         
         # Loading stimuli
+        folder_images = manifest.folder_images(stim_folder, category_names[category], stim_pair + 1)
         trial_folder = stim_folder / category_names[category] / f'Pair{stim_pair + 1}'
-        folder_images = list(trial_folder.glob('*.jpg'))
         if len(folder_images) == 0:
-            folder_images = list(trial_folder.glob('*.JPG'))
+            folder_images = scan_cache.images(trial_folder)
         
         # Sampling 2 random images from folder (without replacement)
-        sampled_images = random.sample(folder_images, min(2, len(folder_images)))
-        trial_stims[t_i][0] = str(sampled_images[0])
-        trial_stims[t_i][1] = str(sampled_images[1]) if len(sampled_images) > 1 else str(sampled_images[0])
+        sampled_images = stim_rng.sample(folder_images, min(2, len(folder_images)))
+        trial['stim1'] = stims.add(str(sampled_images[0]))
+        trial['stim2'] = stims.add(str(sampled_images[-1]))
         
         # Randomly select position of stimuli (1 = left / 2 = right / 3 = center)
-        stim1_position[t_i] = 3
-        stim2_position[t_i] = 3
+        trial['stim1_position'] = 3
+        trial['stim2_position'] = 3
         
         if (t_i + 1) % n_trials_per_block == 0 and t_i < n_trials - 1:
-            break_trial[t_i] = 1
+            trial['break_trial'] = True
         
         # Instructions for task
         trial_axis_name = axis_names[category][axis]
-        trial_instructions[t_i] = get_instruction_text(
-            category, trial_axis_name, prompt_variants[t_i]
-        )
+        trial['instruction'] = instructions.add(get_instruction_text(
+            category, trial_axis_name, int(trial['prompt_variant'])
+        ))
         
         # Instructions for response
-        response_instructions[t_i] = get_motor_instruction_text(
-            response_variants[t_i]
-        )
-
-        # Response prompts
-        if prompt_types[t_i] == 1:
-            left_text[t_i] = 'First'
-            right_text[t_i] = 'Second'
-        else:
-            left_text[t_i] = 'Second'
-            right_text[t_i] = 'First'
-
-    # create time jitters
-    fixations = np.random.uniform(0.9, 1.2, n_trials).round(3)
-    delays = np.random.uniform(2, 2.4, n_trials).round(3)
+        trial['response_instruction'] = response_instructions.add(get_motor_instruction_text(
+            int(trial['response_variant'])
+        ))
+    scan_cache.save()
+
+    # time jitters (ms in the schedule; snapped to frames once the refresh
+    # rate is known)
+    trials['fixation_time'] = schedule_trials['fixation_ms'] / 1000  # changed from fixed 1.0
+    trials['isi'] = schedule_trials['isi_ms'] / 1000  # changed from fixed 0.8 or 2.0
     
     # Create task struct
     task_struct = {
@@ -195,30 +172,21 @@ def init_task():
         'n_blocks': n_blocks,
         'n_trials_per_block': n_trials_per_block,
         'n_trials': n_trials,
-        'trial_cues': cue_variants,
         'category_names': category_names,
         'axis_names': axis_names,
         'category_and_axis': category_and_axis,
-        'trial_categories': trial_categories,
-        'trial_axis': trial_axis_list,
-        'prompt_variants': prompt_variants,
-        'response_variants': response_variants,
-        'trial_instructions': trial_instructions,
-        'response_instructions': response_instructions,
-        'prompt_types': prompt_types,
         'stim_folder': stim_folder,
-        'trial_stims': trial_stims,
-        'trial_pairs': stim_pairs,
-        'stim1_position': stim1_position,
-        'stim2_position': stim2_position,
-        'break_trial': break_trial,
-        'left_text': left_text,
-        'right_text': right_text,
-        'fixation_time': fixations, # changed from fixed 1.0,
+        'trials': trials,
+        'trial_strings': {
+            'stims': stims.strings,
+            'instructions': instructions.strings,
+            'response_instructions': response_instructions.strings,
+        },
+        'schedule_seed': schedule_seed,
+        'schedule_report': schedule_report,
         'instruction_time_min': 2.0,
         'instruction_time_max': 2.0,
         'stim1_time': 1.0,
-        'ISI': delays, # changed from fixed 0.8 or 2.0 
         'stim2_time': 1.0,
         'response_instruction_time': 1.0,
         'response_time_max': 3.0,
@@ -229,6 +197,11 @@ def init_task():
         'trial_time': np.full(n_trials, np.nan),
         'resp_key': np.full(n_trials, np.nan),
         'complete_flag': 1,
+        'fsync_policy': 'block', # when trial data is fsync'd: 'trial', 'block' or 'none'
+        'record_frames': False, # opt-in per-phase flip timing / dropped-frame report
+        'texture_cache_size': 12, # max stimulus textures kept loaded (LRU)
+        'decode_workers': DEFAULT_WORKERS, # threads decoding / resizing stimuli at startup
+        'columnar_export': True, # also save trial / slider tables (session_export) at the end
     }
     
     # Get correct responses
@@ -272,7 +245,20 @@ def init_task():
     gray = [0.31, 0.31, 0.31]  # RGB equivalent of 80/255
     
     # Opening window
-    if screen_size is None:
+    if headless:
+        # Hidden and not synced to the display; the virtual clock sets the pace
+        win = visual.Window(
+            size=[800, 600],
+            fullscr=False,
+            screen=0,
+            color=gray,
+            units='pix',
+            allowGUI=False,
+            visible=False,
+            waitBlanking=False,
+            checkTiming=False
+        )
+    elif screen_size is None:
         win = visual.Window(
             fullscr=full_screen,
             screen=0,
@@ -290,6 +276,27 @@ def init_task():
             allowGUI=not full_screen
         )
     
+    # Measured refresh rate (falls back to 60 Hz if it can't be measured)
+    if headless:
+        frame_rate = 60.0
+    else:
+        frame_rate = win.getActualFrameRate(nIdentical=10, nMaxFrames=120, nWarmUpFrames=10, threshold=1)
+    if frame_rate is None:
+        print('Warning: could not measure refresh rate, assuming 60 Hz')
+        frame_rate = 60.0
+
+    # Phase durations as whole refresh periods; the jittered fixation/delay
+    # times are snapped too, so the saved durations are the ones shown
+    frame_period = 1.0 / frame_rate
+    trials['fixation_frames'], trials['fixation_time'] = quantize_durations(trials['fixation_time'], frame_period)
+    trials['isi_frames'], trials['isi'] = quantize_durations(trials['isi'], frame_period)
+    task_struct['phase_frames'] = {
+        'instruction': duration_to_frames(task_struct['instruction_time_max'], frame_period),
+        'stim1': duration_to_frames(task_struct['stim1_time'], frame_period),
+        'stim2': duration_to_frames(task_struct['stim2_time'], frame_period),
+        'response_instruction': duration_to_frames(task_struct['response_instruction_time'], frame_period),
+    }
+
     # Getting screen center and dimensions
     # Use window-centered coordinates (origin at 0,0) so stimuli are centered
     center_x = 0
@@ -332,6 +339,8 @@ def init_task():
     
     disp_struct['win'] = win
     disp_struct['screen_number'] = 0
+    disp_struct['frame_rate'] = frame_rate
+    disp_struct['frame_period'] = frame_period
     disp_struct['center_x'] = center_x
     disp_struct['center_y'] = center_y
     disp_struct['width'] = width
@@ -342,91 +351,23 @@ def init_task():
     disp_struct['photodiode_box'] = [box_x, box_y, box_size, box_size]
     disp_struct['photodiode_dur'] = 0.05  # seconds
 
-    image_cache = {}
-    for trial_paths in task_struct['trial_stims']:
-        for stim_path in trial_paths:  # [stim1_path, stim2_path]
-            if stim_path not in image_cache:
-                image_cache[stim_path] = visual.ImageStim(
-                    win,
-                    image=stim_path,
-                    units="pix"
-                    # don't set size/pos here, we'll set those per trial
-                )
-
-    # store in task_struct or local var
-    disp_struct['image_cache'] = image_cache
+    # Decode and resize any stimulus missing from the .npy cache, in parallel,
+    # and map each stimulus to its cache file once, so textures loaded later
+    # during the session are plain memory-mapped reads (no hashing / decoding)
+    stim_sizes = stim_display_sizes(task_struct, horizontal_rects)
+    npy_paths = preprocess_images(stim_sizes, n_workers=task_struct['decode_workers'])
+
+    # Stimulus textures live in a bounded LRU cache; run_session loads upcoming
+    # trials' stimuli during idle frames. The first trials are loaded now so
+    # the session starts warm (arrays read in parallel, uploaded here).
+    texture_cache = TextureCache(win, stim_sizes, capacity=task_struct['texture_cache_size'],
+                                 loader=cached_texture_loader(npy_paths))
+    first_stims = [p for t_i in range(min(1 + LOOKAHEAD_TRIALS, task_struct['n_trials']))
+                   for p in trial_stims(task_struct, t_i)]
+    texture_cache.preload(first_stims, n_workers=task_struct['decode_workers'])
+    disp_struct['texture_cache'] = texture_cache
+
+    # Pre-built stimuli for every trial, so the trial loop only calls draw()
+    disp_struct['render_plan'] = build_render_plan(task_struct, disp_struct)
     
     return task_struct, disp_struct
-
-
-
-def make_blocks_for_cue(result, cue_value, n_categories, n_response_variants, rng=None):
-    """
-    For a given cue_value (1 or 2), return two 48-trial blocks
-    that are balanced in (category, response_variant).
-    """
-    if rng is None:
-        rng = np.random.default_rng()
-
-    # All indices with this cue
-    cue_mask = (result[:, 5] == cue_value)
-    idxs = np.where(cue_mask)[0]           # length = 96
-
-    # Extract category and response_variant for those indices
-    cats  = result[idxs, 0].astype(int)    # shape (96,)
-    resps = result[idxs, 4].astype(int)    # shape (96,)
-
-    # Sort by (category, response_variant): groups become contiguous
-    order_within = np.lexsort((resps, cats))   # primary key: cats, secondary: resps
-    sorted_idxs_for_cue = idxs[order_within]
-
-    # We know there are 8 (category, resp) combos
-    n_combos = n_categories * n_response_variants      # 8
-    group_size = len(sorted_idxs_for_cue) // n_combos  # 96 / 8 = 12
-
-    # Reshape to (8 combos, 12 trials per combo)
-    grouped = sorted_idxs_for_cue.reshape(n_combos, group_size)  # (8, 12)
-
-    # First half of each row → block A, second half → block B
-    half = group_size // 2  # 6
-    blockA = grouped[:, :half].ravel()        # (8 * 6,) = (48,)
-    blockB = grouped[:, half:2*half].ravel()  # (48,)
-
-    # Shuffle within each block so categories/resp types are intermixed
-    blockA = blockA[rng.permutation(blockA.shape[0])]
-    blockB = blockB[rng.permutation(blockB.shape[0])]
-
-    return blockA, blockB
-
-
-def avoid_back_to_back_same_stim(block):
-    """
-    block: (N, 6) array of trials for ONE block.
-    Ensures no two consecutive trials share the same (category, stim_pair)
-    (columns 0 and 2). 
-    """
-    rng = np.random.default_rng()
-    
-    block = block.copy()
-    N = block.shape[0]
-
-    for i in range(1, N):
-        # check if current trial has same (category, stim_pair) as previous
-        if np.array_equal(block[i, [0, 2]], block[i-1, [0, 2]]):
-            curr_pair = block[i-1, [0, 2]]  # (category, stim_pair) we want to avoid
-            # find later trials whose (category, stim_pair) differ
-            future = block[i+1:, [0, 2]]    # shape (N-i-1, 2)
-            mask = np.any(future != curr_pair, axis=1)
-            candidates_rel = np.where(mask)[0]
-
-            if candidates_rel.size == 0:
-                # no safe swap found; leave as is (very unlikely)
-                continue
-
-            # pick a random candidate among the safe ones
-            j = i + 1 + rng.choice(candidates_rel)
-
-            # swap i and j
-            block[[i, j]] = block[[j, i]]
-
-    return block
\ No newline at end of file
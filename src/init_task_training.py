@@ -11,13 +11,28 @@ from psychopy.hardware import keyboard
 
 from src.get_instruction_text import get_instruction_text
 from src.get_motor_instruction_text import get_motor_instruction_text
+from src.render_plan import build_render_plan
+from src.stim_manifest import load_manifest
+from src.stim_scan_cache import FolderScanCache, SCAN_CACHE_PATH
+from src.phase_scheduler import duration_to_frames, quantize_durations
+from src.stim_preprocess import stim_display_sizes, preprocess_images, cached_texture_loader, DEFAULT_WORKERS
+from src.texture_cache import TextureCache, LOOKAHEAD_TRIALS
+from src.trial_table import new_trial_table, StringTable, trial_stims
 from src.get_correct_responses_training import get_correct_responses_training
 # from init_cedrus import init_cedrus  # Commented out - using keyboard only
 
-def init_task_training():
+def init_task_training(sub_id=None, blackrock_enabled=None, debug=None, headless=False):
     """
     Initialize task and display structures for training.
     
+    Parameters:
+    -----------
+    sub_id, blackrock_enabled, debug : optional
+        Session settings; prompted for on the console when not given
+    headless : bool
+        Open a small hidden window that doesn't wait for vsync, for
+        simulated-participant runs (see headless.py)
+
     Returns:
     --------
     task_struct : dict
@@ -29,13 +44,16 @@ def init_task_training():
     np.random.seed()
     
     # Get user input
-    sub_id = input('Participant number (sub-XXX):\n')
-    blackrock_enabled = int(input('Blackrock comments enabled? 0=no, 1=yes:\n'))
+    if sub_id is None:
+        sub_id = input('Participant number (sub-XXX):\n')
+    if blackrock_enabled is None:
+        blackrock_enabled = int(input('Blackrock comments enabled? 0=no, 1=yes:\n'))
     # eye_link_mode = int(input('Use Eyelink? 0=no, 1=yes:\n'))
     eye_link_mode = 0  # Always no Eyelink
     # use_cedrus = int(input('Use CEDRUS? 0=no, 1=yes:\n'))  # Commented out - using keyboard only
     use_cedrus = 0  # Always use keyboard (arrow keys)
-    debug = int(input('Debug mode? 0=no, 1=yes:\n'))
+    if debug is None:
+        debug = int(input('Debug mode? 0=no, 1=yes:\n'))
     
     # Output folder
     output_folder = Path('..') / 'patientData' / 'trainingLogs'
@@ -80,64 +98,60 @@ def init_task_training():
     cue_variants = np.array([1] * (n_trials_per_block // 2) + [2] * (n_trials_per_block // 2))
     
     
+    # One record per trial; strings are interned in trial_strings
+    trials = new_trial_table(n_trials)
+    trials['category'] = trial_categories
+    trials['axis'] = trial_axis
+    trials['pair'] = stim_pairs
+    trials['prompt_variant'] = prompt_variants
+    trials['response_variant'] = response_variants
+    trials['cue'] = cue_variants
+    trials['prompt_type'] = [random.randint(1, 2) for _ in range(n_trials)]
+    stims = StringTable()
+    instructions = StringTable()
+    response_instructions = StringTable()
+    
     # Determining which stimuli to use in each trial
     stim_folder = Path('..') / 'stimuli' / 'Training'
-    trial_stims = [[None, None] for _ in range(n_trials)]
-    trial_pairs = np.zeros(n_trials, dtype=int)
-    stim1_position = np.full(n_trials, np.nan)
-    stim2_position = np.full(n_trials, np.nan)
-    break_trial = np.zeros(n_trials, dtype=int)
-    
-    # Response prompts
-    prompt_types = [random.randint(1, 2) for _ in range(n_trials)]
-    left_text = [None] * n_trials
-    right_text = [None] * n_trials
-    trial_instructions = [None] * n_trials
-    response_instructions = [None] * n_trials
+    manifest = load_manifest('Training')  # folder listings
+    scan_cache = FolderScanCache(SCAN_CACHE_PATH)  # folders the manifest doesn't list, scanned once
     
     # Trial loop to set up stimuli and instructions
     for t_i in range(n_trials):
-        axis = trial_axis[t_i]
-        category = trial_categories[t_i]
-        stim_pair = stim_pairs[t_i]
+        trial = trials[t_i]  # record view: field assignments write to the table
+        axis = int(trial['axis'])
+        category = int(trial['category'])
         
         # Loading stimuli
+        folder_images = manifest.folder_images(stim_folder, category_names[category])
         trial_folder = stim_folder / category_names[category] 
-        folder_images = list(trial_folder.glob('*.jpg'))
         if len(folder_images) == 0:
-            folder_images = list(trial_folder.glob('*.JPG'))
+            folder_images = scan_cache.images(trial_folder)
         
         sampled_images = random.sample(folder_images, min(2, len(folder_images)))
-        trial_stims[t_i][0] = str(sampled_images[0])
-        trial_stims[t_i][1] = str(sampled_images[1]) if len(sampled_images) > 1 else str(sampled_images[0])
+        trial['stim1'] = stims.add(str(sampled_images[0]))
+        trial['stim2'] = stims.add(str(sampled_images[-1]))
         
-        stim1_position[t_i] = 3
-        stim2_position[t_i] = 3
+        trial['stim1_position'] = 3
+        trial['stim2_position'] = 3
         
         if (t_i + 1) % n_trials_per_block == 0 and t_i < n_trials - 1:
-            break_trial[t_i] = 1
+            trial['break_trial'] = True
         
         # Instructions
         trial_axis_name = axis_names[category][axis]
-        trial_instructions[t_i] = get_instruction_text(
-            category, trial_axis_name, prompt_variants[t_i],
-        )
+        trial['instruction'] = instructions.add(get_instruction_text(
+            category, trial_axis_name, int(trial['prompt_variant']),
+        ))
 
-        response_instructions[t_i] = get_motor_instruction_text(
-            response_variants[t_i]
-        )
-        
-        # Response prompts
-        if prompt_types[t_i] == 1:
-            left_text[t_i] = 'First'
-            right_text[t_i] = 'Second'
-        else:
-            left_text[t_i] = 'Second'
-            right_text[t_i] = 'First'
+        trial['response_instruction'] = response_instructions.add(get_motor_instruction_text(
+            int(trial['response_variant'])
+        ))
+    scan_cache.save()
 
-    # create time jitters
-    fixations = np.random.uniform(0.9, 1.2, n_trials).round(3)
-    delays = np.random.uniform(2, 2.4, n_trials).round(3)
+    # create time jitters (snapped to frames once the refresh rate is known)
+    trials['fixation_time'] = np.random.uniform(0.9, 1.2, n_trials).round(3)
+    trials['isi'] = np.random.uniform(2, 2.4, n_trials).round(3)
     
     # Create task struct
     task_struct = {
@@ -151,30 +165,19 @@ def init_task_training():
         'n_blocks': n_blocks,
         'n_trials_per_block': n_trials_per_block,
         'n_trials': n_trials,
-        'trial_cues': cue_variants,
         'category_names': category_names,
         'axis_names': axis_names,
         'category_and_axis': category_and_axis,
-        'trial_categories': trial_categories,
-        'trial_axis': trial_axis,
-        'prompt_variants': prompt_variants,
-        'response_variants': response_variants,
-        'trial_instructions': trial_instructions,
-        'response_instructions': response_instructions, 
-        'prompt_types': prompt_types,
         'stim_folder': stim_folder,
-        'trial_stims': trial_stims,
-        'trial_pairs': stim_pairs,
-        'stim1_position': stim1_position,
-        'stim2_position': stim2_position,
-        'break_trial': break_trial,
-        'left_text': left_text,
-        'right_text': right_text,
-        'fixation_time': fixations,
+        'trials': trials,
+        'trial_strings': {
+            'stims': stims.strings,
+            'instructions': instructions.strings,
+            'response_instructions': response_instructions.strings,
+        },
         'instruction_time_min': 2.0,
         'instruction_time_max': 2.0,
         'stim1_time': 1.0,
-        'ISI': delays,
         'stim2_time': 1.0,
         'response_instruction_time': 1.0, 
         'response_time_max': 3.0,
@@ -186,6 +189,11 @@ def init_task_training():
         'trial_time': np.full(n_trials, np.nan),
         'resp_key': np.full(n_trials, np.nan),
         'complete_flag': 1,
+        'fsync_policy': 'block', # when trial data is fsync'd: 'trial', 'block' or 'none'
+        'record_frames': False, # opt-in per-phase flip timing / dropped-frame report
+        'texture_cache_size': 12, # max stimulus textures kept loaded (LRU)
+        'decode_workers': DEFAULT_WORKERS, # threads decoding / resizing stimuli at startup
+        'columnar_export': True, # also save trial / slider tables (session_export) at the end
     }
     
     # Get correct responses
@@ -226,7 +234,20 @@ def init_task_training():
     gray = [0.31, 0.31, 0.31]
     
     # Opening window
-    if screen_size is None:
+    if headless:
+        # Hidden and not synced to the display; the virtual clock sets the pace
+        win = visual.Window(
+            size=[800, 600],
+            fullscr=False,
+            screen=0,
+            color=gray,
+            units='pix',
+            allowGUI=False,
+            visible=False,
+            waitBlanking=False,
+            checkTiming=False
+        )
+    elif screen_size is None:
         win = visual.Window(
             fullscr=full_screen,
             screen=0,
@@ -244,6 +265,27 @@ def init_task_training():
             allowGUI=not full_screen
         )
     
+    # Measured refresh rate (falls back to 60 Hz if it can't be measured)
+    if headless:
+        frame_rate = 60.0
+    else:
+        frame_rate = win.getActualFrameRate(nIdentical=10, nMaxFrames=120, nWarmUpFrames=10, threshold=1)
+    if frame_rate is None:
+        print('Warning: could not measure refresh rate, assuming 60 Hz')
+        frame_rate = 60.0
+
+    # Phase durations as whole refresh periods; the jittered fixation/delay
+    # times are snapped too, so the saved durations are the ones shown
+    frame_period = 1.0 / frame_rate
+    trials['fixation_frames'], trials['fixation_time'] = quantize_durations(trials['fixation_time'], frame_period)
+    trials['isi_frames'], trials['isi'] = quantize_durations(trials['isi'], frame_period)
+    task_struct['phase_frames'] = {
+        'instruction': duration_to_frames(task_struct['instruction_time_max'], frame_period),
+        'stim1': duration_to_frames(task_struct['stim1_time'], frame_period),
+        'stim2': duration_to_frames(task_struct['stim2_time'], frame_period),
+        'response_instruction': duration_to_frames(task_struct['response_instruction_time'], frame_period),
+    }
+
     # Use window-centered coordinates (origin at 0,0) so stimuli are centered
     center_x = 0
     center_y = 0
@@ -283,6 +325,8 @@ def init_task_training():
 
     disp_struct['win'] = win
     disp_struct['screen_number'] = 0
+    disp_struct['frame_rate'] = frame_rate
+    disp_struct['frame_period'] = frame_period
     disp_struct['center_x'] = center_x
     disp_struct['center_y'] = center_y
     disp_struct['width'] = width
@@ -297,19 +341,24 @@ def init_task_training():
     disp_struct['photodiode_box'] = [box_x, box_y, box_size, box_size]
     disp_struct['photodiode_dur'] = 0.05  # seconds
 
-    image_cache = {}
-    for trial_paths in task_struct['trial_stims']:
-        for stim_path in trial_paths:  # [stim1_path, stim2_path]
-            if stim_path not in image_cache:
-                image_cache[stim_path] = visual.ImageStim(
-                    win,
-                    image=stim_path,
-                    units="pix"
-                    # don't set size/pos here, we'll set those per trial
-                )
+    # Decode and resize any stimulus missing from the .npy cache, in parallel,
+    # and map each stimulus to its cache file once, so textures loaded later
+    # during the session are plain memory-mapped reads (no hashing / decoding)
+    stim_sizes = stim_display_sizes(task_struct, horizontal_rects)
+    npy_paths = preprocess_images(stim_sizes, n_workers=task_struct['decode_workers'])
+
+    # Stimulus textures live in a bounded LRU cache; run_session loads upcoming
+    # trials' stimuli during idle frames. The first trials are loaded now so
+    # the session starts warm (arrays read in parallel, uploaded here).
+    texture_cache = TextureCache(win, stim_sizes, capacity=task_struct['texture_cache_size'],
+                                 loader=cached_texture_loader(npy_paths))
+    first_stims = [p for t_i in range(min(1 + LOOKAHEAD_TRIALS, task_struct['n_trials']))
+                   for p in trial_stims(task_struct, t_i)]
+    texture_cache.preload(first_stims, n_workers=task_struct['decode_workers'])
+    disp_struct['texture_cache'] = texture_cache
 
-    # store in task_struct or local var
-    disp_struct['image_cache'] = image_cache
+    # Pre-built stimuli for every trial, so the trial loop only calls draw()
+    disp_struct['render_plan'] = build_render_plan(task_struct, disp_struct)
     
     return task_struct, disp_struct
 
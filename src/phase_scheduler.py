@@ -0,0 +1,84 @@
+"""
+Frame-count-based phase scheduling: phase durations are converted into a
+whole number of refresh periods once, and each phase presents exactly that
+many flips instead of polling a clock until the duration has passed.
+"""
+
+import numpy as np
+
+
+def duration_to_frames(duration, frame_period):
+    """
+    Number of flips closest to a duration (at least one).
+
+    Parameters:
+    -----------
+    duration : float or array-like
+        Duration(s) in seconds
+    frame_period : float
+        Measured refresh period of the window, in seconds
+
+    Returns:
+    --------
+    n_frames : int or np.ndarray of int
+    """
+    n_frames = np.maximum(1, np.rint(np.asarray(duration, dtype=float) / frame_period)).astype(int)
+    if n_frames.ndim == 0:
+        return int(n_frames)
+    return n_frames
+
+
+def quantize_durations(durations, frame_period):
+    """
+    Snap durations to whole refresh periods.
+
+    Returns:
+    --------
+    n_frames : np.ndarray of int
+        Flips per duration
+    quantized : np.ndarray of float
+        n_frames * frame_period, the durations that will actually be shown
+    """
+    n_frames = np.atleast_1d(duration_to_frames(durations, frame_period))
+    return n_frames, n_frames * frame_period
+
+
+def present_frames(n_frames, stims, flip, on_first_frame=None, on_frame=None):
+    """
+    Draw stims and flip exactly n_frames times.
+
+    stims: stimuli drawn before every flip
+    flip: flip function returning the flip time (e.g. flip_with_pd)
+    on_first_frame: called after the first draw, just before the first flip
+        (eyelink message, Blackrock comment / photodiode trigger)
+    on_frame: called after every flip, for small background work that fits
+        in the rest of the frame (e.g. loading one prefetched texture)
+
+    Returns:
+    --------
+    first_flip, last_flip : float
+        Flip times of the first and last frame of the phase
+    """
+    first_flip = last_flip = None
+    for frame in range(n_frames):
+        for stim in stims:
+            stim.draw()
+        if frame == 0 and on_first_frame is not None:
+            on_first_frame()
+        last_flip = flip()
+        if frame == 0:
+            first_flip = last_flip
+        if on_frame is not None:
+            on_frame()
+    return first_flip, last_flip
+
+
+def phase_deviation(first_flip, last_flip, n_frames, frame_period):
+    """
+    Achieved minus scheduled phase duration, in seconds. The phase lasts
+    until the refresh after its last flip; a positive value means frames
+    were dropped.
+    """
+    if first_flip is None or last_flip is None:
+        return np.nan
+    return (last_flip - first_flip + frame_period) - n_frames * frame_period
@@ -0,0 +1,112 @@
+"""
+This function builds a per-trial render plan: every stimulus object a trial
+needs is created once, up front, so the trial loop only calls draw().
+"""
+
+from psychopy import visual
+
+from src.trial_table import instruction_text, prompt_text, response_instruction_text
+
+
+def build_render_plan(task_struct, disp_struct):
+    """
+    Pre-build and reuse the stimuli drawn during trials.
+
+    Text stimuli are cached per unique (slot, string), so the ~8 instruction
+    strings, 2 motor strings and the First/Second labels are each laid out
+    once no matter how many trials use them.
+
+    Parameters:
+    -----------
+    task_struct : dict
+        Task structure (trials, trial_strings)
+    disp_struct : dict
+        Display structure containing window and layout information
+
+    Returns:
+    --------
+    render_plan : dict
+        'fixation': [vertical line, horizontal line]
+        'button_frames': [top frame, bottom frame]
+        'text_stims': {(slot, text): TextStim} cache
+        'trials': per-trial dict of the TextStims to draw in each phase
+    """
+    win = disp_struct['win']
+    width = disp_struct['width']
+    height = disp_struct['height']
+    vertical_rects = disp_struct['vertical_rects']
+
+    fixation = [
+        visual.Line(win, start=[0, -20], end=[0, 20], lineColor='black', lineWidth=5),
+        visual.Line(win, start=[-20, 0], end=[20, 0], lineColor='black', lineWidth=5),
+    ]
+
+    # Top/bottom response frames (changed from left/right)
+    button_frames = []
+    for rect in vertical_rects:
+        frame_rect = [x + offset for x, offset in zip(rect, [-10, -10, 10, 10])]
+        button_frames.append(visual.Rect(
+            win,
+            width=frame_rect[2] - frame_rect[0],
+            height=frame_rect[3] - frame_rect[1],
+            pos=((frame_rect[0] + frame_rect[2])/2, (frame_rect[1] + frame_rect[3])/2),
+            lineColor='black',
+            fillColor=None,
+            lineWidth=5
+        ))
+
+    # Where each kind of text goes on screen
+    slot_kwargs = {
+        'instruction': dict(wrapWidth=win.size[0] * 0.8),
+        'top': dict(pos=((vertical_rects[0][0] + vertical_rects[0][2])/2,
+                         (vertical_rects[0][1] + vertical_rects[0][3])/2)),
+        'bottom': dict(pos=((vertical_rects[1][0] + vertical_rects[1][2])/2,
+                            (vertical_rects[1][1] + vertical_rects[1][3])/2)),
+        'slider_left': dict(pos=(-width * 0.4 / 2, height * 0.15)),
+        'slider_right': dict(pos=(width * 0.4 / 2, height * 0.15)),
+    }
+
+    text_stims = {}
+
+    def get_text_stim(slot, text):
+        key = (slot, text)
+        if key not in text_stims:
+            text_stims[key] = visual.TextStim(
+                win,
+                text=text,
+                color='white',
+                height=48,
+                **slot_kwargs[slot]
+            )
+        return text_stims[key]
+
+    trials = []
+    for t_i in range(task_struct['n_trials']):
+        left_text, right_text = prompt_text(task_struct, t_i)
+        trials.append({
+            'task_instruction': get_text_stim('instruction', instruction_text(task_struct, t_i)),
+            'response_instruction': get_text_stim('instruction', response_instruction_text(task_struct, t_i)),
+            'top_text': get_text_stim('top', left_text),
+            'bottom_text': get_text_stim('bottom', right_text),
+            'slider_left_text': get_text_stim('slider_left', left_text),
+            'slider_right_text': get_text_stim('slider_right', right_text),
+        })
+
+    # Draw everything once into the back buffer so the first real draw of
+    # each stimulus doesn't pay for GL setup mid-trial
+    for stim in fixation + button_frames + list(text_stims.values()):
+        stim.draw()
+    win.clearBuffer()
+
+    return {
+        'fixation': fixation,
+        'button_frames': button_frames,
+        'text_stims': text_stims,
+        'trials': trials,
+    }
+
+
+def reset_trial_text(trial_plan):
+    """Undo the gray-out from the previous use of this trial's text stims."""
+    for key in ['top_text', 'bottom_text', 'slider_left_text', 'slider_right_text']:
+        trial_plan[key].color = 'white'
@@ -0,0 +1,115 @@
+"""
+Integer coding of trials for batched correct-response computation: each
+stimulus is a row of a feature matrix (one column per axis, coded by
+prompt variant), each trial is a set of small integer codes, and the
+correct key of every trial (or of many schedules at once) comes out of
+a handful of array operations.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+# Feature named by prompt variant 0 / 1 of each axis (see get_instruction_text)
+AXIS_FEATURES = {
+    'Colorful': ('notColorful', 'Colorful'),
+    'Count': ('Single', 'Multiple'),
+    'Geometry': ('Elongated', 'Round'),
+    'New': ('Old', 'New'),
+}
+AXIS_NAMES = list(AXIS_FEATURES)
+
+
+def feature_matrix(manifest):
+    """
+    Feature table of a stimulus set.
+
+    Parameters:
+    -----------
+    manifest : StimulusManifest
+        Stimulus set (see stim_manifest.load_manifest)
+
+    Returns:
+    --------
+    stim_index : dict
+        {filename: row of features}
+    features : np.ndarray of int8, shape (n_stims, len(AXIS_NAMES))
+        Prompt variant (0 / 1) whose feature the stimulus has on each axis,
+        -1 if the stimulus has no feature on that axis
+    """
+    stim_index = {name: i for i, name in enumerate(manifest.entries)}
+    features = np.full((len(stim_index), len(AXIS_NAMES)), -1, dtype=np.int8)
+    for name, i in stim_index.items():
+        for axis_name, feature in manifest.entries[name]['features'].items():
+            features[i, AXIS_NAMES.index(axis_name)] = AXIS_FEATURES[axis_name].index(feature)
+    return stim_index, features
+
+
+def encode_trials(task_struct, stim_index):
+    """
+    Integer codes of every trial in task_struct.
+
+    Returns:
+    --------
+    codes : dict of np.ndarray of int, shape (n_trials,)
+        'stim1', 'stim2': feature_matrix rows (-1 if not in the manifest)
+        'axis': column in AXIS_NAMES of the trial's axis (-1 if unknown)
+        'prompt_variant': 0 / 1, which feature of the axis is the target
+        'prompt_type': 1 = 'First' on the left key, 2 = 'Second' on the left key
+    """
+    n_trials = task_struct['n_trials']
+    category_names, axis_names = task_struct['category_and_axis']
+    # (category, axis slot) -> column in AXIS_NAMES
+    axis_lookup = np.array([[AXIS_NAMES.index(name) if name in AXIS_FEATURES else -1
+                             for name in axis_names[c]] for c in range(len(category_names))])
+
+    trials = task_struct['trials'][:n_trials]
+    # Each interned stimulus path is looked up once
+    string_codes = np.array([stim_index.get(Path(path).name, -1)
+                             for path in task_struct['trial_strings']['stims']], dtype=int)
+    return {
+        'stim1': string_codes[trials['stim1']],
+        'stim2': string_codes[trials['stim2']],
+        'axis': axis_lookup[trials['category'].astype(int), trials['axis'].astype(int)],
+        'prompt_variant': trials['prompt_variant'].astype(int),
+        'prompt_type': trials['prompt_type'].astype(int),
+    }
+
+
+def correct_responses_batch(features, stim1, stim2, axis, prompt_variant, prompt_type):
+    """
+    Correct response key of every trial, in one pass.
+
+    The target is the feature of the trial's axis named by its prompt
+    variant; when the second stimulus has it, the answer is 'Second',
+    otherwise 'First'. prompt_type says which key ('First' is key 1 for
+    prompt type 1 and key 2 for prompt type 2).
+
+    Parameters:
+    -----------
+    features : np.ndarray, shape (n_stims, n_axes)
+        From feature_matrix
+    stim1, stim2, axis, prompt_variant, prompt_type : array-like of int
+        Trial codes from encode_trials; any matching shape, e.g.
+        (n_schedules, n_trials) to score many schedules at once
+
+    Returns:
+    --------
+    correct_responses : np.ndarray of float
+        1 or 2, NaN where a stimulus is not in the feature table
+    """
+    stim1, stim2, axis = np.asarray(stim1), np.asarray(stim2), np.asarray(axis)
+    prompt_type = np.asarray(prompt_type)
+
+    stim2_feature = np.where(axis >= 0, features[stim2, np.maximum(axis, 0)], -1)
+    second_has_target = stim2_feature == np.asarray(prompt_variant)
+    correct_key = np.where(second_has_target, 3 - prompt_type, prompt_type).astype(float)
+    correct_key[(stim1 < 0) | (stim2 < 0)] = np.nan
+    return correct_key
+
+
+def get_correct_responses_coded(task_struct, manifest):
+    """correct_responses_batch for the trials of task_struct, stimuli from manifest."""
+    stim_index, features = feature_matrix(manifest)
+    codes = encode_trials(task_struct, stim_index)
+    return correct_responses_batch(features, **codes)
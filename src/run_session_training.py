@@ -7,12 +7,18 @@ import numpy as np
 from psychopy import visual, event, core
 from psychopy.hardware import keyboard
 from pathlib import Path
-import pickle
 
 from src.intermission_screen import intermission_screen
 from src.run_session import (get_motor_instruction_text_for_trial, check_for_control_keys, 
                          get_instruction_text_for_trial, write_log_with_eyelink)
 from src.photodiode_utils import PhotodiodeFlash
+from src.comment_dispatcher import CommentDispatcher
+from src.trial_journal import TrialJournal, BackgroundTrialWriter
+from src.render_plan import reset_trial_text
+from src.frame_recorder import FrameRecorder
+from src.texture_cache import prefetch_upcoming
+from src.trial_table import all_trial_stims
+from src.phase_scheduler import present_frames, phase_deviation
 
 def run_session_training(task_struct, disp_struct):
     """
@@ -81,6 +87,17 @@ def run_session_training(task_struct, disp_struct):
     core.wait(0.05)
     win.flip()
 
+    # Fixation cross, response frames and all trial text are pre-built in init_task_training
+    render_plan = disp_struct['render_plan']
+    session_stims = all_trial_stims(task_struct)  # (first, second) path per trial
+    texture_cache = disp_struct['texture_cache']
+    fixation_line1, fixation_line2 = render_plan['fixation']
+    top_frame, bottom_frame = render_plan['button_frames']
+
+    reminder_text = visual.TextStim(win, text="Press SPACE to confirm",
+                                    color='white', units='norm', 
+                                    height=0.05, pos=(0, -0.25))
+
     # save photodiode obj
     PHOTODIODE = visual.Rect(win, fillColor='white', lineColor='white', 
                              width=disp_struct['photodiode_box'][2], height=disp_struct['photodiode_box'][3], 
@@ -91,48 +108,128 @@ def run_session_training(task_struct, disp_struct):
         duration=disp_struct['photodiode_dur']
     )
 
+    # Blackrock comments are sent from a background thread so NSP latency
+    # never lands between draw() and flip()
+    dispatcher = None
+    if task_struct['blackrock_enabled'] and not task_struct['debug']:
+        dispatcher = CommentDispatcher(
+            lambda **kwargs: send_blackrock_comment(log_path=task_struct['log_path'], **kwargs),
+            clock=core.getTime
+        ).start()
+
     def send_comment_with_pd(event, task, additional_text):
         """
-        Send a Blackrock comment and trigger a short photodiode flash.
+        Queue a Blackrock comment and trigger a short photodiode flash.
         Does nothing in debug mode or if Blackrock is disabled.
         """
         actually_sent_blackrock = False
 
-        if task_struct['blackrock_enabled'] and not task_struct['debug']:
-            send_blackrock_comment(
-                event=event,
-                task=task,
-                log_path=task_struct['log_path'],
-                additional_text=additional_text
-            )
+        if dispatcher is not None:
+            dispatcher.submit(event=event, task=task, additional_text=additional_text)
             actually_sent_blackrock = True
 
         # Photodiode flashes if sent a Blackrock comment, OR in test mode
         if actually_sent_blackrock or task_struct['photodiode_test_mode']:
             pd_flash.trigger()
 
+    # Per-trial data goes to an append-only journal next to the .pkl,
+    # written from a background thread so disk latency never delays fixation
+    output_file = task_struct['output_folder'] / task_struct['file_name']
+    journal = TrialJournal(output_file.with_suffix('.journal')).open(task_struct)
+    trial_writer = BackgroundTrialWriter(journal, fsync_policy=task_struct['fsync_policy']).start()
+
+    def close_outputs():
+        """Send any queued comments, save marker / write stats and close the journal."""
+        if dispatcher is not None:
+            task_struct['comment_dispatch'] = dispatcher.stop()
+        if frame_recorder is not None:
+            task_struct['frame_timing'] = frame_recorder.to_dict()
+        task_struct['texture_cache_stats'] = texture_cache.stats()
+        trial_writer.append_end(task_struct)
+        write_stats = trial_writer.close()
+        task_struct['trial_write_stats'] = write_stats
+        if len(write_stats['write_latency']):
+            print(f"Trial saves: max enqueue {1000 * write_stats['enqueue_latency'].max():.2f} ms, "
+                  f"max write {1000 * write_stats['write_latency'].max():.2f} ms")
+
+    # Opt-in per-phase flip timing (intended vs achieved durations, dropped frames)
+    frame_recorder = None
+    if task_struct['record_frames']:
+        frame_recorder = FrameRecorder(disp_struct['frame_period'])
+
+    def start_phase(name, trial, intended=np.nan):
+        """Count the following flips towards this phase (if recording frames)."""
+        if frame_recorder is not None:
+            frame_recorder.start_phase(name, trial, intended)
+
+    def pause_frames(duration=None):
+        """Mark an intentional wait before the next flip (see FrameRecorder.pause)."""
+        if frame_recorder is not None:
+            frame_recorder.pause(duration)
+
     def flip_with_pd(label=None, trial=None):
         pd_flash.update()
         try:
-            return win.flip()
+            flip_time = win.flip()
         except Exception as e:
             print(f"\n*** FLIP ERROR *** trial={trial}, phase={label}")
             raise
+        if frame_recorder is not None:
+            frame_recorder.record(flip_time)
+        return flip_time
+
+    frame_period = disp_struct['frame_period']
+
+    def present_phase(phase, trial, n_frames, stims, eyelink_event, comment_phase, clear_first=False,
+                      on_frame=None):
+        """
+        Present one trial phase for exactly n_frames flips. The eyelink message
+        and Blackrock comment / photodiode flash go out with the first frame.
+        Returns the first flip time; the deviation of the achieved duration
+        from n_frames refresh periods is stored in trial_struct['phase_deviation'].
+        """
+        if clear_first:
+            # Blank frame just before the phase
+            start_phase(f'{phase}_clear', trial, frame_period)
+            flip_with_pd()
+
+        def on_first_frame():
+            if task_struct['eye_link_mode']:
+                write_log_with_eyelink(task_struct, eyelink_event, '')
+
+            send_comment_with_pd(
+                event="annotate",
+                task="DCWM",
+                additional_text=f"trial={trial}; phase={comment_phase}"
+            )
+
+        start_phase(phase, trial, n_frames * frame_period)
+        first_flip, last_flip = present_frames(n_frames, stims, flip_with_pd, on_first_frame, on_frame)
+
+        deviation = phase_deviation(first_flip, last_flip, n_frames, frame_period)
+        trial_struct['phase_deviation'][phase] = deviation
+        if deviation > frame_period / 2:
+            print(f"Warning: trial {trial} {phase} ran {1000 * deviation:.1f} ms long")
+        return first_flip
 
     try:
 
         for t_i in range(task_struct['n_trials']):
             if t_i == 0:
+                pause_frames()
                 intermission_screen('Tutorial: Wait for start!', task_struct, disp_struct)
                 intermission_screen('Start when you are ready! \nUse the arrow keys to pick your answer.', task_struct, disp_struct)
             
             if t_i == (task_struct['n_trials'] // 8):
+                pause_frames()
                 intermission_screen('Sometimes you will answer with a slider! \nMove the slider further from the center when you are confident. Press space to submit.', task_struct, disp_struct)
 
             if t_i == (task_struct['n_trials'] // 4):
+                pause_frames()
                 intermission_screen('Buttons and sliders will alternate randomly.', task_struct, disp_struct)
             
             if t_i == (task_struct['n_trials'] // 2):
+                pause_frames()
                 intermission_screen('Instruction order will now change!', task_struct, disp_struct)
             
             trial_start_time = core.getTime()
@@ -141,269 +238,109 @@ def run_session_training(task_struct, disp_struct):
             print(f'Trial number {t_i + 1} / {task_struct["n_trials"]}')
             
             # Creating trial struct
-            trial_struct = {}
+            trial_struct = {'phase_deviation': {}}
+            trial_plan = render_plan['trials'][t_i]
+            trial = task_struct['trials'][t_i]
+
+            # Stimuli of the next trials load one per frame during the ISI and response
+            prefetch_upcoming(texture_cache, session_stims, t_i)
+            reset_trial_text(trial_plan)
             
             # Presenting fixation cross
             flip_with_pd()
             win.mouseVisible = False
-            fixation_line1 = visual.Line(
-                win,
-                start=[0, -20],
-                end=[0, 20],
-                lineColor='black',
-                lineWidth=5
-            )
-            fixation_line2 = visual.Line(
-                win,
-                start=[-20, 0],
-                end=[20, 0],
-                lineColor='black',
-                lineWidth=5
-            )
-            fixation_line1.draw()
-            fixation_line2.draw()
-
-            fix_clock = core.Clock()
-            first_frame = True
-
-            while fix_clock.getTime() < task_struct['fixation_time'][t_i]:
-                fixation_line1.draw()
-                fixation_line2.draw()
 
-                if first_frame:
-                    if task_struct['eye_link_mode']:
-                        write_log_with_eyelink(task_struct, 'FIXATION_ON', '')
-
-                    send_comment_with_pd(
-                        event="annotate",
-                        task="DCWM", 
-                        additional_text=f"trial={t_i}; phase=fixation_on"
-                    )
-
-                    trial_struct['fixation_flip'] = flip_with_pd()
-                    first_frame = False
-                else:
-                    flip_with_pd()
+            trial_struct['fixation_flip'] = present_phase(
+                'fixation', t_i, trial['fixation_frames'],
+                [fixation_line1, fixation_line2], 'FIXATION_ON', 'fixation_on'
+            )
             
             # Check control keys (escape/pause) using helper
             res = check_for_control_keys(task_struct, disp_struct)
             if res == 'quit':
+                close_outputs()
                 return task_struct, disp_struct
             
             # Presenting pre-stim instruction (if required)
-            if task_struct['trial_cues'][t_i] == 1:
-                plotted_text = get_instruction_text_for_trial(task_struct, t_i)
-
-                instruction_text = visual.TextStim(
-                    win,
-                    text=plotted_text,
-                    color='white',
-                    height=48,
-                    wrapWidth=win.size[0] * 0.8
-                )
-
-                instr_clock = core.Clock()
-                first_frame = True
+            if trial['cue'] == 1:
+                instruction_text = trial_plan['task_instruction']
 
-                while instr_clock.getTime() < task_struct['instruction_time_max']:
-                    instruction_text.draw()
-
-                    if first_frame:
-                        # Clear screen just before first instruction frame
-                        flip_with_pd()
-
-                        if task_struct['eye_link_mode']:
-                            write_log_with_eyelink(task_struct, 'INSTRUCTION_ON', '')
-
-                        send_comment_with_pd(
-                            event="annotate",
-                            task="DCWM", 
-                            additional_text=f"trial={t_i}; phase=instr_task_cue"
-                        )
-
-                        trial_struct['instruction1_flip'] = flip_with_pd()
-                        first_frame = False
-                    else:
-                        flip_with_pd()
+                # Clear screen just before first instruction frame
+                trial_struct['instruction1_flip'] = present_phase(
+                    'instruction_cue', t_i, task_struct['phase_frames']['instruction'],
+                    [instruction_text], 'INSTRUCTION_ON', 'instr_task_cue', clear_first=True
+                )
             
             # Presenting first stimulus
-            stim1_position_trial = int(task_struct['stim1_position'][t_i])
+            stim1_position_trial = int(trial['stim1_position'])
             stim1_rect = disp_struct['horizontal_rects'][stim1_position_trial - 1]
 
-            stim1_path = task_struct['trial_stims'][t_i][0]
+            stim1_path = session_stims[t_i][0]
             
-            stim1_image = disp_struct['image_cache'][stim1_path]
+            stim1_image = texture_cache.get(stim1_path)
             stim1_image.setSize(stim1_rect[2] - stim1_rect[0])
             stim1_image.setPos(((stim1_rect[0] + stim1_rect[2]) / 2,
                                 (stim1_rect[1] + stim1_rect[3]) / 2,))
 
-            stim1_clock = core.Clock()
-            first_frame = True
-
-            while stim1_clock.getTime() < task_struct['stim1_time']:
-                stim1_image.draw()
-
-                if first_frame:
-                    if task_struct['eye_link_mode']:
-                        write_log_with_eyelink(task_struct, 'STIMULUS_ON', '')
-
-                    send_comment_with_pd(
-                        event="annotate",
-                        task="DCWM", 
-                        additional_text=f"trial={t_i}; phase=stim1_on"
-                    )
-
-                    trial_struct['stim1_flip'] = flip_with_pd()
-                    first_frame = False
-                else:
-                    flip_with_pd()
+            trial_struct['stim1_flip'] = present_phase(
+                'stim1', t_i, task_struct['phase_frames']['stim1'],
+                [stim1_image], 'STIMULUS_ON', 'stim1_on'
+            )
 
             # Turn off stim1
+            start_phase('stim1_off', t_i, frame_period)
             trial_struct['stim1_off_flip'] = flip_with_pd()
 
-
-            # Wait for inter-stimulus interval (with fixation cross)
-            isi_clock = core.Clock()
-            first_frame = True
-
-            while isi_clock.getTime() < task_struct['ISI'][t_i]:
-                fixation_line1.draw()
-                fixation_line2.draw()
-
-                if first_frame:
-                    if task_struct['eye_link_mode']:
-                        write_log_with_eyelink(task_struct, 'DELAY_ON', '')
-
-                    send_comment_with_pd(
-                        event="annotate",
-                        task="DCWM", 
-                        additional_text=f"trial={t_i}; phase=delay_on"
-                    )
-
-                    trial_struct['delay_flip'] = flip_with_pd()
-                    first_frame = False
-                else:
-                    flip_with_pd()
+            # Inter-stimulus interval (with fixation cross)
+            trial_struct['delay_flip'] = present_phase(
+                'isi', t_i, trial['isi_frames'],
+                [fixation_line1, fixation_line2], 'DELAY_ON', 'delay_on',
+                on_frame=texture_cache.load_pending
+            )
             
             # Presenting second stimulus
-            stim2_position_trial = int(task_struct['stim2_position'][t_i])
+            stim2_position_trial = int(trial['stim2_position'])
             stim2_rect = disp_struct['horizontal_rects'][stim2_position_trial - 1]
             
             # Load and display image
-            stim2_path = task_struct['trial_stims'][t_i][1]
-            stim2_image = visual.ImageStim(
-                win,
-                image=stim2_path,
-                pos=None,
-                size = stim2_rect[2] - stim2_rect[0],
-                units="pix"
-            )
+            stim2_path = session_stims[t_i][1]
+            stim2_image = texture_cache.get(stim2_path)
+            stim2_image.setSize(stim2_rect[2] - stim2_rect[0])
             stim2_image.setPos(((stim2_rect[0] + stim2_rect[2])/2, (stim2_rect[1] + stim2_rect[3])/2))
 
-            stim2_clock = core.Clock()
-            first_frame = True
-
-            while stim2_clock.getTime() < task_struct['stim2_time']:
-                stim2_image.draw()
-
-                if first_frame:
-                    if task_struct['eye_link_mode']:
-                        write_log_with_eyelink(task_struct, 'STIMULUS_ON', '')
-
-                    send_comment_with_pd(
-                        event="annotate",
-                        task="DCWM", 
-                        additional_text=f"trial={t_i}; phase=stim2_on"
-                    )
-
-                    trial_struct['stim2_flip'] = flip_with_pd()
-                    first_frame = False
-                else:
-                    flip_with_pd()
+            trial_struct['stim2_flip'] = present_phase(
+                'stim2', t_i, task_struct['phase_frames']['stim2'],
+                [stim2_image], 'STIMULUS_ON', 'stim2_on'
+            )
 
             # Presenting retrocue instruction (if required)
-            if task_struct['trial_cues'][t_i] == 2:
-                plotted_text = get_instruction_text_for_trial(task_struct, t_i)
-                instruction_text = visual.TextStim(
-                    win,
-                    text=plotted_text,
-                    color='white',
-                    height=48,
-                    wrapWidth=win.size[0] * 0.8
-                )
-
-                instr_clock = core.Clock()
-                first_frame = True
+            if trial['cue'] == 2:
+                instruction_text = trial_plan['task_instruction']
 
-                while instr_clock.getTime() < task_struct['instruction_time_max']:
-                    instruction_text.draw()
-
-                    if first_frame:
-                        # Clear screen just before first instruction frame
-                        flip_with_pd()
-
-                        if task_struct['eye_link_mode']:
-                            write_log_with_eyelink(task_struct, 'INSTRUCTION_ON', '')
-
-                        send_comment_with_pd(
-                            event="annotate",
-                            task="DCWM", 
-                            additional_text=f"trial={t_i}; phase=instr_task_retrocue"
-                        )
-
-                        trial_struct['instruction1_flip'] = flip_with_pd()
-                        first_frame = False
-                    else:
-                        flip_with_pd()
+                # Clear screen just before first instruction frame
+                trial_struct['instruction1_flip'] = present_phase(
+                    'instruction_retrocue', t_i, task_struct['phase_frames']['instruction'],
+                    [instruction_text], 'INSTRUCTION_ON', 'instr_task_retrocue', clear_first=True
+                )
                 
 
             # Presenting response instruction (button or slider)
-            plotted_text = get_motor_instruction_text_for_trial(task_struct, t_i)
-            
-            instruction_text = visual.TextStim(
-                win,
-                text=plotted_text,
-                color='white',
-                height=48,
-                wrapWidth=win.size[0] * 0.8
-            )
-
-            resp_instr_clock = core.Clock()
-            first_frame = True
-
-            while resp_instr_clock.getTime() < task_struct['response_instruction_time']:
-                instruction_text.draw()
-
-                if first_frame:
-                    if task_struct['eye_link_mode']:
-                        write_log_with_eyelink(task_struct, 'RESP_INSTRUCTION_ON', '')
-
-                    send_comment_with_pd(
-                        event="annotate",
-                        task="DCWM", 
-                        additional_text=f"trial={t_i}; phase=instr_response"
-                    )
+            instruction_text = trial_plan['response_instruction']
 
-                    trial_struct['responseinstruction_flip'] = flip_with_pd()
-                    first_frame = False
-                else:
-                    flip_with_pd()
+            trial_struct['responseinstruction_flip'] = present_phase(
+                'response_instruction', t_i, task_struct['phase_frames']['response_instruction'],
+                [instruction_text], 'RESP_INSTRUCTION_ON', 'instr_response'
+            )
 
 
             # Getting response
             slider_resp = keyboard.Keyboard()
-            if task_struct['response_variants'][t_i] == 1: # slider response
+            start_phase('response', t_i)
+            if trial['response_variant'] == 1: # slider response
                 
-                # Display words above the endpoints of the slider
-                left_text_stim = visual.TextStim(win, text=task_struct['left_text'][t_i],
-                                                color='white', height=48, pos=(-width * 0.4 / 2, height * 0.15))   # left/top
-
-                right_text_stim = visual.TextStim(win, text=task_struct['right_text'][t_i],
-                                                color='white', height=48, pos=(width * 0.4 / 2, height * 0.15))    # right/top
-                
-                reminder_text = visual.TextStim(win, text="Press SPACE to confirm",
-                                                color='white', units='norm', 
-                                                height=0.05, pos=(0, -0.25))
+                # Display words above the endpoints of the slider (pre-built)
+                left_text_stim = trial_plan['slider_left_text']   # left/top
+                right_text_stim = trial_plan['slider_right_text'] # right/top
                 
                 # left_pressed, right_pressed, marker_moved = 0, 0, 0
                 positions = []
@@ -462,6 +399,7 @@ def run_session_training(task_struct, disp_struct):
                     else:
                         # win.flip()
                         flip_with_pd()
+                    texture_cache.load_pending()
 
                     # Show reminder if enough time passed without confirmation
                     if (current_time - cue_time) > 2:
@@ -506,6 +444,7 @@ def run_session_training(task_struct, disp_struct):
                             slider_line.draw()
                             # trial_struct['response_submit_flip'] = win.flip()
                             trial_struct['response_submit_flip'] = flip_with_pd()
+                            pause_frames(task_struct['text_holdout_time'])
                             core.wait(task_struct['text_holdout_time'])
                             response_received = True
                         elif rating > 0: 
@@ -522,6 +461,7 @@ def run_session_training(task_struct, disp_struct):
                             slider_line.draw()
                             # trial_struct['response_submit_flip'] = win.flip()
                             trial_struct['response_submit_flip'] = flip_with_pd()
+                            pause_frames(task_struct['text_holdout_time'])
                             core.wait(task_struct['text_holdout_time'])
                             response_received = True
                         
@@ -551,47 +491,9 @@ def run_session_training(task_struct, disp_struct):
 
             else: # Button response
 
-                # Plotting top/bottom frames (changed from left/right)
-                top_rect = [x + offset for x, offset in zip(disp_struct['vertical_rects'][0], [-10, -10, 10, 10])]
-                bottom_rect = [x + offset for x, offset in zip(disp_struct['vertical_rects'][1], [-10, -10, 10, 10])]
-
-                top_frame = visual.Rect(
-                    win,
-                    width=top_rect[2] - top_rect[0],
-                    height=top_rect[3] - top_rect[1],
-                    pos=((top_rect[0] + top_rect[2])/2, (top_rect[1] + top_rect[3])/2),
-                    # lineColor='green',
-                    lineColor='black',
-                    fillColor=None,
-                    lineWidth=5
-                )
-                bottom_frame = visual.Rect(
-                    win,
-                    width=bottom_rect[2] - bottom_rect[0],
-                    height=bottom_rect[3] - bottom_rect[1],
-                    pos=((bottom_rect[0] + bottom_rect[2])/2, (bottom_rect[1] + bottom_rect[3])/2),
-                    # lineColor='red',
-                    lineColor='black',
-                    fillColor=None,
-                    lineWidth=5
-                )
-
-                top_text_stim = visual.TextStim(
-                    win,
-                    text=task_struct['left_text'][t_i],
-                    color='white',
-                    height=48,
-                    pos=((disp_struct['vertical_rects'][0][0] + disp_struct['vertical_rects'][0][2])/2,
-                        (disp_struct['vertical_rects'][0][1] + disp_struct['vertical_rects'][0][3])/2)
-                )
-                bottom_text_stim = visual.TextStim(
-                    win,
-                    text=task_struct['right_text'][t_i],
-                    color='white',
-                    height=48,
-                    pos=((disp_struct['vertical_rects'][1][0] + disp_struct['vertical_rects'][1][2])/2,
-                        (disp_struct['vertical_rects'][1][1] + disp_struct['vertical_rects'][1][3])/2)
-                )
+                # Top/bottom frames and labels (pre-built; colors reset at trial start)
+                top_text_stim = trial_plan['top_text']
+                bottom_text_stim = trial_plan['bottom_text']
                 
                 top_frame.draw()
                 bottom_frame.draw()
@@ -626,6 +528,7 @@ def run_session_training(task_struct, disp_struct):
                         # Clear buffer
                         handle.reset_input_buffer()
                     
+                    pause_frames()  # polls the button box without flipping
                     while current_time - cue_time < task_struct['response_time_max']:
                         
                         if handle:
@@ -662,6 +565,7 @@ def run_session_training(task_struct, disp_struct):
                                 # trial_struct['response_submit_flip'] = win.flip()
                                 trial_struct['response_submit_flip'] = flip_with_pd()
 
+                                pause_frames(task_struct['text_holdout_time'])
                                 core.wait(task_struct['text_holdout_time'])
                                 response_received = True
                                 break
@@ -679,6 +583,7 @@ def run_session_training(task_struct, disp_struct):
                                 bottom_text_stim.draw()
                                 # trial_struct['response_submit_flip'] = win.flip()
                                 trial_struct['response_submit_flip'] = flip_with_pd()
+                                pause_frames(task_struct['text_holdout_time'])
                                 core.wait(task_struct['text_holdout_time'])
                                 response_received = True
                                 break
@@ -693,7 +598,7 @@ def run_session_training(task_struct, disp_struct):
                     resp_clock = core.Clock()
                     first_frame = True
 
-                    while (resp_clock.getTime() - cue_time) < task_struct['response_time_max'] and not response_received:
+                    while resp_clock.getTime() < task_struct['response_time_max'] and not response_received:
                         # Draw button options every frame
                         top_frame.draw()
                         bottom_frame.draw()
@@ -718,6 +623,7 @@ def run_session_training(task_struct, disp_struct):
                         # else:
                         
                         flip_with_pd()
+                        texture_cache.load_pending()
 
                         # Check for key press
                         keys = event.getKeys(
@@ -798,10 +704,12 @@ def run_session_training(task_struct, disp_struct):
             send_comment_with_pd(event="annotate", task="DCWM",  
                                 additional_text=f"trial={t_i}; phase=trial_end")
             
+            start_phase('trial_end', t_i, task_struct['ITI'])
             PHOTODIODE.autoDraw = False
             # trial_struct['response_end_flip'] = win.flip()
             trial_struct['response_end_flip'] = flip_with_pd()
             # Wait for intertrial interval
+            pause_frames(task_struct['ITI'])
             core.wait(task_struct['ITI'])
             
             # Saving trial to struct
@@ -811,30 +719,36 @@ def run_session_training(task_struct, disp_struct):
             trial_end_time = core.getTime()
             task_struct['trial_time'][t_i] = trial_end_time - trial_start_time
             
-            # Saving to file after every trial
-            output_file = task_struct['output_folder'] / task_struct['file_name']
-            with open(output_file.with_suffix('.pkl'), 'ab') as f:
-                pickle.dump({'task_struct': task_struct}, f)
+            # Queue this trial's record for the journal writer thread
+            trial_writer.append_trial(t_i, trial_struct, task_struct)
             
             # End of block message on screen (including accuracy in the previous block)
-            if task_struct['break_trial'][t_i]:
+            if trial['break_trial']:
                 block_trials = list(range(max(0, t_i - task_struct['n_trials_per_block'] + 1), t_i + 1))
                 correct = np.array(task_struct['correct_responses'])[block_trials]
                 resp = np.array(task_struct['resp_key'])[block_trials]
                 block_accuracy = 100 * np.nansum(correct == resp) / task_struct['n_trials_per_block']
+                if frame_recorder is not None:
+                    print(frame_recorder.format_summary(block_trials))
+                pause_frames()
                 intermission_screen(
                     f'Break time! \n Your accuracy was {block_accuracy:.1f}%',
                     task_struct, disp_struct
                 )
         
+        close_outputs()
         return task_struct, disp_struct
     except Exception as e:
         print("\n\n*** EXPERIMENT CRASHED ***\n")
         print(type(e), e)
 
+        # Make sure every trial finished so far is on disk before anything else
+        trial_writer.flush()
+
         # send crash message to photodiode/blackrock
         send_comment_with_pd(event="error", task="DCWM",  
                             additional_text=f"trial={t_i}; error={str(e)}")
+        close_outputs()
 
         return task_struct, disp_struct
 
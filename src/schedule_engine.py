@@ -0,0 +1,255 @@
+"""
+Constrained trial-schedule generator. A design declares the factors (one
+schedule column each), the factor that defines blocks, the factor
+combinations that must be balanced within every block and the factor
+combinations that must not repeat on consecutive trials. generate_schedule
+returns a schedule that satisfies all of them, or retries, and a report of
+which constraints hold.
+"""
+
+import itertools
+
+import numpy as np
+
+# Main task design (init_task): 4 blocks of 48 trials alternating cue and
+# retrocue, balanced in (category, response) within each block, never the
+# same stimulus pair on consecutive trials
+TASK_DESIGN = {
+    'factors': {  # schedule column order
+        'category': [0, 1, 2, 3],  # 4 categories
+        'axis': [0, 1],  # which of the category's 2 axes
+        'pair': [0, 1, 2],  # 3 pairs of stimuli per category/axis
+        'prompt': [0, 1],  # which prompt version to use (aspect of the axis)
+        'response': [0, 1],  # button choice vs slider
+        'cue': [2, 1],  # retrocue vs cue
+    },
+    'n_blocks': 4,
+    'n_trials_per_block': 48,
+    'block_factor': 'cue',  # one level per block, alternating (random first level)
+    'balance': [('category', 'response')],  # equal counts within every block
+    'no_adjacent_repeat': [('category', 'pair')],  # within a block
+}
+
+
+def factor_columns(design):
+    """{factor name: schedule column}"""
+    return {name: i for i, name in enumerate(design['factors'])}
+
+
+def full_crossing(design):
+    """Every combination of factor levels, repeated (and cut) to n_trials rows."""
+    n_trials = design['n_blocks'] * design['n_trials_per_block']
+    crossing = np.array(list(itertools.product(*design['factors'].values())), dtype=int)
+    n_repeats = -(-n_trials // len(crossing))
+    return np.tile(crossing, (n_repeats, 1))[:n_trials]
+
+
+def _combo_codes(rows, columns):
+    """One integer per row for the combination of values in columns."""
+    if len(columns) == 0:
+        return np.zeros(len(rows), dtype=int)
+    _, codes = np.unique(rows[:, columns], axis=0, return_inverse=True)
+    return codes.ravel()
+
+
+def _deal_to_blocks(rows, n_blocks, strata, rng):
+    """
+    Split rows into n_blocks equal blocks, dealing each stratum round-robin
+    (in random order) so every block gets an equal share of it.
+    """
+    order = rng.permutation(len(rows))
+    order = order[np.argsort(strata[order], kind='stable')]
+    block_of = np.empty(len(rows), dtype=int)
+    block_of[order] = np.arange(len(rows)) % n_blocks
+    return [rows[block_of == b] for b in range(n_blocks)]
+
+
+def order_without_repeats(keys, rng):
+    """
+    Random order of items such that no two consecutive items share a key.
+
+    Each position takes a random remaining item whose key differs from the
+    previous one, unless one key needs more than half of the remaining
+    positions, in which case that key goes next. When an arrangement exists
+    this never gets stuck, so no backtracking is needed.
+
+    Parameters:
+    -----------
+    keys : np.ndarray of int, shape (n,)
+        Key of every item
+    rng : np.random.Generator
+
+    Returns:
+    --------
+    order : np.ndarray of int, shape (n,)
+        Item indices in presentation order
+    n_violations : int
+        Consecutive repeats left (0 unless no arrangement exists)
+    """
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    key_codes = key_codes.ravel()
+    n_keys = len(unique_keys)
+    counts = np.bincount(key_codes, minlength=n_keys).tolist()
+    # Items of each key in random order, taken from the end
+    items = [rng.permutation(np.flatnonzero(key_codes == k)).tolist() for k in range(n_keys)]
+    uniform = rng.random(len(keys)).tolist()
+
+    order = np.empty(len(keys), dtype=int)
+    prev = -1
+    n_violations = 0
+    for pos in range(len(keys)):
+        remaining = len(keys) - pos - 1  # positions left after this one
+        first = max(range(n_keys), key=counts.__getitem__)
+        if counts[first] > (remaining + 1) // 2 + (first == prev):
+            # Any other key now would leave too many of this one to separate
+            k = first
+        else:
+            # Random remaining item, skipping the previous key
+            total = len(keys) - pos - (counts[prev] if prev >= 0 else 0)
+            if total == 0:
+                k = prev  # only the previous key is left
+            else:
+                x = uniform[pos] * total
+                for k in range(n_keys):
+                    if k != prev:
+                        x -= counts[k]
+                        if x < 0 and counts[k] > 0:
+                            break
+        if k == prev:
+            n_violations += 1
+        order[pos] = items[k].pop()
+        counts[k] -= 1
+        prev = k
+    return order, n_violations
+
+
+def check_schedule(schedule, design):
+    """
+    Which constraints of design the schedule satisfies.
+
+    Returns:
+    --------
+    report : dict
+        'block_factor', 'balance' and 'no_adjacent_repeat' entries, each with
+        'satisfied' and the offending counts, and 'valid' (all satisfied)
+    """
+    columns = factor_columns(design)
+    n_blocks, block_len = design['n_blocks'], design['n_trials_per_block']
+    blocks = schedule.reshape(n_blocks, block_len, -1)
+    report = {'n_trials': len(schedule), 'n_blocks': n_blocks}
+
+    block_col = columns[design['block_factor']]
+    block_levels = blocks[:, :, block_col]
+    single_level = bool((block_levels == block_levels[:, :1]).all())
+    alternating = bool((block_levels[1:, 0] != block_levels[:-1, 0]).all()) if n_blocks > 1 else True
+    report['block_factor'] = {
+        'factor': design['block_factor'],
+        'levels': block_levels[:, 0].tolist(),
+        'satisfied': single_level and alternating,
+    }
+
+    report['balance'] = {}
+    for factors in design['balance']:
+        cols = [columns[f] for f in factors]
+        n_max_imbalance = 0
+        for block in blocks:
+            # The block factor only takes the block's own level
+            levels = [[block[0, block_col]] if columns[f] == block_col else design['factors'][f]
+                      for f in factors]
+            counts = [np.sum(np.all(block[:, cols] == combo, axis=1))
+                      for combo in itertools.product(*levels)]
+            n_max_imbalance = max(n_max_imbalance, max(counts) - min(counts))
+        report['balance'][' x '.join(factors)] = {
+            'max_imbalance': int(n_max_imbalance),
+            'satisfied': n_max_imbalance == 0,
+        }
+
+    report['no_adjacent_repeat'] = {}
+    for factors in design['no_adjacent_repeat']:
+        cols = [columns[f] for f in factors]
+        repeats = np.all(blocks[:, 1:, cols] == blocks[:, :-1, cols], axis=2)
+        report['no_adjacent_repeat'][' x '.join(factors)] = {
+            'violations': int(repeats.sum()),
+            'satisfied': not repeats.any(),
+        }
+
+    report['valid'] = (report['block_factor']['satisfied']
+                       and all(c['satisfied'] for c in report['balance'].values())
+                       and all(c['satisfied'] for c in report['no_adjacent_repeat'].values()))
+    return report
+
+
+def generate_schedule(design=TASK_DESIGN, rng=None, max_attempts=20):
+    """
+    Build a trial schedule satisfying design.
+
+    Trials of the full factor crossing are split by the block factor, dealt
+    into that level's blocks stratified on the balanced factors, and each
+    block is ordered without consecutive repeats. If a constraint still
+    fails (e.g. one stimulus pair got more than half of a block), the
+    dealing is redrawn, up to max_attempts times.
+
+    Parameters:
+    -----------
+    design : dict
+        Factors and constraints (see TASK_DESIGN)
+    rng : np.random.Generator, int or None
+        Random generator or seed
+    max_attempts : int
+        Redraws before giving up and returning the best schedule found
+
+    Returns:
+    --------
+    schedule : np.ndarray of int, shape (n_trials, n_factors)
+        One row per trial, columns in design['factors'] order
+    report : dict
+        check_schedule of the returned schedule, plus 'attempts'
+    """
+    rng = np.random.default_rng(rng)
+    columns = factor_columns(design)
+    n_blocks = design['n_blocks']
+    block_col = columns[design['block_factor']]
+    block_levels = design['factors'][design['block_factor']]
+    if n_blocks % len(block_levels):
+        raise ValueError(f"n_blocks ({n_blocks}) must be a multiple of the number of "
+                         f"'{design['block_factor']}' levels ({len(block_levels)})")
+    n_blocks_per_level = n_blocks // len(block_levels)
+
+    balance_cols = sorted({columns[f] for factors in design['balance'] for f in factors})
+    repeat_cols = [[columns[f] for f in factors] for factors in design['no_adjacent_repeat']]
+    trials = full_crossing(design)
+
+    best = None
+    for attempt in range(1, max_attempts + 1):
+        level_blocks = {}
+        for level in block_levels:
+            rows = trials[trials[:, block_col] == level]
+            level_blocks[level] = _deal_to_blocks(rows, n_blocks_per_level,
+                                                  _combo_codes(rows, balance_cols), rng)
+
+        # Alternate block levels, starting with a random one
+        start = rng.integers(len(block_levels))
+        blocks = []
+        for b in range(n_blocks):
+            level = block_levels[(start + b) % len(block_levels)]
+            block = level_blocks[level][b // len(block_levels)]
+            block = block[rng.permutation(len(block))]
+            if repeat_cols:
+                # Ordered on the first set; any others are checked (and redrawn)
+                order, _ = order_without_repeats(_combo_codes(block, repeat_cols[0]), rng)
+                block = block[order]
+            blocks.append(block)
+        schedule = np.vstack(blocks)
+
+        report = check_schedule(schedule, design)
+        report['attempts'] = attempt
+        if report['valid']:
+            return schedule, report
+        n_violations = sum(c['violations'] for c in report['no_adjacent_repeat'].values())
+        if n_violations == 0:
+            # Block or balance constraint: the design itself can't meet it,
+            # redrawing won't help
+            return schedule, report
+        if best is None or n_violations < best[0]:
+            best = (n_violations, schedule, report)
+    return best[1], best[2]
@@ -0,0 +1,172 @@
+"""
+Precomputed schedule library: the trial schedule, prompt types and jitters
+of a session are a function of one integer seed (session_schedule), and the
+schedules of seeds 0..n-1 are stored ahead of time in one memory-mapped .npy
+file (int8 condition columns, int16 jitters in ms). init_task looks its seed
+up in O(1) instead of generating the schedule at startup; seeds outside the
+library are generated on the fly and give the same trials, so any session
+can be reproduced from its task_struct['schedule_seed'].
+
+Build the library from the repository root with
+    python -m src.schedule_library [--n-schedules N]
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.schedule_engine import TASK_DESIGN, generate_schedule
+
+# Relative to src/, like the other task paths (main.py chdirs there)
+SCHEDULE_LIBRARY_PATH = Path('..') / 'schedules' / 'task_schedules.npy'
+
+# Jitter ranges in seconds (uniform, rounded to ms)
+FIXATION_RANGE = (0.9, 1.2)
+ISI_RANGE = (2.0, 2.4)
+
+# One record per trial; the first six fields are the schedule_engine columns
+SCHEDULE_DTYPE = np.dtype([
+    ('category', 'i1'),
+    ('axis', 'i1'),
+    ('pair', 'i1'),
+    ('prompt', 'i1'),
+    ('response', 'i1'),
+    ('cue', 'i1'),
+    ('prompt_type', 'i1'),  # 1: 'First' on the left, 2: 'Second' on the left
+    ('fixation_ms', 'i2'),
+    ('isi_ms', 'i2'),
+])
+
+
+def _design_json(design):
+    """design as stored in the library metadata (tuples become lists)."""
+    return json.loads(json.dumps(design))
+
+
+def session_schedule(seed, design=TASK_DESIGN):
+    """
+    Trials of the session with this seed.
+
+    Returns:
+    --------
+    trials : np.ndarray of SCHEDULE_DTYPE, shape (n_trials,)
+    report : dict
+        generate_schedule report
+    """
+    rng = np.random.default_rng(seed)
+    schedule, report = generate_schedule(design, rng)
+    n_trials = len(schedule)
+
+    trials = np.empty(n_trials, dtype=SCHEDULE_DTYPE)
+    for i, name in enumerate(design['factors']):
+        trials[name] = schedule[:, i]
+    trials['prompt_type'] = rng.integers(1, 3, n_trials)
+    trials['fixation_ms'] = np.rint(rng.uniform(*FIXATION_RANGE, n_trials) * 1000)
+    trials['isi_ms'] = np.rint(rng.uniform(*ISI_RANGE, n_trials) * 1000)
+    return trials, report
+
+
+def schedule_columns(trials, design=TASK_DESIGN):
+    """(n_trials, n_factors) int array of the schedule_engine columns."""
+    return np.column_stack([trials[name].astype(int) for name in design['factors']])
+
+
+class ScheduleLibrary:
+    def __init__(self, path=SCHEDULE_LIBRARY_PATH, design=TASK_DESIGN):
+        """
+        path: library .npy (metadata in the .json next to it); a missing
+            library, or one built for another design, is ignored
+        """
+        self.path = Path(path)
+        self.design = design
+        self.schedules = None
+        self.metadata = None
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path.with_suffix('.json')) as f:
+                metadata = json.load(f)
+            schedules = np.load(self.path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read schedule library {self.path}: {e}")
+            return
+        if metadata.get('design') != _design_json(design) or schedules.dtype != SCHEDULE_DTYPE:
+            print(f"Warning: schedule library {self.path} was built for another design; ignoring it")
+            return
+        self.schedules = schedules
+        self.metadata = metadata
+
+    def __len__(self):
+        return 0 if self.schedules is None else len(self.schedules)
+
+    def random_seed(self):
+        """A fresh seed: one of the library's if there is one (instant startup)."""
+        n = len(self) or 2 ** 31
+        return random.SystemRandom().randrange(n)
+
+    def schedule(self, seed):
+        """
+        Trials of the session with this seed (see session_schedule).
+
+        Returns:
+        --------
+        trials : np.ndarray of SCHEDULE_DTYPE, shape (n_trials,)
+        source : str
+            'library' or 'generated'
+        """
+        if 0 <= seed < len(self):
+            return np.array(self.schedules[seed]), 'library'
+        trials, _ = session_schedule(seed, self.design)
+        return trials, 'generated'
+
+
+def build_library(n_schedules, path=SCHEDULE_LIBRARY_PATH, design=TASK_DESIGN):
+    """
+    Write the schedules of seeds 0..n_schedules-1 to path (and metadata to
+    the .json next to it).
+
+    Returns:
+    --------
+    invalid_seeds : list of int
+        Seeds whose schedule doesn't meet every constraint (still stored, so
+        the library matches session_schedule)
+    """
+    path = Path(path)
+    n_trials = design['n_blocks'] * design['n_trials_per_block']
+    schedules = np.empty((n_schedules, n_trials), dtype=SCHEDULE_DTYPE)
+    invalid_seeds = []
+    for seed in range(n_schedules):
+        schedules[seed], report = session_schedule(seed, design)
+        if not report['valid']:
+            invalid_seeds.append(seed)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, schedules)
+    metadata = {
+        'design': _design_json(design),
+        'n_schedules': n_schedules,
+        'n_trials': n_trials,
+        'fixation_range': FIXATION_RANGE,
+        'isi_range': ISI_RANGE,
+        'invalid_seeds': invalid_seeds,
+    }
+    with open(path.with_suffix('.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return invalid_seeds
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Precompute the trial schedules of seeds 0..N-1.')
+    parser.add_argument('--n-schedules', type=int, default=5000)
+    parser.add_argument('--output', default=repo_root / 'schedules' / 'task_schedules.npy')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    invalid_seeds = build_library(args.n_schedules, args.output)
+    print(f'Wrote {args.n_schedules} schedules to {args.output} in {time.perf_counter() - t0:.1f} s '
+          f'({len(invalid_seeds)} not meeting every constraint: {invalid_seeds[:10]})')
@@ -0,0 +1,229 @@
+"""
+Batch schedule quality checker: statistics of many schedules at once, held
+as one (n_schedules, n_trials, n_factors) array. Per-block level counts of
+every factor, trial-to-trial transition matrices, balance and adjacency
+violations of the design's constraints, and jitter distributions are all
+computed with array operations (no loop over schedules or trials), so a new
+design or a whole schedule library can be qualified before it is used.
+
+Check the schedule library from the repository root with
+    python -m src.schedule_quality [library.npy]
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from src.schedule_engine import TASK_DESIGN, factor_columns
+from src.schedule_library import FIXATION_RANGE, ISI_RANGE, SCHEDULE_DTYPE
+
+
+def _level_codes(values, levels):
+    """Index of each value in levels (-1 for values that aren't a level)."""
+    levels = np.asarray(levels)
+    order = np.argsort(levels)
+    pos = np.clip(np.searchsorted(levels[order], values), 0, len(levels) - 1)
+    codes = order[pos]
+    return np.where(levels[codes] == values, codes, -1)
+
+
+def _combo_codes(schedules, factors, design):
+    """One code per trial for the combination of factor levels, and the number of combinations."""
+    columns = factor_columns(design)
+    codes = np.zeros(schedules.shape[:-1], dtype=np.int64)
+    n_combos = 1
+    for f in factors:
+        levels = design['factors'][f]
+        codes = codes * len(levels) + _level_codes(schedules[..., columns[f]], levels)
+        n_combos *= len(levels)
+    return codes, n_combos
+
+
+def block_counts(codes, n_levels, n_blocks):
+    """
+    Counts of each level in every block.
+
+    Parameters:
+    -----------
+    codes : np.ndarray of int, shape (n_schedules, n_trials)
+        Level code of every trial (0..n_levels-1)
+
+    Returns:
+    --------
+    counts : np.ndarray of int, shape (n_schedules, n_blocks, n_levels)
+    """
+    n_schedules, n_trials = codes.shape
+    block_of = np.arange(n_trials) * n_blocks // n_trials
+    flat = (np.arange(n_schedules)[:, None] * n_blocks + block_of) * n_levels + codes
+    return np.bincount(flat.ravel(), minlength=n_schedules * n_blocks * n_levels).reshape(
+        n_schedules, n_blocks, n_levels)
+
+
+def transition_counts(codes, n_levels, n_blocks):
+    """
+    Level-to-level transitions between consecutive trials of the same block.
+
+    Returns:
+    --------
+    transitions : np.ndarray of int, shape (n_schedules, n_levels, n_levels)
+        [s, a, b]: trials of level b right after a trial of level a
+    """
+    n_schedules, n_trials = codes.shape
+    blocks = codes.reshape(n_schedules, n_blocks, n_trials // n_blocks)
+    flat = ((np.arange(n_schedules)[:, None, None] * n_levels + blocks[:, :, :-1]) * n_levels
+            + blocks[:, :, 1:])
+    return np.bincount(flat.ravel(), minlength=n_schedules * n_levels * n_levels).reshape(
+        n_schedules, n_levels, n_levels)
+
+
+def jitter_stats(values, value_range=None):
+    """
+    Distribution of one jitter over every schedule.
+
+    Parameters:
+    -----------
+    values : np.ndarray, shape (n_schedules, n_trials)
+        Jitter in seconds
+    value_range : (float, float), optional
+        Intended range; out-of-range trials are counted
+
+    Returns:
+    --------
+    stats : dict
+        Per-schedule 'mean' and 'std' arrays, and pooled 'min', 'max',
+        'percentiles' (5/25/50/75/95) and 'n_out_of_range'
+    """
+    values = np.asarray(values, dtype=float)
+    stats = {
+        'mean': values.mean(axis=1),
+        'std': values.std(axis=1),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'percentiles': dict(zip((5, 25, 50, 75, 95),
+                                np.percentile(values, (5, 25, 50, 75, 95)).tolist())),
+    }
+    if value_range is not None:
+        # Half a ms of slack: the library stores whole ms
+        out = (values < value_range[0] - 5e-4) | (values > value_range[1] + 5e-4)
+        stats['n_out_of_range'] = int(out.sum())
+    return stats
+
+
+def check_schedules(schedules, design=TASK_DESIGN, fixations=None, isis=None):
+    """
+    Quality statistics of a batch of schedules.
+
+    Parameters:
+    -----------
+    schedules : np.ndarray of int, shape (n_schedules, n_trials, n_factors)
+        Columns in design['factors'] order (a single schedule may be 2-D)
+    design : dict
+        Factors and constraints (see schedule_engine.TASK_DESIGN)
+    fixations, isis : np.ndarray, shape (n_schedules, n_trials), optional
+        Jitters in seconds
+
+    Returns:
+    --------
+    quality : dict
+        'block_counts' and 'transitions' ({factor: array}), 'balance' and
+        'no_adjacent_repeat' ({constraint: per-schedule array}),
+        'block_factor_ok', 'unknown_levels' and 'valid' (per-schedule
+        arrays), and 'fixation' / 'isi' jitter statistics if given
+    """
+    schedules = np.asarray(schedules)
+    if schedules.ndim == 2:
+        schedules = schedules[None]
+    n_schedules, n_trials, _ = schedules.shape
+    n_blocks = design['n_blocks']
+    if n_trials != n_blocks * design['n_trials_per_block']:
+        raise ValueError(f"schedules have {n_trials} trials, design has "
+                         f"{n_blocks} x {design['n_trials_per_block']}")
+    columns = factor_columns(design)
+    quality = {'n_schedules': n_schedules, 'n_trials': n_trials,
+               'block_counts': {}, 'transitions': {}}
+
+    unknown = np.zeros(n_schedules, dtype=int)
+    codes = {}
+    for f, levels in design['factors'].items():
+        codes[f] = _level_codes(schedules[..., columns[f]], levels)
+        unknown += (codes[f] < 0).sum(axis=1)
+        safe = np.maximum(codes[f], 0)
+        quality['block_counts'][f] = block_counts(safe, len(levels), n_blocks)
+        quality['transitions'][f] = transition_counts(safe, len(levels), n_blocks)
+    quality['unknown_levels'] = unknown
+
+    # Block factor: one level per block, alternating
+    block_codes = codes[design['block_factor']].reshape(n_schedules, n_blocks, -1)
+    single = (block_codes == block_codes[:, :, :1]).all(axis=(1, 2))
+    alternating = (block_codes[:, 1:, 0] != block_codes[:, :-1, 0]).all(axis=1)
+    quality['block_factor_ok'] = single & alternating
+
+    # Balance: spread of combination counts in each block, over the
+    # combinations that can occur there (the block factor only takes the
+    # block's own level)
+    quality['balance'] = {}
+    block_col_factor = design['block_factor']
+    for factors in design['balance']:
+        others = [f for f in factors if f != block_col_factor]
+        combo, n_combos = _combo_codes(schedules, others, design)
+        counts = block_counts(np.maximum(combo, 0), n_combos, n_blocks)
+        quality['balance'][' x '.join(factors)] = (counts.max(axis=2) - counts.min(axis=2)).max(axis=1)
+
+    # Adjacency: consecutive trials of a block sharing the combination
+    quality['no_adjacent_repeat'] = {}
+    for factors in design['no_adjacent_repeat']:
+        combo, _ = _combo_codes(schedules, factors, design)
+        blocks = combo.reshape(n_schedules, n_blocks, -1)
+        quality['no_adjacent_repeat'][' x '.join(factors)] = (blocks[:, :, 1:] == blocks[:, :, :-1]).sum(axis=(1, 2))
+
+    valid = quality['block_factor_ok'] & (unknown == 0)
+    for imbalance in quality['balance'].values():
+        valid &= imbalance == 0
+    for violations in quality['no_adjacent_repeat'].values():
+        valid &= violations == 0
+    quality['valid'] = valid
+
+    if fixations is not None:
+        quality['fixation'] = jitter_stats(fixations, FIXATION_RANGE)
+    if isis is not None:
+        quality['isi'] = jitter_stats(isis, ISI_RANGE)
+    return quality
+
+
+def check_library(library, design=TASK_DESIGN):
+    """check_schedules of a schedule library array (SCHEDULE_DTYPE, shape (n_schedules, n_trials))."""
+    schedules = np.stack([library[name] for name in design['factors']], axis=-1).astype(np.int64)
+    return check_schedules(schedules, design,
+                           fixations=library['fixation_ms'] / 1000, isis=library['isi_ms'] / 1000)
+
+
+def summarize(quality):
+    """JSON-friendly summary of check_schedules (counts of failing schedules, worst cases)."""
+    summary = {
+        'n_schedules': quality['n_schedules'],
+        'n_valid': int(quality['valid'].sum()),
+        'invalid_schedules': np.flatnonzero(~quality['valid'])[:20].tolist(),
+        'block_factor_failures': int((~quality['block_factor_ok']).sum()),
+        'unknown_levels': int(quality['unknown_levels'].sum()),
+        'balance_max_imbalance': {k: int(v.max()) for k, v in quality['balance'].items()},
+        'adjacent_repeats': {k: int(v.sum()) for k, v in quality['no_adjacent_repeat'].items()},
+    }
+    for jitter in ('fixation', 'isi'):
+        if jitter in quality:
+            stats = quality[jitter]
+            summary[jitter] = {key: stats[key] for key in ('min', 'max', 'percentiles', 'n_out_of_range')}
+    return summary
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Check every schedule of a schedule library.')
+    parser.add_argument('library', nargs='?', default=repo_root / 'schedules' / 'task_schedules.npy')
+    args = parser.parse_args()
+
+    library = np.load(args.library, mmap_mode='r')
+    if library.dtype != SCHEDULE_DTYPE:
+        parser.error(f'{args.library} is not a schedule library')
+    print(json.dumps(summarize(check_library(library)), indent=2))
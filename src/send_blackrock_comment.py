@@ -1,11 +1,10 @@
 
 from src.cbmex_utils import (
         check_nsp_connections,
-        get_next_log_entry,
-        get_current_log_entry,
-        gensave_filename,
         send_cbmex_comment,
     )
+from src.blackrock_session import BlackrockSession
+from src.emu_log_index import EmuLogIndex
 
 # Output folder
 from pathlib import Path
@@ -13,6 +12,31 @@ output_folder = Path('..') / 'patientData' / 'neuralLogs'
 output_folder.mkdir(parents=True, exist_ok=True)
 
 LOG_PATH = None # to be set in main.py
+BLACKROCK_SESSION = None # opened once in main.py, closed in finish_experiment
+LOG_INDEXES = {} # (log_path, task) -> EmuLogIndex, so the CSV is read once
+
+def get_log_index(log_path, task):
+    """Return the cached EMU log index for this log file and task."""
+    key = (str(log_path), task)
+    if key not in LOG_INDEXES:
+        LOG_INDEXES[key] = EmuLogIndex(log_path, task)
+    return LOG_INDEXES[key]
+
+def open_blackrock_session(cbpy=None, ips=None):
+    """Open the NSP links once; later comments reuse them."""
+    global BLACKROCK_SESSION
+    if BLACKROCK_SESSION is None:
+        BLACKROCK_SESSION = BlackrockSession(cbpy=cbpy, ips=ips)
+    if not BLACKROCK_SESSION.is_open:
+        BLACKROCK_SESSION.open()
+    return BLACKROCK_SESSION
+
+def close_blackrock_session():
+    """Close the NSP links opened by open_blackrock_session."""
+    global BLACKROCK_SESSION
+    if BLACKROCK_SESSION is not None:
+        BLACKROCK_SESSION.close()
+        BLACKROCK_SESSION = None
 
 def send_blackrock_comment(event: str, task: str, log_path: Path, additional_text: str = ""):
     """Send a comment to Blackrock NSP system via CBMEX.
@@ -25,21 +49,19 @@ def send_blackrock_comment(event: str, task: str, log_path: Path, additional_tex
         # Mirror the "No comment provided" guard, but just raise in local code
         raise ValueError("Both 'event' and 'task' must be provided")
 
-    check_nsp_connections()
+    # Reuse the long-lived session if main.py opened one
+    session = BLACKROCK_SESSION
+    if session is None:
+        check_nsp_connections()
 
+    log_index = get_log_index(log_path, task)
     if event == "start":
-        emu_num, subj_id, log_table = get_next_log_entry(log_path)
-        file_string = gensave_filename(log_path, log_table, emu_num, subj_id, task)
+        file_string = log_index.start()
     else:
-        emu_num, subj_id, log_table = get_current_log_entry(log_path)
-        file_string = gensave_filename(
-            log_path,
-            log_table,
-            emu_num,
-            subj_id,
-            task,
-            save_entry=False,
-        )
+        file_string = log_index.current()
 
     # This is the call that actually injects the comment into the NSP
-    send_cbmex_comment(event, file_string, additional_text)
+    if session is not None:
+        session.send_comment(event, file_string, additional_text)
+    else:
+        send_cbmex_comment(event, file_string, additional_text)
@@ -0,0 +1,236 @@
+"""
+Columnar session export: one row per trial (conditions, responses, RTs,
+correctness, flip timestamps) and a separate long table of slider samples
+(one row per sample, keyed by trial), so cohort analyses can read only the
+columns they need without unpickling whole sessions.
+
+Written as Parquet (<file_name>.trials.parquet / .slider.parquet) when
+pyarrow is installed, otherwise as a folder of .npy columns
+(<file_name>.columns/trials/<column>.npy, .../slider/<column>.npy) that
+np.load can memory-map. main.py / main_training.py write it at the end of
+the session when task_struct['columnar_export'] is set.
+
+Export saved sessions (.pkl or .journal) from the repository root with
+    python -m src.session_export patientData/<site>/taskLogs/*.pkl
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from src.session_reader import read_last_snapshot
+from src.trial_table import ensure_trial_table
+
+# Optional dependency: Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# trial_struct flip timestamps exported as columns (NaN when a phase didn't run)
+FLIP_FIELDS = [
+    'fixation_flip', 'instruction1_flip', 'stim1_flip', 'stim1_off_flip', 'delay_flip',
+    'stim2_flip', 'responseinstruction_flip', 'response_on_flip', 'response_submit_flip',
+    'response_end_flip',
+]
+
+# Condition fields of the trial table exported as they are
+CONDITION_FIELDS = [
+    'category', 'axis', 'pair', 'prompt_variant', 'response_variant', 'cue', 'prompt_type',
+    'stim1_position', 'stim2_position', 'break_trial', 'fixation_time', 'isi',
+]
+
+
+def trial_columns(task_struct):
+    """
+    Per-trial columns of a session.
+
+    Returns:
+    --------
+    columns : dict of np.ndarray, each shape (n_trials,)
+    """
+    task_struct = ensure_trial_table(task_struct)
+    n_trials = task_struct['n_trials']
+    trials = task_struct['trials'][:n_trials]
+    strings = task_struct['trial_strings']
+    category_names, axis_names = task_struct['category_and_axis']
+
+    def string_column(table, codes):
+        table = np.array(list(table) or [''], dtype=str)
+        return table[np.clip(codes, 0, len(table) - 1)]
+
+    def result_column(key):
+        values = np.full(n_trials, np.nan)
+        if key in task_struct:
+            result = np.asarray(task_struct[key], dtype=float)[:n_trials]
+            values[:len(result)] = result
+        return values
+
+    columns = {
+        'sub_id': np.full(n_trials, str(task_struct['sub_id'])),
+        'session': np.full(n_trials, str(task_struct['file_name'])),
+        'trial': np.arange(n_trials, dtype=np.int16),
+        'block': (np.arange(n_trials) // task_struct['n_trials_per_block']).astype(np.int8),
+    }
+    for field in CONDITION_FIELDS:
+        columns[field] = trials[field].copy()
+    columns['category_name'] = np.array(category_names, dtype=str)[trials['category']]
+    columns['axis_name'] = np.array([axis_names[c][a] for c, a in
+                                     zip(trials['category'].tolist(), trials['axis'].tolist())],
+                                    dtype=str).reshape(n_trials)
+    columns['stim1'] = string_column(strings.get('stims', []), trials['stim1'])
+    columns['stim2'] = string_column(strings.get('stims', []), trials['stim2'])
+
+    correct_response = result_column('correct_responses')
+    resp_key = result_column('resp_key')
+    columns['correct_response'] = correct_response
+    columns['resp_key'] = resp_key
+    columns['response_time'] = result_column('response_time')
+    columns['trial_time'] = result_column('trial_time')
+    columns['responded'] = np.isfinite(resp_key)
+    columns['correct'] = resp_key == correct_response  # False for misses and unknown stimuli
+
+    trial_structs = list(task_struct.get('trial_struct_cell') or [])[:n_trials]
+    trial_structs += [None] * (n_trials - len(trial_structs))
+    for field in FLIP_FIELDS:
+        columns[field] = np.array([np.nan if ts is None or ts.get(field) is None else float(ts[field])
+                                   for ts in trial_structs])
+    return columns
+
+
+def slider_columns(task_struct):
+    """
+    Slider traces of a session, one row per sample.
+
+    Returns:
+    --------
+    columns : dict of np.ndarray
+        'sub_id', 'session', 'trial', 'sample' (index within the trial),
+        'time', 'pos'
+    """
+    trials, times, positions = [], [], []
+    for t_i, trace in enumerate(task_struct.get('slider_positions') or []):
+        if not trace:
+            continue
+        trials.append(t_i)
+        times.append(np.asarray(trace['time'], dtype=float).ravel())
+        positions.append(np.asarray(trace['pos'], dtype=float).ravel())
+
+    lengths = np.array([len(p) for p in positions], dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    n_samples = int(lengths.sum())
+    return {
+        'sub_id': np.full(n_samples, str(task_struct['sub_id'])),
+        'session': np.full(n_samples, str(task_struct['file_name'])),
+        'trial': np.repeat(np.array(trials, dtype=np.int16), lengths),
+        'sample': (np.arange(n_samples) - np.repeat(starts, lengths)).astype(np.int32),
+        'time': np.concatenate(times) if times else np.zeros(0),
+        'pos': np.concatenate(positions) if positions else np.zeros(0),
+    }
+
+
+def _write_parquet(columns, path):
+    arrays = {name: pa.array(values.tolist() if values.dtype.kind == 'U' else values)
+              for name, values in columns.items()}
+    pq.write_table(pa.table(arrays), path)
+
+
+def _write_npy_columns(columns, folder):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        np.save(folder / f'{name}.npy', values)
+
+
+def export_session(task_struct, output_folder=None, fmt=None):
+    """
+    Write the trial and slider tables of a session next to its .pkl.
+
+    Parameters:
+    -----------
+    task_struct : dict
+        Session task_struct (current or older per-trial list layout)
+    output_folder : str or Path, optional
+        Default: task_struct['output_folder']
+    fmt : 'parquet', 'npy' or None
+        None: Parquet if pyarrow is installed, else .npy columns
+
+    Returns:
+    --------
+    paths : dict
+        'trials' and 'slider' output paths
+    """
+    if fmt is None:
+        fmt = 'parquet' if pq is not None else 'npy'
+    if fmt == 'parquet' and pq is None:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+    output_folder = Path(output_folder if output_folder is not None else task_struct['output_folder'])
+    base = output_folder / str(task_struct['file_name'])
+
+    tables = {'trials': trial_columns(task_struct), 'slider': slider_columns(task_struct)}
+    paths = {}
+    for name, columns in tables.items():
+        if fmt == 'parquet':
+            paths[name] = base.with_name(f'{base.name}.{name}.parquet')
+            _write_parquet(columns, paths[name])
+        else:
+            paths[name] = base.with_name(f'{base.name}.columns') / name
+            _write_npy_columns(columns, paths[name])
+    return paths
+
+
+def load_columns(path, columns=None, mmap=True):
+    """
+    Read an exported table, only the requested columns.
+
+    Parameters:
+    -----------
+    path : str or Path
+        .parquet file or .npy column folder from export_session
+    columns : list of str, optional
+        Default: all
+    mmap : bool
+        Memory-map .npy columns instead of reading them
+
+    Returns:
+    --------
+    columns : dict of np.ndarray
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        if pq is None:
+            raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        table = pq.read_table(path, columns=columns)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    names = columns if columns is not None else sorted(p.stem for p in path.glob('*.npy'))
+    return {name: np.load(path / f'{name}.npy', mmap_mode='r' if mmap else None) for name in names}
+
+
+def load_session_file(path):
+    """
+    task_struct of a saved .pkl or .journal. A .pkl the older run_session
+    appended a snapshot to after every trial is streamed record by record
+    and its last complete snapshot returned (see session_reader).
+    """
+    path = Path(path)
+    if path.suffix == '.journal':
+        from src.trial_journal import load_trial_journal
+        return load_trial_journal(path)
+    snapshot, _ = read_last_snapshot(path, keep_disp_struct=False)
+    return snapshot['task_struct']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export saved sessions as columnar trial / slider tables.')
+    parser.add_argument('sessions', nargs='+', help='.pkl or .journal files')
+    parser.add_argument('--format', choices=['parquet', 'npy'], default=None,
+                        help='default: parquet if pyarrow is installed, else npy')
+    parser.add_argument('--output-folder', default=None, help='default: next to each session file')
+    args = parser.parse_args()
+
+    for session_path in args.sessions:
+        task_struct = load_session_file(session_path)
+        paths = export_session(task_struct, args.output_folder or Path(session_path).parent, args.format)
+        print(f"{session_path}: {paths['trials']}, {paths['slider']}")
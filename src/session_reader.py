@@ -0,0 +1,145 @@
+"""
+Streaming reader for session pickles that hold many appended snapshots
+(older run_session wrote the whole task_struct after every trial, so a
+crashed session's .pkl is a stream of up to n_trials + 1 pickles).
+
+Records are read one after another with the C unpickler, and each one is
+dropped before the next is loaded, so peak memory is about one snapshot
+however many trials the file holds. Only a record that fails to unpickle
+is stepped over opcode by opcode (pickletools.genops), to tell a
+complete-but-unreadable record from the truncated tail a crash leaves.
+"""
+
+import pickle
+import pickletools
+from pathlib import Path
+
+
+def _skip_record(f, start):
+    """Move f past the record at start without building it; False if the record is incomplete."""
+    f.seek(start)
+    try:
+        for opcode, _, _ in pickletools.genops(f):
+            if opcode.name == 'STOP':
+                return True
+    except Exception:
+        pass  # unknown opcode or end of file before STOP
+    return False
+
+
+def iter_records(path, info=None):
+    """
+    Yield (offset, record, at_end) for each complete pickle record of path.
+
+    A complete record that can't be unpickled is yielded as None. at_end
+    is True for the record that ends the file. A partial tail record stops
+    the stream (info['truncated'] = True when info is given). The generator
+    keeps no reference to a yielded record, so a caller that drops it
+    before asking for the next one holds about one snapshot at a time.
+    """
+    if info is not None:
+        info['truncated'] = False
+    with open(path, 'rb') as f:
+        while True:
+            start = f.tell()
+            if not f.read(1):
+                return
+            f.seek(start)
+            try:
+                record = pickle.load(f)
+            except Exception as e:
+                if not _skip_record(f, start):
+                    if info is not None:
+                        info['truncated'] = True
+                    return
+                print(f"Warning: skipping unreadable record at byte {start} of {path}: {type(e).__name__}: {e}")
+                record = None
+            end = f.tell()
+            at_end = not f.read(1)
+            f.seek(end)
+            yield start, record, at_end
+            record = None
+
+
+def record_offsets(path):
+    """
+    Byte offsets of the complete pickle records in path.
+
+    Returns:
+    --------
+    offsets : list of int
+        Start of each complete record, in file order
+    truncated : bool
+        True if the file ends in a partial record
+    """
+    info = {}
+    offsets = [offset for offset, _, _ in iter_records(path, info)]
+    return offsets, info['truncated']
+
+
+def read_record(path, offset):
+    """Unpickle the record starting at offset."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return pickle.load(f)
+
+
+def _is_snapshot(record):
+    return isinstance(record, dict) and 'task_struct' in record
+
+
+def read_last_snapshot(path, keep_disp_struct=True):
+    """
+    Latest valid task_struct snapshot of a session pickle.
+
+    Records are streamed in order; one that is complete but can't be
+    unpickled (or holds no task_struct) is skipped. disp_struct comes from
+    the last snapshot if it has one, else from the first record, which is
+    the only one the older code wrote it in.
+
+    Parameters:
+    -----------
+    path : str or Path
+        .pkl written by main.py / run_session
+    keep_disp_struct : bool
+        False when only task_struct is needed: the first record's
+        disp_struct isn't kept while the rest of the file streams
+
+    Returns:
+    --------
+    snapshot : dict
+        {'task_struct': ..., 'disp_struct': ... or None (always None
+        with keep_disp_struct=False)}
+    info : dict
+        'n_records' (complete records), 'record' (index of the one
+        returned) and 'truncated' (file ends in a partial record)
+    """
+    path = Path(path)
+    info = {}
+    n_records = 0
+    first_disp_struct = None
+    last = None          # (index, offset) of the latest valid snapshot
+    last_record = None   # kept only if it ends the file
+    for index, (offset, record, at_end) in enumerate(iter_records(path, info)):
+        n_records += 1
+        if _is_snapshot(record):
+            if index == 0 and keep_disp_struct:
+                first_disp_struct = record.get('disp_struct')
+            last = (index, offset)
+            last_record = record if at_end else None
+        record = None  # drop before the next record is loaded
+    if info['truncated']:
+        print(f"Warning: truncated record at end of {path}")
+    if last is None:
+        raise ValueError(f"No readable task_struct snapshot in {path}")
+
+    if last_record is None:
+        # The file ended in a truncated or non-snapshot record: read back
+        # the last valid one by offset
+        last_record = read_record(path, last[1])
+    disp_struct = last_record.get('disp_struct') if keep_disp_struct else None
+    if disp_struct is None:
+        disp_struct = first_disp_struct
+
+    snapshot = {'task_struct': last_record['task_struct'], 'disp_struct': disp_struct}
+    return snapshot, {'n_records': n_records, 'record': last[0], 'truncated': info['truncated']}
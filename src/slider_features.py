@@ -0,0 +1,241 @@
+"""
+Slider trajectory features, computed for every slider trial of any number
+of sessions at once. The per-trial {'pos', 'time'} traces (one sample per
+frame, see run_session) are packed into one NaN-padded (n_traces,
+max_samples) array from the long slider table of session_export, and every
+feature is a NumPy reduction along the sample axis.
+
+Features per trace:
+    first_move_latency  time of the first sample off the start position (NaN if never moved)
+    n_direction_changes left <-> right reversals of the marker
+    final_pos           last marker position; final_side is its sign (0: center)
+    time_at_final_side  time spent on the final side
+    settle_time         time from which the marker stayed on the final side
+    path_length         total marker travel
+    confidence          |final_pos| / SLIDER_MAX (0: center, 1: end of the slider)
+    path_efficiency     |final_pos| / path_length (1: straight to the final position)
+
+Run over every session under patientData from the repository root:
+    python -m src.slider_features [patientData] [--output features.npz]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.session_export import load_session_file, slider_columns
+
+# Slider geometry of run_session / run_session_training
+SLIDER_START = 0.0
+SLIDER_MAX = 0.4
+
+FEATURE_FIELDS = [
+    'n_samples', 'duration', 'first_move_latency', 'n_direction_changes', 'final_pos', 'final_side',
+    'time_at_final_side', 'settle_time', 'path_length', 'max_extent', 'confidence', 'path_efficiency',
+]
+
+
+def pack_traces(session, trial, sample, time, pos):
+    """
+    Pack a long slider table (one row per sample, the samples of each trace
+    in consecutive rows, as slider_columns writes them) into padded arrays.
+
+    Parameters:
+    -----------
+    session, trial, sample, time, pos : array-like, shape (n_samples,)
+        Session index / label, trial index, sample index within the trial,
+        time since slider onset (s) and marker position of every sample
+
+    Returns:
+    --------
+    packed : dict
+        'session', 'trial' (n_traces,) keys of each trace, 'length'
+        (n_traces,) sample counts, 'time' and 'pos' (n_traces, max_samples)
+        padded with NaN
+    """
+    session = np.asarray(session)
+    trial = np.asarray(trial)
+    sample = np.asarray(sample, dtype=np.int64)
+    if len(sample) == 0:
+        return {'session': session, 'trial': trial, 'length': np.zeros(0, dtype=np.int64),
+                'time': np.full((0, 1), np.nan), 'pos': np.full((0, 1), np.nan)}
+
+    new_trace = np.ones(len(sample), dtype=bool)
+    new_trace[1:] = (session[1:] != session[:-1]) | (trial[1:] != trial[:-1])
+    first = np.flatnonzero(new_trace)
+    row = np.cumsum(new_trace) - 1
+    n_traces = len(first)
+    max_samples = int(sample.max()) + 1
+
+    padded_time = np.full((n_traces, max_samples), np.nan)
+    padded_pos = np.full((n_traces, max_samples), np.nan)
+    padded_time[row, sample] = time
+    padded_pos[row, sample] = pos
+    return {
+        'session': session[first],
+        'trial': trial[first],
+        'length': np.diff(np.append(first, len(sample))),
+        'time': padded_time,
+        'pos': padded_pos,
+    }
+
+
+def _last_valid(values, length):
+    """values[i, length[i] - 1] (NaN for empty rows)."""
+    last = np.full(len(values), np.nan)
+    has = length > 0
+    last[has] = values[has, length[has] - 1]
+    return last
+
+
+def trace_features(packed):
+    """
+    Trajectory features of every packed trace.
+
+    Returns:
+    --------
+    features : dict of np.ndarray, each shape (n_traces,)
+        FEATURE_FIELDS, plus 'session' and 'trial'
+    """
+    pos = packed['pos']
+    time = packed['time']
+    length = packed['length']
+    n_traces, max_samples = pos.shape
+    valid = np.arange(max_samples) < length[:, None]
+    columns = np.broadcast_to(np.arange(max_samples), pos.shape)
+
+    # First sample off the start position
+    moved = valid & (pos != SLIDER_START)
+    any_moved = moved.any(axis=1)
+    first_move = moved.argmax(axis=1)
+    first_move_latency = np.where(any_moved, time[np.arange(n_traces), first_move], np.nan)
+
+    # Direction of each step (0: no move); a change is a step opposite to
+    # the last non-zero step before it
+    step = np.sign(np.nan_to_num(np.diff(pos, axis=1)))
+    step_index = np.where(step != 0, columns[:, 1:], 0)
+    last_step = np.maximum.accumulate(step_index, axis=1)
+    previous = np.zeros_like(step)
+    previous[:, 1:] = np.take_along_axis(np.pad(step, ((0, 0), (1, 0))), last_step[:, :-1], axis=1)
+    n_direction_changes = ((step != 0) & (step == -previous)).sum(axis=1)
+
+    path_length = np.nansum(np.abs(np.diff(pos, axis=1)), axis=1)
+    final_pos = _last_valid(pos, length)
+    final_side = np.sign(np.nan_to_num(final_pos))
+    duration = _last_valid(time, length)
+
+    # Sample i is shown until sample i + 1; the last one ends the trace
+    hold = np.nan_to_num(np.diff(time, axis=1, append=np.nan))
+    side = np.where(valid, np.sign(pos), np.nan)
+    at_final = valid & (side == final_side[:, None])
+    time_at_final_side = np.where(at_final, hold, 0).sum(axis=1)
+    off_final = valid & ~at_final
+    last_off = np.where(off_final.any(axis=1), max_samples - 1 - off_final[:, ::-1].argmax(axis=1), -1)
+    settle_index = np.minimum(last_off + 1, np.maximum(length - 1, 0))
+    settle_time = np.where(length > 0, time[np.arange(n_traces), settle_index], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        max_extent = np.where(length > 0, np.where(valid, np.abs(pos), 0).max(axis=1), np.nan)
+        confidence = np.abs(final_pos) / SLIDER_MAX
+        path_efficiency = np.where(path_length > 0, np.abs(final_pos) / path_length, np.nan)
+
+    return {
+        'session': packed['session'],
+        'trial': packed['trial'],
+        'n_samples': length,
+        'duration': duration,
+        'first_move_latency': first_move_latency,
+        'n_direction_changes': n_direction_changes,
+        'final_pos': final_pos,
+        'final_side': final_side.astype(np.int8),
+        'time_at_final_side': time_at_final_side,
+        'settle_time': settle_time,
+        'path_length': path_length,
+        'max_extent': max_extent,
+        'confidence': confidence,
+        'path_efficiency': path_efficiency,
+    }
+
+
+def _pack_tables(tables):
+    """pack_traces over the slider tables of several sessions, keyed by list index (None: skipped)."""
+    tables = [(i, t) for i, t in enumerate(tables) if t is not None]
+
+    def concat(name, dtype):
+        return np.concatenate([t[name] for _, t in tables]) if tables else np.zeros(0, dtype=dtype)
+
+    session = np.concatenate([np.full(len(t['pos']), i, dtype=np.int32) for i, t in tables]
+                             or [np.zeros(0, dtype=np.int32)])
+    return pack_traces(session, concat('trial', np.int16), concat('sample', np.int32),
+                       concat('time', float), concat('pos', float))
+
+
+def session_features(task_structs):
+    """
+    Features of every slider trial of several sessions, in one pass.
+
+    Parameters:
+    -----------
+    task_structs : list of dict
+        Session task_structs (e.g. from session_export.load_session_file)
+
+    Returns:
+    --------
+    features : dict of np.ndarray
+        trace_features, with 'session' the index into task_structs
+    """
+    return trace_features(_pack_tables([slider_columns(task_struct) for task_struct in task_structs]))
+
+
+def _load_slider_table(path):
+    """Pool worker: the slider table of one session file (small next to the session)."""
+    try:
+        task_struct = load_session_file(path)
+    except Exception as e:
+        print(f"Warning: could not read {path}: {type(e).__name__}: {e}")
+        return None
+    return slider_columns(task_struct)
+
+
+def file_features(paths, workers=None):
+    """
+    Features of every slider trial in the session files at paths. Files are
+    read on a process pool; features are computed once over all of them.
+
+    Returns:
+    --------
+    features : dict of np.ndarray
+        trace_features, with 'session' the index into paths, plus 'sub_id'
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tables = list(pool.map(_load_slider_table, paths))
+    features = trace_features(_pack_tables(tables))
+    sub_ids = np.array([t['sub_id'][0] if t is not None and len(t['sub_id']) else '' for t in tables] or [''],
+                       dtype=str)
+    features['sub_id'] = sub_ids[features['session']]
+    return features
+
+
+if __name__ == '__main__':
+    from src.cohort_analysis import discover_sessions
+
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Slider trajectory features of every session.')
+    parser.add_argument('root', nargs='?', default=repo_root / 'patientData')
+    parser.add_argument('--kind', choices=['task', 'training'], nargs='+', default=['task'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='write the features to this .npz')
+    args = parser.parse_args()
+
+    sessions = [s for s in discover_sessions(args.root) if s['kind'] in args.kind]
+    paths = [str(s['path']) for s in sessions]
+    features = file_features(paths, args.workers)
+    print(f"{len(features['trial'])} slider trials from {len(paths)} sessions")
+    for field in FEATURE_FIELDS:
+        with np.errstate(invalid='ignore'):
+            print(f"{field}: median {np.nanmedian(features[field]) if len(features[field]) else np.nan:.3f}")
+    if args.output:
+        np.savez(args.output, session_path=np.array(paths, dtype=str), **features)
+        print(f"Wrote {args.output}")
@@ -0,0 +1,136 @@
+"""
+Stimulus manifest: stimuli/stimulus_manifest.json lists every task image,
+per stimulus set, with its category, pair and feature on each axis. It is
+read once into dict indexes keyed by filename, so trial setup and
+correct-response lookups don't scan folders or search a list.
+
+Check the manifest against the stimulus folders from the repository root with
+    python -m src.stim_manifest
+"""
+
+import argparse
+import json
+from functools import lru_cache
+from pathlib import Path
+
+# Relative to src/, like the other task paths (main.py chdirs there)
+MANIFEST_PATH = Path('..') / 'stimuli' / 'stimulus_manifest.json'
+
+
+class StimulusManifest:
+    def __init__(self, stim_set, entries):
+        """
+        stim_set: name of the stimulus folder below stimuli/ (e.g. 'Training')
+        entries: {filename: {'path', 'category', 'pair', 'features'}} from the
+            manifest; 'path' is relative to the stimulus set folder, 'pair' is
+            None for sets without Pair folders, 'features' is {axis: feature}
+        """
+        self.stim_set = stim_set
+        self.entries = entries
+        self.by_folder = {}  # (category, pair) -> filenames, sorted
+        for name in sorted(entries):
+            entry = entries[name]
+            self.by_folder.setdefault((entry['category'], entry['pair']), []).append(name)
+
+    def __contains__(self, stim_path):
+        return Path(stim_path).name in self.entries
+
+    def features(self, stim_path):
+        """{axis: feature} of a stimulus, or None if it isn't in the manifest."""
+        entry = self.entries.get(Path(stim_path).name)
+        return None if entry is None else entry['features']
+
+    def folder_images(self, stim_folder, category, pair=None):
+        """
+        Paths of the images of one category (and pair), as a folder glob
+        would return them.
+
+        Parameters:
+        -----------
+        stim_folder : Path
+            Folder of the stimulus set
+        category : str
+            Category name, e.g. 'Animals'
+        pair : int or None
+            1-based pair number, None for sets without Pair folders
+
+        Returns:
+        --------
+        folder_images : list of Path
+            Empty if the manifest has no images for this folder
+        """
+        return [Path(stim_folder) / self.entries[name]['path']
+                for name in self.by_folder.get((category, pair), [])]
+
+
+@lru_cache(maxsize=None)
+def _read_manifest(manifest_path):
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def load_manifest(stim_set, manifest_path=MANIFEST_PATH, required=False):
+    """
+    Manifest of one stimulus set. The JSON file is parsed once per process.
+
+    Parameters:
+    -----------
+    stim_set : str
+        Stimulus folder below stimuli/, e.g. 'Task_Stim_New_v1'
+    manifest_path : str or Path
+        Manifest file
+    required : bool
+        Raise if the manifest file is missing (stimulus features have no
+        other source), instead of returning an empty manifest
+
+    Returns:
+    --------
+    manifest : StimulusManifest
+        Empty (every lookup misses) if the file or the set is missing, so
+        callers fall back to scanning the folders
+    """
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        if required:
+            raise FileNotFoundError(f'Stimulus manifest not found: {manifest_path}')
+        return StimulusManifest(stim_set, {})
+    return StimulusManifest(stim_set, _read_manifest(str(manifest_path.resolve())).get(stim_set, {}))
+
+
+def check_manifest(stim_root, manifest_path):
+    """Manifest entries without an image, and images without a manifest entry."""
+    from src.stim_preprocess import find_stimuli
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    problems = []
+    for stim_set, entries in manifest.items():
+        set_folder = Path(stim_root) / stim_set
+        listed = {(set_folder / entry['path']).resolve() for entry in entries.values()}
+        for path in sorted(listed):
+            if not path.exists():
+                problems.append(f'missing image: {path}')
+        for name, entry in entries.items():
+            if Path(entry['path']).name != name:
+                problems.append(f'{stim_set}: key {name} does not match path {entry["path"]}')
+        # Only the category (and pair) folders the task samples from
+        for folder in {(set_folder / entry['path']).parent for entry in entries.values()}:
+            for path in find_stimuli(folder):
+                if path.parent == folder and path.resolve() not in listed:
+                    problems.append(f'not in manifest: {path}')
+    return problems
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Check the stimulus manifest against the stimulus folders.')
+    parser.add_argument('--manifest', default=repo_root / 'stimuli' / 'stimulus_manifest.json')
+    parser.add_argument('--stim-root', default=repo_root / 'stimuli')
+    args = parser.parse_args()
+
+    problems = check_manifest(args.stim_root, args.manifest)
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise SystemExit(1)
+    print(f'{args.manifest} matches {args.stim_root}')
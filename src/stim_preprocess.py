@@ -0,0 +1,186 @@
+"""
+Stimulus preprocessing: decode each stimulus JPEG once, resize it to the
+size it is shown at, and store it as a .npy file keyed by the image's
+content hash and target size, already in the form visual.ImageStim takes
+(float32 RGB in [-1, 1], bottom-up rows). init_task maps every stimulus to
+its cache file once; textures are then memory-mapped as they are, with no
+decoding, hashing or conversion during the session.
+
+Build the cache ahead of time from the repository root with
+    python -m src.stim_preprocess
+(init_task also fills in any missing entries on first use).
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Relative to src/, like the other task paths (main.py chdirs there)
+STIM_CACHE_DIR = Path('..') / 'stimuli' / '.cache'
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+# Cache file layout (in the file name, so entries of an older layout are rebuilt)
+CACHE_FORMAT = 'f32'
+
+# Decode / resize workers (PIL releases the GIL while decoding and resizing)
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def content_hash(path):
+    """SHA-1 of the file contents, so an edited image gets a new cache entry."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(stim_path, size, cache_dir=STIM_CACHE_DIR):
+    """Cache file for one stimulus at one display size (width, height)."""
+    return Path(cache_dir) / f'{content_hash(stim_path)}_{size[0]}x{size[1]}_{CACHE_FORMAT}.npy'
+
+
+def resize_image(stim_path, size):
+    """Decode stim_path and resize it to size (width, height); returns uint8 (h, w, 3)."""
+    with Image.open(stim_path) as img:
+        img = img.convert('RGB')
+        if img.size != tuple(size):
+            img = img.resize(tuple(size), Image.LANCZOS)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def texture_array(rgb):
+    """uint8 (h, w, 3) RGB -> float32 in [-1, 1], flipped to PsychoPy's bottom-up row order."""
+    return np.flipud(rgb).astype(np.float32) / 127.5 - 1.0
+
+
+def preprocess_image(stim_path, size, cache_dir=STIM_CACHE_DIR):
+    """
+    Write the resized RGB array of one stimulus to the cache, if not there yet.
+
+    Parameters:
+    -----------
+    stim_path : str or Path
+        Source image
+    size : (int, int)
+        Display size in pixels (width, height)
+    cache_dir : str or Path
+        Cache folder
+
+    Returns:
+    --------
+    npy_path : Path
+        Cache file holding the float32 (height, width, 3) texture_array
+    """
+    npy_path = cache_path(stim_path, size, cache_dir)
+    if npy_path.exists():
+        return npy_path
+
+    npy_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary name and rename, so a half-written file is never
+    # loaded (per thread: identical images in two folders share a cache file)
+    tmp_path = npy_path.with_suffix(f'.{os.getpid()}-{threading.get_ident()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, texture_array(resize_image(stim_path, size)))
+    os.replace(tmp_path, npy_path)
+    return npy_path
+
+
+def preprocess_images(stim_sizes, cache_dir=STIM_CACHE_DIR, n_workers=DEFAULT_WORKERS):
+    """
+    Make sure every stimulus has a cache entry, decoding the missing ones in
+    parallel.
+
+    Parameters:
+    -----------
+    stim_sizes : dict
+        {stim_path: (width, height)}
+    cache_dir : str or Path
+        Cache folder
+    n_workers : int
+        Worker threads (1 = decode on the calling thread)
+
+    Returns:
+    --------
+    npy_paths : dict
+        {stim_path: cache file}
+    """
+    items = list(stim_sizes.items())
+    if n_workers <= 1:
+        return {stim_path: preprocess_image(stim_path, size, cache_dir) for stim_path, size in items}
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        npy_paths = pool.map(lambda item: preprocess_image(item[0], item[1], cache_dir), items)
+        return dict(zip(stim_sizes, npy_paths))
+
+
+def load_cached_texture(npy_path):
+    """Image array for visual.ImageStim: the cache file, memory-mapped as stored."""
+    return np.load(npy_path, mmap_mode='r')
+
+
+def cached_texture_loader(npy_paths):
+    """
+    TextureCache loader over the {stim_path: cache file} map returned by
+    preprocess_images: a memory-mapped read per texture, nothing else.
+    """
+    def load(stim_path, size):
+        return load_cached_texture(npy_paths[stim_path])
+    return load
+
+
+def load_stimulus_texture(stim_path, size, cache_dir=STIM_CACHE_DIR):
+    """
+    Image array for one stimulus, building its cache entry if needed. Hashes
+    the source image on every call; use cached_texture_loader in the session.
+    """
+    return load_cached_texture(preprocess_image(stim_path, size, cache_dir))
+
+
+def stim_display_sizes(task_struct, horizontal_rects):
+    """
+    Display size (width, height) in pixels of every stimulus in the session,
+    from the rect each one is shown in (run_session sets the stimulus size
+    to the rect width, keeping the square images square).
+    """
+    sizes = {}
+    trials = task_struct['trials']
+    stims = task_struct['trial_strings']['stims']
+    for stim_field in ('stim1', 'stim2'):
+        for stim, position in zip(trials[stim_field].tolist(), trials[f'{stim_field}_position'].tolist()):
+            stim_path = stims[stim]
+            rect = horizontal_rects[position - 1]
+            width = int(round(rect[2] - rect[0]))
+            if width > sizes.get(stim_path, (0, 0))[0]:
+                sizes[stim_path] = (width, width)
+    return sizes
+
+
+def find_stimuli(stim_root):
+    """Every image file below stim_root."""
+    return sorted(p for p in Path(stim_root).rglob('*')
+                  if p.suffix.lower() in IMAGE_SUFFIXES and '.cache' not in p.parts)
+
+
+if __name__ == '__main__':
+    repo_root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description='Pre-resize stimuli into the .npy texture cache.')
+    parser.add_argument('stim_root', nargs='*', default=[repo_root / 'stimuli'],
+                        help='folders to scan for images (default: stimuli/)')
+    parser.add_argument('--size', type=int, default=466, help='display width/height in pixels')
+    parser.add_argument('--cache-dir', default=repo_root / 'stimuli' / '.cache')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    stim_sizes = {stim_path: (args.size, args.size)
+                  for stim_root in args.stim_root for stim_path in find_stimuli(stim_root)}
+    n_cached = len(list(Path(args.cache_dir).glob('*.npy'))) if Path(args.cache_dir).exists() else 0
+    preprocess_images(stim_sizes, args.cache_dir, args.workers)
+    n_written = len(list(Path(args.cache_dir).glob('*.npy'))) - n_cached
+    print(f'Wrote {n_written} new cache entries to {args.cache_dir}')
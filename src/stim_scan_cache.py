@@ -0,0 +1,84 @@
+"""
+Directory scan cache for stimulus folders: each folder is listed once per
+session, and the listings can be kept on disk between sessions, checked
+against the folder's modification time, so network-mounted stimulus shares
+are not re-scanned for every trial or every startup.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from src.stim_preprocess import STIM_CACHE_DIR
+
+SCAN_CACHE_PATH = STIM_CACHE_DIR / 'folder_scan.json'
+
+
+class FolderScanCache:
+    def __init__(self, cache_path=None):
+        """
+        cache_path: JSON file the listings are kept in between sessions, or
+            None to only cache in memory
+        """
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.listings = {}  # folder -> {'mtime_ns': int, 'files': [names]}
+        self.checked = set()  # folders already listed / validated this session
+        self.scans = 0
+        self.dirty = False
+        if self.cache_path is not None and self.cache_path.exists():
+            try:
+                with open(self.cache_path) as f:
+                    self.listings = json.load(f)
+            except (OSError, ValueError):
+                self.listings = {}  # unreadable cache, rebuilt on save()
+
+    def list_folder(self, folder):
+        """
+        Names of the files in folder (sorted). Listed once per session; a
+        stored listing is reused while the folder's mtime is unchanged
+        (adding, removing or renaming a file updates it).
+
+        Returns:
+        --------
+        names : list of str
+            Empty if the folder doesn't exist
+        """
+        key = os.path.abspath(folder)  # no filesystem access, unlike resolve()
+        if key in self.checked:
+            return self.listings[key]['files']
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except FileNotFoundError:
+            return []
+
+        listing = self.listings.get(key)
+        if listing is None or listing['mtime_ns'] != mtime_ns:
+            with os.scandir(key) as entries:
+                files = sorted(entry.name for entry in entries if entry.is_file())
+            listing = self.listings[key] = {'mtime_ns': mtime_ns, 'files': files}
+            self.scans += 1
+            self.dirty = True
+        self.checked.add(key)
+        return listing['files']
+
+    def images(self, folder, suffix='.jpg'):
+        """
+        Paths of the images in folder, like folder.glob('*.jpg') with a
+        '*.JPG' fallback.
+        """
+        names = self.list_folder(folder)
+        matches = [name for name in names if name.endswith(suffix)]
+        if len(matches) == 0:
+            matches = [name for name in names if name.endswith(suffix.upper())]
+        return [Path(folder) / name for name in matches]
+
+    def save(self):
+        """Write the listings to cache_path, if anything was (re)scanned."""
+        if self.cache_path is None or not self.dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.listings, f)
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
@@ -0,0 +1,130 @@
+"""
+Bounded LRU cache of stimulus textures. Textures for upcoming trials are
+queued with prefetch() and loaded one per frame with load_pending() during
+phases that have idle time (ISI, response), so a trial's stimuli are
+usually resident before they are drawn and old ones are evicted.
+"""
+
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from psychopy import visual
+
+from src.stim_preprocess import cached_texture_loader, preprocess_images
+
+# Trials ahead of the current one whose stimuli are prefetched
+LOOKAHEAD_TRIALS = 2
+
+
+class TextureCache:
+    def __init__(self, win, stim_sizes, capacity=12, loader=None):
+        """
+        win: PsychoPy window the textures belong to
+        stim_sizes: {stim_path: (width, height)} display size of every stimulus
+        capacity: maximum number of textures kept on the GPU; at least the
+            current trial's plus LOOKAHEAD_TRIALS trials' stimuli (6)
+        loader: loader(stim_path, size) -> image array for visual.ImageStim;
+            default: cached_texture_loader over preprocess_images(stim_sizes),
+            resolved here once so loads during the session never hash or
+            decode the source images
+        """
+        self.win = win
+        self.stim_sizes = stim_sizes
+        self.capacity = capacity
+        if loader is None:
+            loader = cached_texture_loader(preprocess_images(stim_sizes))
+        self.loader = loader
+        self.textures = OrderedDict()   # stim_path -> ImageStim, least recently used first
+        self.pending = deque()          # stim_paths queued by prefetch()
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.evictions = 0
+        self.load_times = []
+
+    def _load(self, stim_path, image=None):
+        """Create the ImageStim (GL texture upload); must run on the window's thread."""
+        t0 = time.perf_counter()
+        size = self.stim_sizes[stim_path]
+        if image is None:
+            image = self.loader(stim_path, size)
+        image_stim = visual.ImageStim(
+            self.win,
+            image=image,
+            size=size,
+            units="pix"
+            # pos is set per trial
+        )
+        self.load_times.append(time.perf_counter() - t0)
+
+        self.textures[stim_path] = image_stim
+        while len(self.textures) > self.capacity:
+            self.textures.popitem(last=False)
+            self.evictions += 1
+        return image_stim
+
+    def get(self, stim_path):
+        """ImageStim for stim_path, loading it now if it isn't resident."""
+        if stim_path in self.textures:
+            self.hits += 1
+            self.textures.move_to_end(stim_path)
+            return self.textures[stim_path]
+        self.misses += 1
+        return self._load(stim_path)
+
+    def prefetch(self, stim_paths):
+        """Queue stimuli to be loaded by later load_pending() calls."""
+        for stim_path in stim_paths:
+            if stim_path not in self.textures and stim_path not in self.pending:
+                self.pending.append(stim_path)
+
+    def load_pending(self, max_loads=1):
+        """Load up to max_loads queued textures; call once per idle frame."""
+        n_loaded = 0
+        while self.pending and n_loaded < max_loads:
+            stim_path = self.pending.popleft()
+            if stim_path in self.textures:
+                continue
+            self._load(stim_path)
+            self.prefetched += 1
+            n_loaded += 1
+        return n_loaded
+
+    def preload(self, stim_paths, n_workers=1):
+        """
+        Load stimuli now, e.g. at startup. Image arrays are read / decoded on
+        n_workers threads; only the texture upload runs on this thread.
+        """
+        stim_paths = [p for p in dict.fromkeys(stim_paths) if p not in self.textures]
+        if n_workers > 1 and len(stim_paths) > 1:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                images = pool.map(lambda p: self.loader(p, self.stim_sizes[p]), stim_paths)
+                for stim_path, image in zip(stim_paths, images):
+                    self._load(stim_path, image)
+        else:
+            for stim_path in stim_paths:
+                self._load(stim_path)
+        self.prefetched += len(stim_paths)
+        return len(stim_paths)
+
+    def stats(self):
+        """Hit / miss / eviction counts and texture load times."""
+        load_times = np.array(self.load_times)
+        return {
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'prefetched': self.prefetched,
+            'evictions': self.evictions,
+            'load_time': load_times,
+            'load_time_max': float(load_times.max()) if len(load_times) else np.nan,
+        }
+
+
+def prefetch_upcoming(texture_cache, trial_stims, t_i, lookahead=LOOKAHEAD_TRIALS):
+    """Queue the stimuli of trials t_i+1 .. t_i+lookahead for loading."""
+    for t_next in range(t_i + 1, min(t_i + 1 + lookahead, len(trial_stims))):
+        texture_cache.prefetch(trial_stims[t_next])
@@ -0,0 +1,230 @@
+"""
+Append-only trial journal. The static part of task_struct is written once
+as a header, then each trial appends only its own record, so the save at
+the end of a trial costs the same on trial 1 and trial 192.
+"""
+
+import os
+import pickle
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src.filter_picklable import filter_picklable
+
+# Per-trial entries of task_struct that change while the session runs
+TRIAL_FIELDS = ['resp_key', 'response_time', 'trial_time', 'slider_positions']
+
+# Session-level entries of task_struct that are only known at the end
+END_FIELDS = ['comment_dispatch', 'frame_timing', 'texture_cache_stats']
+
+# When the writer thread calls fsync: after every record, at the end of each
+# block (and the session), or never (flush to the OS only)
+FSYNC_POLICIES = ['trial', 'block', 'none']
+
+
+class TrialJournal:
+    def __init__(self, path):
+        """
+        path: journal file (e.g. taskLogs/<file_name>.journal)
+        """
+        self.path = path
+        self.f = None
+        self.n_records = 0
+
+    def open(self, task_struct):
+        """Create the journal and write the task_struct header once."""
+        self.f = open(self.path, 'wb')
+        header = filter_picklable(task_struct, "task_struct")
+        self.write_record({'type': 'header', 'task_struct': header})
+        return self
+
+    def write_record(self, record, sync=False):
+        pickle.dump(record, self.f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.f.flush()
+        if sync:
+            os.fsync(self.f.fileno())
+        self.n_records += 1
+
+    def append_trial(self, t_i, trial_struct, task_struct):
+        """Append the responses, RTs, flip times and slider trace of one trial."""
+        self.write_record(make_trial_record(t_i, trial_struct, task_struct))
+
+    def append_end(self, task_struct):
+        """Append session-level results known only at the end (completion, stats)."""
+        self.write_record(make_end_record(task_struct), sync=True)
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+class BackgroundTrialWriter:
+    def __init__(self, journal, fsync_policy='block', maxsize=16):
+        """
+        journal: opened TrialJournal; only the writer thread touches it
+        fsync_policy: one of FSYNC_POLICIES
+        maxsize: bound on trial records waiting to be written
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of {FSYNC_POLICIES}")
+        self.journal = journal
+        self.fsync_policy = fsync_policy
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, name='TrialWriter', daemon=True)
+        self.error = None
+
+        self.trials = []
+        self.enqueue_latency = []
+        self.write_latency = []
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _submit(self, record, sync, t_i=-1):
+        t0 = time.perf_counter()
+        self.queue.put((record, sync, t_i))  # blocks only if the writer falls behind
+        return time.perf_counter() - t0
+
+    def append_trial(self, t_i, trial_struct, task_struct):
+        """Queue one trial record; called from the display thread."""
+        record = make_trial_record(t_i, trial_struct, task_struct)
+        block_end = bool(task_struct['trials']['break_trial'][t_i]) or t_i == task_struct['n_trials'] - 1
+        sync = self.fsync_policy == 'trial' or (self.fsync_policy == 'block' and block_end)
+        self.enqueue_latency.append(self._submit(record, sync, t_i))
+
+    def append_end(self, task_struct):
+        self._submit(make_end_record(task_struct), self.fsync_policy != 'none')
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            record, sync, t_i = item
+            t0 = time.perf_counter()
+            try:
+                self.journal.write_record(record, sync=sync)
+            except Exception as e:
+                # Keep draining so the display thread never blocks on a dead writer
+                if self.error is None:
+                    print(f"Warning: could not write trial data to {self.journal.path}: {e}")
+                self.error = e
+            if record['type'] == 'trial':
+                self.trials.append(t_i)
+                self.write_latency.append(time.perf_counter() - t0)
+            self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued record is written and synced to disk."""
+        if not self.thread.is_alive():
+            return
+        self.queue.join()
+        try:
+            os.fsync(self.journal.f.fileno())
+        except Exception:
+            pass
+
+    def close(self):
+        """Write remaining records, stop the thread and close the journal."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.journal.close()
+        return self.stats()
+
+    def stats(self):
+        """Per-trial enqueue (display thread) and write (writer thread) latencies."""
+        return {
+            'fsync_policy': self.fsync_policy,
+            'trial': np.array(self.trials, dtype=int),
+            'enqueue_latency': np.array(self.enqueue_latency),
+            'write_latency': np.array(self.write_latency),
+            'error': None if self.error is None else str(self.error),
+        }
+
+
+def make_trial_record(t_i, trial_struct, task_struct):
+    """Responses, RTs, flip times and slider trace of one trial."""
+    record = {'type': 'trial', 't_i': t_i, 'trial_struct': trial_struct}
+    for field in TRIAL_FIELDS:
+        if field in task_struct:
+            record[field] = task_struct[field][t_i]
+    return record
+
+
+def make_end_record(task_struct):
+    """Session-level results known only at the end (completion, stats)."""
+    record = {'type': 'end', 'complete_flag': task_struct.get('complete_flag')}
+    for key in END_FIELDS:
+        if key in task_struct:
+            record[key] = task_struct[key]
+    return record
+
+
+def iter_journal(path, info=None):
+    """
+    Yield journal records in order, stopping at a truncated tail record
+    (with a warning, and info['truncated'] = True when info is given).
+    """
+    if info is not None:
+        info['truncated'] = False
+    with open(path, 'rb') as f:
+        while True:
+            start = f.tell()
+            if not f.read(1):
+                return  # clean end of file
+            f.seek(start)
+            try:
+                record = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                # Partially written record from a crash (a cut-off record
+                # usually raises EOFError); everything before it is intact
+                print(f"Warning: truncated record at end of {path}")
+                if info is not None:
+                    info['truncated'] = True
+                return
+            yield record
+
+
+def load_trial_journal(path):
+    """
+    Rebuild the final task_struct from a journal.
+
+    Parameters:
+    -----------
+    path : str or Path
+        Journal file written by TrialJournal
+
+    Returns:
+    --------
+    task_struct : dict
+        Header task_struct with every journaled trial filled in,
+        including trial_struct_cell
+    """
+    task_struct = None
+    for record in iter_journal(path):
+        if record['type'] == 'header':
+            task_struct = record['task_struct']
+            task_struct['trial_struct_cell'] = [None] * task_struct['n_trials']
+            task_struct['complete_flag'] = 0  # until an end record says otherwise
+        elif record['type'] == 'trial':
+            t_i = record['t_i']
+            task_struct['trial_struct_cell'][t_i] = record['trial_struct']
+            for field in TRIAL_FIELDS:
+                if field in record:
+                    task_struct[field][t_i] = record[field]
+        elif record['type'] == 'end':
+            task_struct['complete_flag'] = record['complete_flag']
+            for key in END_FIELDS:
+                if key in record:
+                    task_struct[key] = record[key]
+
+    if task_struct is None:
+        raise ValueError(f"No journal header found in {path}")
+    return task_struct
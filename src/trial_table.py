@@ -0,0 +1,136 @@
+"""
+Trial table: the conditions of every trial in one NumPy record array
+(task_struct['trials']) with small integer dtypes, instead of parallel
+Python lists. Strings (stimulus paths, instruction texts) are interned once
+in task_struct['trial_strings'] and the table holds their indexes; the
+'First' / 'Second' labels follow from the prompt type.
+"""
+
+import numpy as np
+
+TRIAL_DTYPE = np.dtype([
+    ('category', 'i1'),  # index into category_names
+    ('axis', 'i1'),  # which of the category's 2 axes
+    ('pair', 'i1'),  # stimulus pair (0-based)
+    ('prompt_variant', 'i1'),  # which feature of the axis is asked for
+    ('response_variant', 'i1'),  # 0: button, 1: slider
+    ('cue', 'i1'),  # 1: cue, 2: retrocue
+    ('prompt_type', 'i1'),  # 1: 'First' on the left / top, 2: 'Second'
+    ('stim1', 'i2'),  # index into trial_strings['stims']
+    ('stim2', 'i2'),
+    ('stim1_position', 'i1'),  # 1 = left / 2 = right / 3 = center
+    ('stim2_position', 'i1'),
+    ('instruction', 'i2'),  # index into trial_strings['instructions']
+    ('response_instruction', 'i2'),  # index into trial_strings['response_instructions']
+    ('break_trial', '?'),  # break screen after this trial
+    ('fixation_time', 'f8'),  # s, snapped to whole frames by init_task
+    ('isi', 'f8'),
+    ('fixation_frames', 'i4'),
+    ('isi_frames', 'i4'),
+])
+
+# (left / top text, right / bottom text) of each prompt type
+PROMPT_TEXT = {1: ('First', 'Second'), 2: ('Second', 'First')}
+
+
+class StringTable:
+    def __init__(self):
+        """Interns strings while a trial table is built: each is stored once."""
+        self.strings = []
+        self.index = {}
+
+    def add(self, s):
+        """Index of s, adding it if new."""
+        code = self.index.get(s)
+        if code is None:
+            code = self.index[s] = len(self.strings)
+            self.strings.append(s)
+        return code
+
+
+def new_trial_table(n_trials):
+    return np.zeros(n_trials, dtype=TRIAL_DTYPE)
+
+
+def trial_stims(task_struct, t_i):
+    """(first, second) stimulus path of trial t_i."""
+    trial = task_struct['trials'][t_i]
+    stims = task_struct['trial_strings']['stims']
+    return stims[trial['stim1']], stims[trial['stim2']]
+
+
+def all_trial_stims(task_struct):
+    """(first, second) stimulus paths of every trial."""
+    trials = task_struct['trials']
+    stims = task_struct['trial_strings']['stims']
+    return [(stims[s1], stims[s2]) for s1, s2 in zip(trials['stim1'].tolist(), trials['stim2'].tolist())]
+
+
+def prompt_text(task_struct, t_i):
+    """(left / top, right / bottom) response label of trial t_i."""
+    return PROMPT_TEXT[int(task_struct['trials']['prompt_type'][t_i])]
+
+
+def instruction_text(task_struct, t_i):
+    """Task instruction of trial t_i."""
+    return task_struct['trial_strings']['instructions'][task_struct['trials']['instruction'][t_i]]
+
+
+def response_instruction_text(task_struct, t_i):
+    """Response (button / slider) instruction of trial t_i."""
+    return task_struct['trial_strings']['response_instructions'][
+        task_struct['trials']['response_instruction'][t_i]]
+
+
+# task_struct keys of sessions saved before the trial table, per field
+LEGACY_FIELDS = {
+    'category': 'trial_categories',
+    'axis': 'trial_axis',
+    'pair': 'trial_pairs',
+    'prompt_variant': 'prompt_variants',
+    'response_variant': 'response_variants',
+    'cue': 'trial_cues',
+    'prompt_type': 'prompt_types',
+    'stim1_position': 'stim1_position',
+    'stim2_position': 'stim2_position',
+    'break_trial': 'break_trial',
+    'fixation_time': 'fixation_time',
+    'isi': 'ISI',
+    'fixation_frames': 'fixation_frames',
+    'isi_frames': 'ISI_frames',
+}
+
+
+def ensure_trial_table(task_struct):
+    """
+    Add 'trials' / 'trial_strings' to a task_struct saved with the older
+    parallel per-trial lists (trial_categories, trial_stims, left_text, ...).
+    Missing fields stay 0. Returns task_struct.
+    """
+    if 'trials' in task_struct:
+        return task_struct
+    n_trials = task_struct['n_trials']
+    trials = new_trial_table(n_trials)
+    for field, key in LEGACY_FIELDS.items():
+        values = task_struct.get(key)
+        if values is None or np.isscalar(values):
+            continue
+        values = np.asarray(values, dtype=float)[:n_trials]
+        trials[field][:len(values)] = np.nan_to_num(values)
+
+    stims, instructions, response_instructions = StringTable(), StringTable(), StringTable()
+    for t_i, pair in enumerate(task_struct.get('trial_stims', [])[:n_trials]):
+        trials['stim1'][t_i] = stims.add(str(pair[0]))
+        trials['stim2'][t_i] = stims.add(str(pair[1]))
+    for t_i, text in enumerate(task_struct.get('trial_instructions', [])[:n_trials]):
+        trials['instruction'][t_i] = instructions.add(text)
+    for t_i, text in enumerate(task_struct.get('response_instructions', [])[:n_trials]):
+        trials['response_instruction'][t_i] = response_instructions.add(text)
+
+    task_struct['trials'] = trials
+    task_struct['trial_strings'] = {
+        'stims': stims.strings,
+        'instructions': instructions.strings,
+        'response_instructions': response_instructions.strings,
+    }
+    return task_struct
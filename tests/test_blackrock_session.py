@@ -0,0 +1,78 @@
+"""
+BlackrockSession against a local fake cbpy (no Blackrock hardware needed).
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import pytest
+
+from src.blackrock_session import BlackrockSession
+
+IPS = ['127.0.0.1', '127.0.0.2']
+
+
+class FakeCbpy:
+    """Records every call; set_comment raises for the instances in fail_next."""
+
+    def __init__(self):
+        self.calls = []
+        self.comments = []
+        self.fail_next = []
+
+    def open(self, instance=0, parameter=None):
+        self.calls.append(('open', instance, parameter['inst-addr']))
+        return 0, {}
+
+    def set_comment(self, comment, rgba_tuple=None, instance=0):
+        if instance in self.fail_next:
+            self.fail_next.remove(instance)
+            raise RuntimeError('link down')
+        self.comments.append((instance, comment))
+
+    def close(self, instance=0):
+        self.calls.append(('close', instance))
+        return 0
+
+
+def test_open_connects_every_nsp():
+    fake = FakeCbpy()
+    session = BlackrockSession(cbpy=fake, ips=IPS).open()
+    assert session.is_open
+    assert fake.calls == [('open', 0, IPS[0]), ('open', 1, IPS[1])]
+
+
+def test_send_comment_reaches_every_nsp():
+    fake = FakeCbpy()
+    session = BlackrockSession(cbpy=fake, ips=IPS).open()
+    session.send_comment('annotate', 'file', additional_text='trial=0; phase=stim1_on')
+    assert fake.comments == [(0, 'trial=0; phase=stim1_on_NSP-1'), (1, 'trial=0; phase=stim1_on_NSP-2')]
+    assert session.is_open
+
+
+def test_send_failure_reconnects_and_resends():
+    fake = FakeCbpy()
+    session = BlackrockSession(cbpy=fake, ips=IPS).open()
+    fake.fail_next = [1]
+    session.send_comment('annotate', 'file', additional_text='x')
+    assert session.n_reconnects == 1
+    assert fake.calls[-2:] == [('close', 1), ('open', 1, IPS[1])]
+    assert fake.comments == [(0, 'x_NSP-1'), (1, 'x_NSP-2')]
+
+
+def test_send_failure_after_retries_raises():
+    fake = FakeCbpy()
+    session = BlackrockSession(cbpy=fake, ips=IPS, max_retries=1).open()
+    fake.fail_next = [0, 0]
+    with pytest.raises(ConnectionError):
+        session.send_comment('annotate', 'file', additional_text='x')
+
+
+def test_stop_closes_the_opened_instances_once():
+    fake = FakeCbpy()
+    session = BlackrockSession(cbpy=fake, ips=IPS[:1]).open()
+    session.send_comment('stop', 'file')
+    assert not session.is_open
+    assert [c for c in fake.calls if c[0] == 'close'] == [('close', 0)]
+    session.close()
+    assert [c for c in fake.calls if c[0] == 'close'] == [('close', 0)]
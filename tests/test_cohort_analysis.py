@@ -0,0 +1,51 @@
+"""
+analyze_cohort keeps task and training sessions apart unless asked to pool.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from src.cohort_analysis import analyze_cohort
+from src.trial_table import new_trial_table
+
+N_TRIALS = 16
+
+
+def write_session(folder, sub_id):
+    trials = new_trial_table(N_TRIALS)
+    trials['cue'] = 1
+    task_struct = {
+        'sub_id': sub_id, 'file_name': f'{sub_id}_0', 'n_trials': N_TRIALS, 'n_trials_per_block': N_TRIALS,
+        'trials': trials, 'trial_strings': {'stims': ['a'], 'instructions': [], 'response_instructions': []},
+        'category_and_axis': [['A', 'B', 'C', 'D'], [['x', 'y']] * 4],
+        'resp_key': np.ones(N_TRIALS), 'correct_responses': np.ones(N_TRIALS),
+        'response_time': np.full(N_TRIALS, 0.5), 'complete_flag': 1,
+    }
+    folder.mkdir(parents=True)
+    with open(folder / f'{sub_id}_0.pkl', 'wb') as f:
+        pickle.dump({'task_struct': task_struct, 'disp_struct': None}, f)
+
+
+@pytest.fixture
+def root(tmp_path):
+    write_session(tmp_path / 's1' / 'taskLogs', 's1')
+    write_session(tmp_path / 's1' / 'trainingLogs', 's1')
+    return tmp_path
+
+
+def test_default_is_task_only(root):
+    cohort = analyze_cohort(root, workers=1)
+    assert [s['kind'] for s in cohort['sessions']] == ['task']
+    assert cohort['n_trials'].sum() == N_TRIALS
+
+
+def test_kinds_are_pooled_only_when_asked(root):
+    with pytest.raises(ValueError):
+        analyze_cohort(root, kinds=('task', 'training'), workers=1)
+    cohort = analyze_cohort(root, kinds=('task', 'training'), workers=1, pool=True)
+    assert cohort['n_trials'].sum() == 2 * N_TRIALS
@@ -0,0 +1,67 @@
+"""
+CommentDispatcher with a fake send function.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import threading
+import time
+
+from src.comment_dispatcher import CommentDispatcher
+
+
+def test_stop_sends_every_queued_comment():
+    sent = []
+    dispatcher = CommentDispatcher(lambda **kwargs: sent.append(kwargs['additional_text'])).start()
+    for i in range(10):
+        dispatcher.submit(event='annotate', task='DCWM', additional_text=str(i))
+    stats = dispatcher.stop()
+    assert sent == [str(i) for i in range(10)]
+    assert stats['n_sent'] == 10 and stats['n_unsent'] == 0
+    assert not stats['worker_alive']
+    assert len(stats['queue_wait']) == 10
+
+
+def test_stop_timeout_reports_unsent_comments():
+    release = threading.Event()
+    dispatcher = CommentDispatcher(lambda **kwargs: release.wait(), maxsize=8).start()
+    for i in range(4):
+        dispatcher.submit(event='annotate', task='DCWM', additional_text=str(i))
+    stats = dispatcher.stop(timeout=0.1)  # worker hangs on the first comment
+    assert stats['worker_alive']
+    assert stats['n_unsent'] == 3
+    assert len(stats['enqueue_time']) == len(stats['send_start_time']) == len(stats['events'])
+    release.set()
+    dispatcher.thread.join(1)
+
+
+def test_stop_returns_with_a_full_queue():
+    release = threading.Event()
+    dispatcher = CommentDispatcher(lambda **kwargs: release.wait(), maxsize=4, submit_timeout=0.05).start()
+    for i in range(5):  # one on the hung worker, four filling the queue
+        dispatcher.submit(event='annotate', task='DCWM', additional_text=str(i))
+    stopper = threading.Thread(target=dispatcher.stop, kwargs={'timeout': 0.2}, daemon=True)
+    stopper.start()
+    stopper.join(2)
+    assert not stopper.is_alive()
+    stats = dispatcher.stats()
+    assert stats['worker_alive']
+    assert stats['n_unsent'] == 4
+    release.set()
+    dispatcher.thread.join(1)
+
+
+def test_submit_drops_markers_when_the_worker_is_stuck():
+    release = threading.Event()
+    dispatcher = CommentDispatcher(lambda **kwargs: release.wait(), maxsize=2, submit_timeout=0.05).start()
+    t0 = time.perf_counter()
+    for i in range(10):
+        dispatcher.submit(event='annotate', task='DCWM', additional_text=str(i))
+    assert time.perf_counter() - t0 < 0.5  # waits once, then drops without waiting
+    stats = dispatcher.stats()
+    assert stats['n_dropped'] == 10 - 3  # one sending, two queued
+    assert stats['n_unsent'] == stats['n_dropped']
+    release.set()
+    stats = dispatcher.stop()
+    assert stats['n_sent'] == 3 and not stats['worker_alive']
@@ -0,0 +1,59 @@
+"""
+FrameRecorder dropped-frame accounting on synthetic flip times.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+from src.frame_recorder import FrameRecorder
+
+FRAME = 1 / 60
+
+
+def flips(recorder, t, n):
+    """n flips one frame apart starting at t; returns the time after the last one."""
+    for i in range(n):
+        recorder.record(t + i * FRAME)
+    return t + n * FRAME
+
+
+def dropped(recorder):
+    table = recorder.phase_table()
+    return {recorder.phase_names[p]: int(d) for p, d in zip(table['phase'], table['dropped_frames'])}
+
+
+def test_late_flip_counts_as_dropped():
+    recorder = FrameRecorder(FRAME)
+    recorder.start_phase('stim1', 0)
+    t = flips(recorder, 0.0, 10)
+    recorder.record(t + 2 * FRAME)  # two refreshes missed
+    assert dropped(recorder) == {'stim1': 2}
+
+
+def test_intended_wait_is_not_dropped():
+    recorder = FrameRecorder(FRAME)
+    recorder.start_phase('trial_end', 0, 1.0)
+    t = flips(recorder, 0.0, 1)
+    recorder.pause(1.0)  # core.wait(ITI)
+    recorder.start_phase('fixation', 1)
+    flips(recorder, t + 1.0, 5)
+    assert sum(dropped(recorder).values()) == 0
+
+
+def test_overrun_of_intended_wait_is_dropped():
+    recorder = FrameRecorder(FRAME)
+    recorder.start_phase('response', 0)
+    t = flips(recorder, 0.0, 1)
+    recorder.pause(0.5)
+    recorder.record(t + 0.5 + 3 * FRAME)
+    assert dropped(recorder) == {'response': 3}
+
+
+def test_open_ended_wait_is_skipped():
+    recorder = FrameRecorder(FRAME)
+    recorder.start_phase('trial_end', 0)
+    t = flips(recorder, 0.0, 1)
+    recorder.pause()  # break screen
+    recorder.start_phase('fixation', 1)
+    flips(recorder, t + 60.0, 5)
+    assert sum(dropped(recorder).values()) == 0
@@ -0,0 +1,33 @@
+"""
+load_session_file on a session pickle holding several appended snapshots.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import pickle
+
+from src.session_export import load_session_file
+
+
+def write_snapshots(path, n, truncate=False):
+    with open(path, 'wb') as f:
+        for t_i in range(n):
+            record = {'task_struct': {'n_trials_done': t_i}}
+            if t_i == 0:
+                record['disp_struct'] = {'frame_period': 1 / 60}
+            pickle.dump(record, f)
+        if truncate:
+            f.write(pickle.dumps({'task_struct': {'n_trials_done': n}})[:-5])
+
+
+def test_last_snapshot_is_loaded(tmp_path):
+    path = tmp_path / 'session.pkl'
+    write_snapshots(path, 5)
+    assert load_session_file(path) == {'n_trials_done': 4}
+
+
+def test_truncated_tail_falls_back_to_last_complete_snapshot(tmp_path):
+    path = tmp_path / 'session.pkl'
+    write_snapshots(path, 5, truncate=True)
+    assert load_session_file(path) == {'n_trials_done': 4}
@@ -0,0 +1,36 @@
+"""
+iter_journal on a clean journal and on one cut off mid-record by a crash.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import pickle
+
+from src.trial_journal import iter_journal
+
+
+def write_journal(path, n_trials, cut=0):
+    data = pickle.dumps({'type': 'header', 'task_struct': {'n_trials': n_trials}})
+    for t_i in range(n_trials):
+        data += pickle.dumps({'type': 'trial', 't_i': t_i, 'trial_struct': {}})
+    path.write_bytes(data[:len(data) - cut])
+
+
+def test_clean_end_is_not_truncated(tmp_path, capsys):
+    path = tmp_path / 'session.journal'
+    write_journal(path, 3)
+    info = {}
+    assert len(list(iter_journal(path, info))) == 4
+    assert not info['truncated']
+    assert 'Warning' not in capsys.readouterr().out
+
+
+def test_cut_off_record_is_reported(tmp_path, capsys):
+    path = tmp_path / 'session.journal'
+    write_journal(path, 3, cut=5)  # raises EOFError inside the last record
+    info = {}
+    records = list(iter_journal(path, info))
+    assert [r['type'] for r in records] == ['header', 'trial', 'trial']
+    assert info['truncated']
+    assert 'truncated record' in capsys.readouterr().out